@@ -0,0 +1,69 @@
+"""
+Benchmark del arranque del ESP32: pausas fijas contra el flanco del pin ready y el arranque tibio.
+
+Repite --veces el arranque que hacían los ejemplos (pulso de 0.1 s en GP15,
+1 s de espera fija y después esperar_ready), el de GestorArranque.reiniciar()
+(pulso corto y vuelve en el flanco de subida del pin ready) y el de
+GestorArranque.iniciar() con el ESP32 ya en marcha (un PING, sin reinicio).
+Informa el tiempo medio hasta poder enviar el primer comando. Usa el emulador,
+con --setup segundos de arranque del firmware; no necesita hardware.
+
+    python3 Software/Benchmark/bench_arranque.py --setup 0.35
+    python3 Software/Benchmark/bench_arranque.py --veces 10 --baudios 921600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.arranque import GestorArranque  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+
+
+def pausas_fijas(esp, reset_pin):
+    # El bloque de reset que repetían los ejemplos
+    reset_pin.value = True
+    time.sleep(0.1)
+    reset_pin.value = False
+    time.sleep(0.1)
+    reset_pin.value = True
+    time.sleep(1)
+    if not esp.esperar_ready(timeout=10):
+        raise RuntimeError("El ESP32 no quedó listo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--veces", type=int, default=5)
+    parser.add_argument("--setup", type=float, default=0.35, help="segundos que tarda setup() del firmware")
+    args = parser.parse_args()
+
+    emu = EmuladorESP32(latencias={"arranque": args.setup})
+    uart = TransporteEmulado(emu, baudrate=args.baudios)
+    esp = ESP32UART(uart=uart, ready_pin=emu.pin_ready)
+    arranque = GestorArranque(esp, reset_pin=emu.pin_reset)
+
+    pruebas = (
+        ("pausas fijas", lambda: pausas_fijas(esp, emu.pin_reset)),
+        ("flanco ready", lambda: arranque.reiniciar()),
+        ("tibio (PING)", lambda: arranque.iniciar()),
+    )
+    for nombre, arrancar in pruebas:
+        total = 0.0
+        for _ in range(args.veces):
+            inicio = time.perf_counter()
+            arrancar()
+            # Listo de verdad: el primer comando tiene respuesta
+            esp.solicitar_comando({"cmd": "PING"})
+            list(esp.respuestas(2))
+            total += time.perf_counter() - inicio
+        print("%-13s %8.1f ms por arranque" % (nombre, total / args.veces * 1000))
+
+
+if __name__ == "__main__":
+    main()
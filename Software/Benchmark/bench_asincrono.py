@@ -0,0 +1,83 @@
+"""
+Benchmark del cliente asyncio: muestreo de un sensor mientras el ESP32 atiende GETs.
+
+Compara el esquema bloqueante de los ejemplos (muestrear solo entre comandos)
+con ClienteESP32Async, donde la tarea del sensor sigue corriendo durante las
+esperas de la UART. Usa el emulador, no necesita hardware.
+
+    python3 Software/Benchmark/bench_asincrono.py --gets 20 --latencia-http 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.asincrono import ClienteESP32Async  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+
+URL = "http://jsonplaceholder.typicode.com/todos/1"
+
+
+def crear_uart(baudios, latencia_http):
+    emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}], latencias={"http": latencia_http},
+                        http=lambda metodo, url, cuerpo: (200, '{"id": 1, "completed": false}'))
+    emu.red_conectada = emu.redes[0]
+    return TransporteEmulado(emu, baudrate=baudios)
+
+
+def medir_bloqueante(uart, gets, periodo):
+    esp = ESP32UART(uart=uart)
+    muestras = 0
+    inicio = time.perf_counter()
+    for _ in range(gets):
+        esp.solicitar_comando({"cmd": "GET", "url": URL})
+        list(esp.respuestas(timeout=10))
+        muestras += 1  # Una muestra del sensor entre comandos
+        time.sleep(periodo)
+    return time.perf_counter() - inicio, muestras
+
+
+async def _medir_async(uart, gets, periodo):
+    esp = ClienteESP32Async(uart)
+    await esp.iniciar()
+    muestras = 0
+
+    async def sensor():
+        nonlocal muestras
+        while True:
+            muestras += 1
+            await asyncio.sleep(periodo)
+
+    tarea = asyncio.create_task(sensor())
+    inicio = time.perf_counter()
+    for _ in range(gets):
+        await esp.get(URL, timeout=10)
+    duracion = time.perf_counter() - inicio
+    tarea.cancel()
+    esp.cerrar()
+    return duracion, muestras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--gets", type=int, default=20)
+    parser.add_argument("--latencia-http", type=float, default=0.1)
+    parser.add_argument("--periodo-sensor", type=float, default=0.01)
+    args = parser.parse_args()
+
+    for nombre, medir in (("bloqueante", medir_bloqueante),
+                          ("asyncio", lambda *a: asyncio.run(_medir_async(*a)))):
+        duracion, muestras = medir(crear_uart(args.baudios, args.latencia_http), args.gets, args.periodo_sensor)
+        esperadas = duracion / args.periodo_sensor
+        print("%-11s %6.2f s  %6.1f GET/s  %5d muestras del sensor (%3.0f%% de las esperadas)"
+              % (nombre, duracion, args.gets / duracion, muestras, 100.0 * muestras / esperadas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark del throughput efectivo de la UART a cada velocidad negociada con BAUD.
+
+Para cada velocidad parte de 115200, negocia con ESP32UART.negociar_baudios y
+mide ida y vuelta de PROBE con ~900 bytes de datos (el ESP32 los devuelve con
+su CRC16). Sin --puerto usa el emulador; --max-baudios simula un enlace que
+falla por encima de esa velocidad para ver la vuelta atrás automática.
+
+    python3 Software/Benchmark/bench_baudios.py
+    python3 Software/Benchmark/bench_baudios.py --max-baudios 1000000
+    python3 Software/Benchmark/bench_baudios.py --puerto /dev/ttyUSB0
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.crc import crc16  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.respuestas import JSON  # noqa: E402
+
+BAUD_INICIAL = 115200
+DATOS = ("0123456789abcdef" * 57)[:900]
+
+
+def crear_uart(args):
+    if args.puerto:
+        from archinet.transporte import TransporteSerial
+        return TransporteSerial(args.puerto, baudrate=BAUD_INICIAL)
+    return TransporteEmulado(EmuladorESP32(max_baudios=args.max_baudios), baudrate=BAUD_INICIAL)
+
+
+def medir(esp, repeticiones):
+    comando = {"cmd": "PROBE", "data": DATOS, "crc": crc16(DATOS.encode())}
+    uart = esp.uart
+    tx, rx = uart.bytes_tx, uart.bytes_rx
+    errores = 0
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        esp.solicitar_comando(comando)
+        eco = [r for r in esp.respuestas(timeout=5) if r.tipo == JSON]
+        if not eco or eco[0].valor.get("probe") != DATOS:
+            errores += 1
+    duracion = time.perf_counter() - inicio
+    return (uart.bytes_tx - tx + uart.bytes_rx - rx) / duracion, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, nargs="+", default=[115200, 460800, 921600, 2000000])
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--max-baudios", type=int, default=None)
+    parser.add_argument("--puerto", help="puerto serie conectado a UART1 del ESP32 (sin él: emulador)")
+    args = parser.parse_args()
+
+    for baudios in args.baudios:
+        esp = ESP32UART(uart=crear_uart(args))
+        inicio = time.perf_counter()
+        ok = baudios == BAUD_INICIAL or esp.negociar_baudios(baudios)
+        negociacion = time.perf_counter() - inicio
+        throughput, errores = medir(esp, args.repeticiones)
+        print("%9d baud  %-9s negociación %5.2f s  -> %9d baud  %9.0f B/s  %d errores de PROBE"
+              % (baudios, "ok" if ok else "fallback", negociacion, esp.uart.baudrate, throughput, errores))
+        esp.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark de la caché HTTP del host: GET repetidos sin caché, con revalidación y con TTL.
+
+Un cliente pide --peticiones veces, al azar, un puñado de URLs de configuración
+y tablas (--urls, de --kb KB cada una) que el servidor cambia muy de vez en
+cuando. Sin caché cada GET baja el cuerpo entero por la red y por la UART;
+con CacheHTTP y TTL 0 cada GET es una revalidación (304 sin cuerpo mientras
+no cambie) y con TTL la mayoría se responde sin red. Informa el tiempo, los
+bytes por la UART y los cuerpos que bajó el servidor. Usa el emulador, con
+--latencia segundos por petición HTTP; no necesita hardware.
+
+    python3 Software/Benchmark/bench_cache.py --baudios 115200
+    python3 Software/Benchmark/bench_cache.py --peticiones 500 --ttl 30
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.cache import CacheHTTP, pedir_esp  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+
+
+class Servidor:
+    """Backend del emulador: documentos con ETag que cambian con probabilidad 'cambios' por petición."""
+
+    def __init__(self, urls, kb, cambios):
+        self.versiones = dict.fromkeys(urls, 0)
+        self.kb = kb
+        self.cambios = cambios
+        self.cuerpos = 0
+
+    def __call__(self, metodo, url, payload, cabeceras=None):
+        if random.random() < self.cambios:
+            self.versiones[url] += 1
+        etag = '"%d"' % self.versiones[url]
+        validadores = {"ETag": etag}
+        if cabeceras and cabeceras.get("If-None-Match") == etag:
+            return 304, "", validadores
+        self.cuerpos += 1
+        filas = [{"clave": "parametro%d" % i, "valor": i * self.versiones[url]} for i in range(self.kb * 32)]
+        return 200, json.dumps({"url": url, "version": self.versiones[url], "filas": filas}), validadores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--urls", type=int, default=5)
+    parser.add_argument("--kb", type=int, default=1, help="tamaño aproximado de cada documento")
+    parser.add_argument("--cambios", type=float, default=0.02, help="probabilidad de que un documento cambie")
+    parser.add_argument("--ttl", type=float, default=10, help="segundos de vigencia en la caché")
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por petición HTTP")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    urls = ["http://servidor/config%d.json" % i for i in range(args.urls)]
+    for nombre, ttl in (("sin caché", None), ("TTL 0", 0), ("TTL %g s" % args.ttl, args.ttl)):
+        random.seed(args.semilla)
+        servidor = Servidor(urls, args.kb, args.cambios)
+        emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}], http=servidor,
+                            latencias={"http": args.latencia})
+        emu.red_conectada = emu.redes[0]
+        uart = TransporteEmulado(emu, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        pedir = pedir_esp(esp, timeout=30)
+        cache = CacheHTTP(max_bytes=args.urls * args.kb * 2048, ttl=args.ttl)
+        rx = uart.bytes_rx
+        inicio = time.perf_counter()
+        for _ in range(args.peticiones):
+            url = random.choice(urls)
+            if ttl is None:
+                codigo, _, _ = pedir(url, {})
+            else:
+                codigo, _ = cache.obtener(url, pedir, ttl=ttl)
+            if codigo != 200:
+                print("GET %s -> Código: %d" % (url, codigo))
+        duracion = time.perf_counter() - inicio
+        print("%-10s %7.2f s  %9d B por UART  %5d cuerpos bajados  sin red %5d  304 %5d"
+              % (nombre, duracion, uart.bytes_rx - rx, servidor.cuerpos, cache.hits, cache.revalidadas))
+
+
+if __name__ == "__main__":
+    main()
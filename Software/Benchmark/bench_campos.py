@@ -0,0 +1,84 @@
+"""
+Benchmark del filtro "fields": documento JSON entero contra solo los campos pedidos.
+
+Pide un pronóstico tipo API REST (--horas entradas, varios KB) con un GET común
+y con "fields", que el ESP32 aplica con el filtro de ArduinoJson mientras lee
+la respuesta. Compara los bytes por la UART, el tiempo total del comando y el
+tiempo de json.loads del cuerpo en el host. Usa el emulador, no necesita
+hardware.
+
+    python3 Software/Benchmark/bench_campos.py --baudios 115200
+    python3 Software/Benchmark/bench_campos.py --horas 96 --campos list[].main.temp list[].dt
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.respuestas import CUERPO  # noqa: E402
+
+
+def generar_pronostico(horas):
+    entradas = []
+    for i in range(horas):
+        entradas.append({
+            "dt": 1754000000 + i * 3600,
+            "main": {"temp": 20 + i % 7 * 0.5, "feels_like": 19.5, "temp_min": 18.2, "temp_max": 23.9,
+                     "pressure": 1013, "sea_level": 1013, "grnd_level": 1009, "humidity": 60 + i % 20},
+            "weather": [{"id": 800, "main": "Clear", "description": "cielo claro", "icon": "01d"}],
+            "clouds": {"all": i % 100},
+            "wind": {"speed": 3.6, "deg": 120, "gust": 5.1},
+            "visibility": 10000,
+            "pop": 0,
+            "sys": {"pod": "d"},
+            "dt_txt": "2025-08-%02d %02d:00:00" % (1 + i // 24, i % 24),
+        })
+    return json.dumps({"cod": "200", "message": 0, "cnt": horas, "list": entradas,
+                       "city": {"id": 3435910, "name": "Buenos Aires", "country": "AR",
+                                "coord": {"lat": -34.61, "lon": -58.38}, "timezone": -10800}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--horas", type=int, default=24)
+    parser.add_argument("--campos", nargs="+", default=["city.name", "list[].dt", "list[].main.temp"])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    documento = generar_pronostico(args.horas)
+    url = "http://api.servidor/forecast"
+    print("documento de %d B, campos: %s" % (len(documento), " ".join(args.campos)))
+    for nombre, campos in (("entero", None), ("fields", args.campos)):
+        emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}],
+                            http=lambda metodo, u, cuerpo: (200, documento))
+        emu.red_conectada = emu.redes[0]
+        uart = TransporteEmulado(emu, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        comando = {"cmd": "GET", "url": url}
+        if campos:
+            comando["fields"] = campos
+        rx = uart.bytes_rx
+        total = 0.0
+        parseo = 0.0
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            esp.solicitar_comando(comando)
+            cuerpo = "".join(registro.valor for registro in esp.respuestas(timeout=60) if registro.tipo == CUERPO)
+            total += time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            json.loads(cuerpo)
+            parseo += time.perf_counter() - inicio
+        print("%-7s %8d B por UART  %8.1f ms por GET  json.loads %7.3f ms  cuerpo %6d B"
+              % (nombre, (uart.bytes_rx - rx) // args.repeticiones, 1000 * total / args.repeticiones,
+                 1000 * parseo / args.repeticiones, len(cuerpo)))
+
+
+if __name__ == "__main__":
+    main()
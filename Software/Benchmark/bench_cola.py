@@ -0,0 +1,82 @@
+"""
+Benchmark de la cola de telemetría: un POST por lectura contra lotes guardados en la flash.
+
+Genera --lecturas lecturas; durante --caidas cortes de WiFi de --duracion
+lecturas cada uno el ESP32 no tiene red. Un POST por lectura pierde todo lo
+medido durante los cortes; ColaTelemetria lo guarda en archivos (en un
+directorio temporal) y lo envía en lotes al volver el enlace. Informa las
+peticiones HTTP, las lecturas que llegaron al servidor, las perdidas y los
+bytes por la UART. Usa el emulador, no necesita hardware.
+
+    python3 Software/Benchmark/bench_cola.py --lecturas 1000 --lote 20
+    python3 Software/Benchmark/bench_cola.py --caidas 5 --duracion 100
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.cola import ColaTelemetria, enviar_esp  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--lecturas", type=int, default=1000)
+    parser.add_argument("--lote", type=int, default=20)
+    parser.add_argument("--caidas", type=int, default=3)
+    parser.add_argument("--duracion", type=int, default=60, help="lecturas que dura cada corte")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    sin_red = set()
+    for _ in range(args.caidas):
+        inicio = random.randrange(args.lecturas - args.duracion)
+        sin_red.update(range(inicio, inicio + args.duracion))
+
+    for nombre in ("una por POST", "cola"):
+        recibidas = set()
+        peticiones = [0]
+
+        def servidor(metodo, url, cuerpo):
+            peticiones[0] += 1
+            datos = json.loads(cuerpo)
+            for lectura in datos if isinstance(datos, list) else [datos]:
+                recibidas.add(lectura["n"])
+            return 200, '{"ok": true}'
+
+        emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}], http=servidor)
+        uart = TransporteEmulado(emu, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        enviar = enviar_esp(esp, "http://servidor/telemetria")
+        carpeta = tempfile.mkdtemp()
+        cola = ColaTelemetria(enviar, ruta=os.path.join(carpeta, "telemetria"), lote=args.lote, antiguedad=3600)
+        bytes_uart = uart.bytes_tx + uart.bytes_rx
+        for n in range(args.lecturas):
+            conectado = n not in sin_red
+            emu.red_conectada = emu.redes[0] if conectado else None
+            lectura = {"n": n, "temperatura": round(random.uniform(20, 30), 1), "humedad": random.randint(40, 70)}
+            if nombre == "cola":
+                cola.agregar(lectura)
+                cola.tick(conectado=conectado)
+            else:
+                enviar([lectura])
+        if nombre == "cola":
+            cola.vaciar()
+        shutil.rmtree(carpeta)
+        print("%-13s %5d peticiones HTTP  %5d de %d lecturas en el servidor  perdidas %4d  %8d B por UART"
+              % (nombre, peticiones[0], len(recibidas), args.lecturas, args.lecturas - len(recibidas),
+                 uart.bytes_tx + uart.bytes_rx - bytes_uart))
+
+
+if __name__ == "__main__":
+    main()
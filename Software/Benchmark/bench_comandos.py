@@ -0,0 +1,63 @@
+"""
+Benchmark de comandos por segundo y bytes por segundo contra el emulador del ESP32.
+
+No necesita Archi ni ESP32: usa archinet.emulador a la velocidad de UART simulada.
+
+    python3 Software/Benchmark/bench_comandos.py
+    python3 Software/Benchmark/bench_comandos.py --baudios 115200 921600 --repeticiones 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+
+
+def _http_local(metodo, url, cuerpo):
+    return 200, '{"userId": 1, "id": 1, "title": "delectus aut autem", "completed": false}'
+
+
+COMANDOS = {
+    "PING": {"cmd": "PING"},
+    "INFO": {"cmd": "INFO"},
+    "WebServer": {"cmd": "WebServer", "label": "Temperatura", "data": {"dato1": 25.4}},
+    "GET": {"cmd": "GET", "url": "http://jsonplaceholder.typicode.com/todos/1"},
+}
+
+
+def medir(nombre, comando, baudios, repeticiones):
+    emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}], http=_http_local)
+    emu.red_conectada = emu.redes[0]
+    uart = TransporteEmulado(emu, baudrate=baudios)
+    esp = ESP32UART(uart=uart, ready_pin=emu.pin_ready)
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        esp.solicitar_comando(comando)
+        esp.leer_respuesta(timeout=5, imprimir=False)
+    duracion = time.perf_counter() - inicio
+
+    total = uart.bytes_tx + uart.bytes_rx
+    print("%-10s %9d baud  %8.1f cmd/s  %10.0f B/s  (%d B tx, %d B rx)"
+          % (nombre, baudios, repeticiones / duracion, total / duracion, uart.bytes_tx, uart.bytes_rx))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, nargs="+", default=[115200, 460800, 921600])
+    parser.add_argument("--repeticiones", type=int, default=100)
+    parser.add_argument("--comandos", nargs="+", default=list(COMANDOS), choices=list(COMANDOS))
+    args = parser.parse_args()
+
+    for baudios in args.baudios:
+        for nombre in args.comandos:
+            medir(nombre, COMANDOS[nombre], baudios, args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
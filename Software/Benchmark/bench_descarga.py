@@ -0,0 +1,83 @@
+"""
+Benchmark de respuestas HTTP grandes: cuerpo en una línea contra bloques.
+
+Pide el mismo documento con un GET común (el cuerpo llega en una sola línea)
+y con archinet.descarga.solicitar_bloques ("stream": true), y compara el
+tiempo, los bytes por la UART, la memoria que cada lado necesita para el
+cuerpo (el GET común lo junta entero con getString() en el ESP32 y en Archi
+para usarlo; en bloques alcanza con un bloque) y si llegó intacto: en modo
+texto el GET común cambia los saltos de línea por espacios. Usa el emulador,
+no necesita hardware.
+
+    python3 Software/Benchmark/bench_descarga.py --kb 200
+    python3 Software/Benchmark/bench_descarga.py --kb 200 --binario
+"""
+
+import argparse
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.descarga import solicitar_bloques  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.respuestas import CUERPO  # noqa: E402
+
+
+def generar_csv(kb):
+    filas = ["fecha,temperatura,humedad"]
+    i = 0
+    while sum(len(f) + 1 for f in filas) < kb * 1024:
+        filas.append("2025-08-%02d %02d:%02d,%.1f,%d" % (i % 28 + 1, i % 24, i % 60, 20 + i % 10, 40 + i % 30))
+        i += 1
+    return "\n".join(filas) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=921600)
+    parser.add_argument("--kb", type=int, default=200)
+    parser.add_argument("--bloque", type=int, default=1024)
+    parser.add_argument("--binario", action="store_true", help="usar modo tramas")
+    args = parser.parse_args()
+
+    documento = generar_csv(args.kb)
+    url = "http://servidor/datos.csv"
+
+    for nombre in ("una línea", "bloques"):
+        emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}],
+                            http=lambda metodo, u, cuerpo: (200, documento))
+        emu.red_conectada = emu.redes[0]
+        uart = TransporteEmulado(emu, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        esp.capacidades()
+        if args.binario:
+            esp.activar_tramas()
+        rx = uart.bytes_rx
+        largo = 0
+        crc = 0
+        memoria = 0
+        inicio = time.perf_counter()
+        if nombre == "bloques":
+            for datos in solicitar_bloques(esp, url, bloque=args.bloque):
+                largo += len(datos)
+                crc = zlib.crc32(datos, crc)
+                memoria = max(memoria, len(datos))
+        else:
+            esp.solicitar_comando({"cmd": "GET", "url": url})
+            partes = [registro.valor for registro in esp.respuestas(timeout=60) if registro.tipo == CUERPO]
+            cuerpo = b"".join(partes) if partes and isinstance(partes[0], bytes) else "".join(partes).encode()
+            largo = len(cuerpo)
+            crc = zlib.crc32(cuerpo)
+            memoria = largo
+        duracion = time.perf_counter() - inicio
+        intacto = crc == zlib.crc32(documento.encode())
+        print("%-10s %6.2f s  %8d B por UART  memoria para el cuerpo %7d B  %7d B recibidos  %s"
+              % (nombre, duracion, uart.bytes_rx - rx, memoria, largo, "intacto" if intacto else "MODIFICADO"))
+
+
+if __name__ == "__main__":
+    main()
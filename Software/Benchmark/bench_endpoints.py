@@ -0,0 +1,68 @@
+"""
+Benchmark de la tabla de endpoints: cientos de labels con desalojo LRU y TTL.
+
+Publica N labels (en batch) sobre una tabla de --max endpoints y después
+consulta M veces endpoints al azar, con un subconjunto "caliente" que recibe
+la mayoría de las consultas. Informa el tiempo medio de cada búsqueda y los
+hits, misses y desalojos que cuenta el ESP32 (comando ENDPOINTS) con cada
+política. Usa el emulador, no necesita hardware.
+
+    python3 Software/Benchmark/bench_endpoints.py --labels 500 --max 200
+    python3 Software/Benchmark/bench_endpoints.py --labels 800 --max 0
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.publicador import PublicadorEndpoints, estado_endpoints  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=921600)
+    parser.add_argument("--labels", type=int, default=500)
+    parser.add_argument("--max", type=int, default=200, help="capacidad de la tabla (0: según el heap)")
+    parser.add_argument("--consultas", type=int, default=20000)
+    parser.add_argument("--calientes", type=float, default=0.2, help="fracción de labels muy consultados")
+    parser.add_argument("--rondas", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    labels = ["Sensor%d" % i for i in range(args.labels)]
+    calientes = labels[:max(1, int(len(labels) * args.calientes))]
+    for politica in ("lru", "ttl"):
+        random.seed(args.semilla)
+        emu = EmuladorESP32(latencias={"comando": 0})
+        esp = ESP32UART(uart=TransporteEmulado(emu, baudrate=args.baudios))
+        estado_endpoints(esp, politica=politica, maximo=args.max)
+        publicador = PublicadorEndpoints(esp, periodo=0)
+        duracion = 0.0
+        for _ in range(args.rondas):
+            # Los calientes se actualizan en cada ronda; del resto, una parte al azar
+            for label in calientes + random.sample(labels, len(labels) // 4):
+                publicador.actualizar(label, {"dato1": round(random.uniform(20, 30), 1)})
+            publicador.publicar()
+            inicio = time.perf_counter()
+            for _ in range(args.consultas // args.rondas):
+                if random.random() < 0.8:
+                    label = random.choice(calientes)
+                else:
+                    label = random.choice(labels)
+                emu.servir("/" + label)
+            duracion += time.perf_counter() - inicio
+        estado = estado_endpoints(esp)
+        consultas = estado["hits"] + estado["misses"]
+        print("%-4s %4d/%-4d endpoints  %6.2f us/búsqueda  hits %5.1f %%  misses %6d  desalojos %6d"
+              % (politica, estado["count"], estado["max"], duracion / consultas * 1e6,
+                 100.0 * estado["hits"] / consultas, estado["misses"], estado["evictions"]))
+
+
+if __name__ == "__main__":
+    main()
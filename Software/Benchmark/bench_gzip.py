@@ -0,0 +1,63 @@
+"""
+Benchmark de subida de HTML comprimido: texto plano contra gzip en base64.
+
+Sube la misma página con archinet.subida.subir_html, primero tal cual y luego
+comprimida (comprimido=True), y compara los bytes enviados por la UART, el
+tiempo de subida y lo que el servidor embebido entrega a un navegador con
+Accept-Encoding: gzip y a uno sin gzip. Usa el emulador, no necesita hardware.
+
+    python3 Software/Benchmark/bench_gzip.py --kb 50
+    python3 Software/Benchmark/bench_gzip.py --kb 50 --binario
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.subida import comprimir, subir_html  # noqa: E402
+
+from bench_html import generar_html  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--kb", type=int, default=50)
+    parser.add_argument("--latencia-comando", type=float, default=0.005)
+    parser.add_argument("--escapes", action="store_true")
+    parser.add_argument("--binario", action="store_true", help="subir en modo tramas")
+    args = parser.parse_args()
+
+    html = generar_html(args.kb, args.escapes)
+    for nombre in ("plano", "gzip"):
+        emu = EmuladorESP32(latencias={"comando": args.latencia_comando})
+        uart = TransporteEmulado(emu, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        if args.binario:
+            esp.activar_tramas()
+        contenido = comprimir(html) if nombre == "gzip" else html
+        tx_inicial = uart.bytes_tx
+        inicio = time.perf_counter()
+        ok = subir_html(esp, contenido, timeout=2, forzar=True, comprimido=nombre == "gzip")
+        duracion = time.perf_counter() - inicio
+
+        _, cabeceras, con_gzip = emu.servir("/", {"Accept-Encoding": "gzip"})
+        _, _, sin_gzip = emu.servir("/")
+        if isinstance(sin_gzip, str):
+            sin_gzip = sin_gzip.encode("utf-8")
+        if isinstance(con_gzip, str):
+            con_gzip = con_gzip.encode("utf-8")
+        print("%-6s %6.2f s  %8d B por UART  navegador: %7d B (%s)  sin gzip: %s  %s"
+              % (nombre, duracion, uart.bytes_tx - tx_inicial, len(con_gzip),
+                 cabeceras.get("Content-Encoding", "identity"),
+                 "ok" if sin_gzip == html.encode("utf-8") else "DISTINTO",
+                 "ok" if ok else "FALLÓ"))
+
+
+if __name__ == "__main__":
+    main()
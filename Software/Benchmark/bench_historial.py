@@ -0,0 +1,68 @@
+"""
+Benchmark del historial de endpoints: consultas al último valor contra ?since=.
+
+Publica N actualizaciones de un label y un cliente HTTP lo consulta cada
+--cada actualizaciones: primero pidiendo solo el último valor (GET /Temperatura)
+y después con historial (GET /Temperatura?since=<t>). Informa cuántas
+peticiones HTTP hizo el cliente y cuántas muestras se perdió en cada caso, y
+cuántas peticiones haría falta sin historial para no perder ninguna. Usa el
+emulador, no necesita hardware.
+
+    python3 Software/Benchmark/bench_historial.py --actualizaciones 500 --cada 10
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.publicador import PublicadorEndpoints, configurar_historial  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=921600)
+    parser.add_argument("--actualizaciones", type=int, default=500)
+    parser.add_argument("--cada", type=int, default=10, help="actualizaciones entre dos consultas del cliente")
+    parser.add_argument("--muestras", type=int, default=60, help="tamaño del historial en el ESP32")
+    args = parser.parse_args()
+
+    for nombre in ("último valor", "?since="):
+        emu = EmuladorESP32(latencias={"comando": 0})
+        esp = ESP32UART(uart=TransporteEmulado(emu, baudrate=args.baudios))
+        if nombre == "?since=":
+            configurar_historial(esp, "Temperatura", args.muestras)
+        publicador = PublicadorEndpoints(esp, periodo=0)
+        recibidas = set()
+        peticiones = 0
+        bytes_http = 0
+        desde = 0
+        for i in range(args.actualizaciones):
+            publicador.actualizar("Temperatura", {"dato1": i})
+            publicador.publicar()
+            if (i + 1) % args.cada and i + 1 < args.actualizaciones:
+                continue
+            if nombre == "?since=":
+                _, _, cuerpo = emu.servir("/Temperatura?since=%d" % desde)
+                respuesta = json.loads(cuerpo)
+                for muestra in respuesta["samples"]:
+                    recibidas.add(muestra["data"]["dato1"])
+                    desde = muestra["t"]
+            else:
+                _, _, cuerpo = emu.servir("/Temperatura")
+                recibidas.add(json.loads(cuerpo)["dato1"])
+            peticiones += 1
+            bytes_http += len(cuerpo)
+        print("%-13s %5d peticiones HTTP  %7d B  %5d de %d muestras  perdidas: %d"
+              % (nombre, peticiones, bytes_http, len(recibidas), args.actualizaciones,
+                 args.actualizaciones - len(recibidas)))
+    print("Sin historial, no perder muestras requiere %d peticiones (una por actualización)"
+          % args.actualizaciones)
+
+
+if __name__ == "__main__":
+    main()
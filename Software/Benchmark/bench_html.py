@@ -0,0 +1,104 @@
+"""
+Benchmark de subida de HTML: stop-and-wait por fragmento contra ventana deslizante.
+
+El modo stop-and-wait es el de los ejemplos originales (fragmentos de 512
+caracteres y esperar el {"end": true} de cada uno); la ventana usa
+archinet.subida.subir_html, con fragmentos armados por bytes serializados.
+Con --escapes el HTML lleva comillas y UTF-8, que hacen que 512 caracteres
+superen el buffer de línea del ESP32. Con --perdida se corrompe al azar esa
+fracción de las líneas que llegan al ESP32, para ver el reenvío selectivo.
+
+    python3 Software/Benchmark/bench_html.py --kb 50 --latencia-comando 0.005
+    python3 Software/Benchmark/bench_html.py --kb 50 --perdida 0.05
+    python3 Software/Benchmark/bench_html.py --kb 50 --escapes
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART, TiempoAgotado  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.subida import fragmentar, presupuesto_html, subir_html  # noqa: E402
+
+
+class TransporteConPerdida(TransporteEmulado):
+    """Corrompe al azar líneas completas enviadas al ESP32 (parseo JSON fallido)."""
+
+    def __init__(self, emulador, perdida, **kwargs):
+        super().__init__(emulador, **kwargs)
+        self.perdida = perdida
+        self.perdidas = 0
+
+    def write(self, datos):
+        if self.perdida and random.random() < self.perdida:
+            self.perdidas += 1
+            datos = bytes(datos).replace(b'"content"', b'"con\xfftent', 1)
+        return super().write(datos)
+
+
+def generar_html(kb, escapes=False):
+    bloque = '<div class="tarjeta"><h2>Sensor</h2><p id="v">--</p></div>\n'
+    if escapes:
+        bloque = '<td title="«año»">ñandú — "máx" \\ 🌡🌡</td>\n'
+    return "<html><body>\n" + bloque * (kb * 1024 // len(bloque)) + "</body></html>\n"
+
+
+def stop_and_wait(esp, html, fragmento, max_reinicios=10):
+    total = (len(html) + fragmento - 1) // fragmento
+    i = 0
+    reinicios = 0
+    while i < total:
+        if reinicios > max_reinicios:
+            return False, total
+        esp.solicitar_comando({"cmd": "HTML", "index": i, "total": total,
+                               "content": html[i * fragmento:(i + 1) * fragmento]})
+        try:
+            respuesta = [r.texto for r in esp.respuestas(timeout=1)]
+        except TiempoAgotado:
+            i = 0  # Fragmento perdido: handleHtmlPart exige empezar de nuevo
+            reinicios += 1
+            continue
+        if any("fuera de orden" in texto for texto in respuesta):
+            i = 0
+            reinicios += 1
+            continue
+        i += 1
+    return True, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--kb", type=int, default=50)
+    parser.add_argument("--fragmento", type=int, default=512)
+    parser.add_argument("--ventana", type=int, default=None)
+    parser.add_argument("--latencia-comando", type=float, default=0.005)
+    parser.add_argument("--perdida", type=float, default=0.0)
+    parser.add_argument("--escapes", action="store_true")
+    args = parser.parse_args()
+
+    html = generar_html(args.kb, args.escapes)
+    for nombre in ("stop-and-wait", "ventana"):
+        emu = EmuladorESP32(latencias={"comando": args.latencia_comando})
+        uart = TransporteConPerdida(emu, args.perdida, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        inicio = time.perf_counter()
+        if nombre == "ventana":
+            ok = subir_html(esp, html, args.ventana, timeout=2)
+            fragmentos = len(fragmentar(html, presupuesto_html(esp)))
+        else:
+            ok, fragmentos = stop_and_wait(esp, html, args.fragmento)
+        duracion = time.perf_counter() - inicio
+        print("%-14s %6.2f s  %8.0f B/s  enlace %5.1f%%  %4d fragmentos  %d líneas perdidas  %s"
+              % (nombre, duracion, len(html.encode()) / duracion,
+                 100.0 * uart.bytes_tx * 10 / args.baudios / duracion, fragmentos, uart.perdidas,
+                 "ok" if ok and emu.html_page == html else "FALLÓ"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark de conexiones HTTP persistentes: GET/POST repetidos con y sin reuso.
+
+Levanta un servidor HTTP/1.1 local (con keep-alive) y hace N peticiones GET y
+POST al mismo host a través del emulador, que las reenvía de verdad con
+archinet.emulador.ClienteHTTP: primero con "reuse": false (una conexión nueva
+por petición, como antes) y después con el pool de conexiones del firmware.
+--handshake agrega una demora a cada conexión nueva en el servidor, para
+simular el costo de DNS + TCP + TLS de un servidor remoto. Informa la latencia
+media y p95 por petición y los contadores "http"/"reuse" de INFO.
+
+    python3 Software/Benchmark/bench_http.py --peticiones 200
+    python3 Software/Benchmark/bench_http.py --peticiones 100 --handshake 0.05
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import ClienteHTTP, EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.respuestas import HTTP, JSON  # noqa: E402
+
+
+class Servidor(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive mientras el cliente no pida cerrar
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo salen en dos write(): sin esto, 40 ms de ACK demorado
+    handshake = 0.0
+
+    def setup(self):
+        time.sleep(self.handshake)  # Costo de cada conexión nueva
+        BaseHTTPRequestHandler.setup(self)
+
+    def _responder(self, cuerpo):
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        self._responder({"ruta": self.path, "temperatura": 24.5})
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        self._responder({"recibido": len(self.rfile.read(largo))})
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=921600)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--handshake", type=float, default=0.02, help="segundos extra por conexión nueva")
+    args = parser.parse_args()
+
+    Servidor.handshake = args.handshake
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Servidor)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = "http://127.0.0.1:%d" % servidor.server_address[1]
+
+    for reusar in (False, True):
+        emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}], http=ClienteHTTP())
+        emu.red_conectada = emu.redes[0]
+        esp = ESP32UART(uart=TransporteEmulado(emu, baudrate=args.baudios))
+        latencias = []
+        errores = 0
+        for i in range(args.peticiones):
+            if i % 2:
+                comando = {"cmd": "POST", "url": base + "/datos", "data": {"dato1": i}}
+            else:
+                comando = {"cmd": "GET", "url": base + "/sensor?i=%d" % i}
+            if not reusar:
+                comando["reuse"] = False
+            inicio = time.perf_counter()
+            esp.solicitar_comando(comando)
+            codigos = [registro.valor for registro in esp.respuestas(timeout=10) if registro.tipo == HTTP]
+            latencias.append(time.perf_counter() - inicio)
+            if codigos != [200]:
+                errores += 1
+        esp.solicitar_comando({"cmd": "INFO"})
+        info = [registro.valor for registro in esp.respuestas() if registro.tipo == JSON][0]
+        print("%-10s media %7.2f ms  p95 %7.2f ms  %5d peticiones  %5d reusos  errores %d"
+              % ("reuso" if reusar else "sin reuso", 1000 * sum(latencias) / len(latencias),
+                 1000 * percentil(latencias, 0.95), info["http"], info["reuse"], errores))
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark del separador de líneas: buffer creciente (leer_respuesta original)
+contra LectorLineas (bytearray preasignado + readinto + memoryview).
+
+Simula respuestas de GET de 1 KB, 16 KB y 64 KB que el ESP32 envía en una
+sola línea, seguidas del marcador {"end": true}. La UART entrega los datos en
+bloques como lo hace el FIFO de recepción de CircuitPython.
+
+    python3 Software/Benchmark/bench_lineas.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet.lineas import LectorLineas  # noqa: E402
+
+
+class UARTMemoria:
+    """UART falsa que entrega 'datos' de a 'bloque' bytes por lectura disponible."""
+
+    def __init__(self, datos, bloque):
+        self.datos = memoryview(datos)
+        self.bloque = bloque
+        self.pos = 0
+
+    @property
+    def in_waiting(self):
+        return min(self.bloque, len(self.datos) - self.pos)
+
+    def read(self, nbytes):
+        n = min(nbytes, len(self.datos) - self.pos)
+        if n <= 0:
+            return None
+        datos = bytes(self.datos[self.pos:self.pos + n])
+        self.pos += n
+        return datos
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.datos) - self.pos)
+        if n <= 0:
+            return None
+        buf[:n] = self.datos[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def respuesta_get(tamano):
+    cuerpo = (b'{"k":"' + b"x" * 58 + b'"},') * (tamano // 64)
+    return b"[ESP32] GET http://api/ -> C\xc3\xb3digo: 200\n" + cuerpo + b'\r\n{"end": true}\r\n'
+
+
+def separar_original(uart):
+    # Mismo algoritmo que la versión anterior de leer_respuesta
+    buffer = b""
+    lineas = 0
+    while True:
+        data = uart.read(64)
+        if not data:
+            return lineas
+        buffer += data
+        while b"\n" in buffer:
+            linea, buffer = buffer.split(b"\n", 1)
+            lineas += 1
+
+
+def separar_lector(uart):
+    lector = LectorLineas(uart)
+    lineas = 0
+    while True:
+        linea = lector.siguiente()
+        if linea is None:
+            if not lector.llenar():
+                return lineas
+            continue
+        if not lector.fragmento:
+            lineas += 1
+
+
+def medir(nombre, funcion, datos, bloque, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        uart = UARTMemoria(datos, bloque)
+        inicio = time.perf_counter()
+        lineas = funcion(uart)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    print("%-9s %6d KB  %3d lineas  %9.2f MB/s" % (nombre, len(datos) // 1024, lineas, len(datos) / mejor / 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1, 16, 64], help="KB por respuesta")
+    parser.add_argument("--bloque", type=int, default=256, help="bytes disponibles por lectura")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    for kb in args.tamanos:
+        datos = respuesta_get(kb * 1024)
+        medir("original", separar_original, datos, args.bloque, args.repeticiones)
+        medir("lector", separar_lector, datos, args.bloque, args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark de comandos en vuelo (ClientePipeline) contra el esquema enviar-y-esperar.
+
+Cada ciclo hace un GET (con latencia HTTP simulada en el ESP32) y publica
+varios endpoints con WebServer, como los ejemplos WebServer-API-*.
+
+    python3 Software/Benchmark/bench_pipeline.py --ciclos 20 --latencia-http 0.05
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.pipeline import ClientePipeline  # noqa: E402
+
+
+def _http_local(metodo, url, cuerpo):
+    return 200, '{"userId": 1, "id": 1, "title": "delectus aut autem", "completed": false}'
+
+
+def crear_esp(baudios, latencia_http):
+    emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}], http=_http_local,
+                        latencias={"http": latencia_http})
+    emu.red_conectada = emu.redes[0]
+    return ESP32UART(uart=TransporteEmulado(emu, baudrate=baudios), ready_pin=emu.pin_ready)
+
+
+def comandos_ciclo(endpoints):
+    comandos = [{"cmd": "GET", "url": "http://jsonplaceholder.typicode.com/todos/1"}]
+    for i in range(endpoints):
+        comandos.append({"cmd": "WebServer", "label": "Sensor%d" % i, "data": {"valor": i}})
+    return comandos
+
+
+def medir_secuencial(esp, ciclos, endpoints):
+    inicio = time.perf_counter()
+    for _ in range(ciclos):
+        for comando in comandos_ciclo(endpoints):
+            esp.solicitar_comando(comando)
+            list(esp.respuestas(timeout=5))
+    return time.perf_counter() - inicio
+
+
+def medir_pipeline(esp, ciclos, endpoints, ventana):
+    cliente = ClientePipeline(esp, max_en_vuelo=ventana)
+    inicio = time.perf_counter()
+    for _ in range(ciclos):
+        cliente.ejecutar(comandos_ciclo(endpoints), timeout=5)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--ciclos", type=int, default=20)
+    parser.add_argument("--endpoints", type=int, default=5)
+    parser.add_argument("--latencia-http", type=float, default=0.05)
+    parser.add_argument("--ventanas", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    total = args.ciclos * (args.endpoints + 1)
+    duracion = medir_secuencial(crear_esp(args.baudios, args.latencia_http), args.ciclos, args.endpoints)
+    print("secuencial        %7.2f s  %7.1f cmd/s" % (duracion, total / duracion))
+    for ventana in args.ventanas:
+        esp = crear_esp(args.baudios, args.latencia_http)
+        duracion = medir_pipeline(esp, args.ciclos, args.endpoints, ventana)
+        print("pipeline (x%-2d)    %7.2f s  %7.1f cmd/s" % (ventana, duracion, total / duracion))
+
+
+if __name__ == "__main__":
+    main()
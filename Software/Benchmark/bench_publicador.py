@@ -0,0 +1,83 @@
+"""
+Benchmark de publicación de endpoints: un WebServer por label contra "batch" y "merge".
+
+Publica los mismos N sensores varias veces, primero con un comando WebServer
+por label (como los ejemplos originales) y luego con PublicadorEndpoints, que
+los agrupa en un solo comando: enviando cada endpoint completo ("batch") o
+solo las claves que cambiaron ("merge"). Con --campos cada sensor lleva esa
+cantidad de campos fijos además de la lectura. Usa el emulador, no necesita
+hardware.
+
+    python3 Software/Benchmark/bench_publicador.py --sensores 10 --rondas 20
+    python3 Software/Benchmark/bench_publicador.py --sensores 4 --campos 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.publicador import PublicadorEndpoints  # noqa: E402
+
+
+def lecturas(sensores, campos):
+    resultado = {}
+    for i in range(sensores):
+        datos = {"campo%d" % j: "valor fijo %d" % j for j in range(campos)}
+        datos["dato1"] = round(random.uniform(20, 30), 1)
+        resultado["Sensor%d" % i] = datos
+    return resultado
+
+
+def por_label(esp, sensores, campos, rondas):
+    comandos = 0
+    for _ in range(rondas):
+        for label, datos in lecturas(sensores, campos).items():
+            esp.solicitar_comando({"cmd": "WebServer", "label": label, "data": datos})
+            list(esp.respuestas(timeout=2))
+            comandos += 1
+    return comandos
+
+
+def agrupado(esp, sensores, campos, rondas, combinar=False):
+    publicador = PublicadorEndpoints(esp, periodo=0)
+    for _ in range(rondas):
+        for label, datos in lecturas(sensores, campos).items():
+            publicador.actualizar(label, datos)
+        if not combinar:
+            publicador.olvidar()  # Cada endpoint viaja completo
+        publicador.publicar()
+    return publicador.comandos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--sensores", type=int, default=10)
+    parser.add_argument("--rondas", type=int, default=20)
+    parser.add_argument("--campos", type=int, default=0)
+    parser.add_argument("--latencia-comando", type=float, default=0.005)
+    args = parser.parse_args()
+
+    for nombre, publicar in (("por label", por_label), ("batch", agrupado),
+                             ("merge", lambda *a: agrupado(*a, combinar=True))):
+        emu = EmuladorESP32(latencias={"comando": args.latencia_comando})
+        uart = TransporteEmulado(emu, baudrate=args.baudios)
+        esp = ESP32UART(uart=uart)
+        esp.capacidades()  # CAPS se consulta una sola vez, fuera de la medición
+        tx, rx = uart.bytes_tx, uart.bytes_rx
+        inicio = time.perf_counter()
+        comandos = publicar(esp, args.sensores, args.campos, args.rondas)
+        duracion = time.perf_counter() - inicio
+        print("%-10s %6.2f s  %6.1f publicaciones/s  %4d comandos  %7d B enviados  %7d B recibidos  %d endpoints"
+              % (nombre, duracion, args.rondas / duracion, comandos, uart.bytes_tx - tx,
+                 uart.bytes_rx - rx, len(emu.endpoints)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark de SCAN: escanear en cada consulta contra la caché del ESP32 con filtros.
+
+Repite --veces un SCAN con "ttl": 0 (escaneo nuevo en cada consulta, como
+antes) y el mismo SCAN con el ttl por defecto, que después del primero sale
+de la caché del ESP32. Luego mide un SCAN filtrado en el ESP32 (min_rssi y
+max), que además achica la línea que cruza la UART. Usa el emulador con
+--redes redes visibles y --scan segundos por escaneo; no necesita hardware.
+
+    python3 Software/Benchmark/bench_scan.py --scan 2 --redes 30
+    python3 Software/Benchmark/bench_scan.py --veces 10 --baudios 921600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.wifi import escanear  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--veces", type=int, default=5)
+    parser.add_argument("--redes", type=int, default=30, help="redes visibles (algunas con varios BSSID)")
+    parser.add_argument("--scan", type=float, default=2.0, help="segundos que tarda un escaneo")
+    args = parser.parse_args()
+
+    # Un SSID cada dos BSSID, como una red con varios puntos de acceso
+    redes = [{"ssid": "Red%02d" % (i // 2), "pass": "12345678", "rssi": -40 - i, "channel": 1 + i % 11,
+              "bssid": "24:0A:C4:00:%02X:%02X" % (i // 256, i % 256)} for i in range(args.redes)]
+    emu = EmuladorESP32(redes=redes, latencias={"scan": args.scan})
+    esp = ESP32UART(uart=TransporteEmulado(emu, baudrate=args.baudios))
+
+    pruebas = (
+        ("ttl 0 (sin caché)", {"ttl": 0}),
+        ("caché", {}),
+        ("caché filtrada", {"min_rssi": -55, "maximo": 5}),
+    )
+    for nombre, filtros in pruebas:
+        escaneos = emu.escaneos
+        total = 0.0
+        for _ in range(args.veces):
+            inicio = time.perf_counter()
+            encontradas = escanear(esp, timeout=args.scan + 15, **filtros)
+            total += time.perf_counter() - inicio
+        print("%-18s %8.1f ms por SCAN  %3d redes  %d escaneos"
+              % (nombre, total / args.veces * 1000, len(encontradas), emu.escaneos - escaneos))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark de eventos SSE: consultas periódicas contra GET /events.
+
+Publica N actualizaciones de un label, separadas en promedio --intervalo
+segundos (tiempo simulado). Un navegador que consulta cada --periodo segundos
+ve cada valor recién en su próxima consulta y hace una petición HTTP por
+consulta, cambie o no el valor. Suscrito a /events recibe cada actualización
+apenas el ESP32 la aplica: su latencia queda acotada por la ida y vuelta del
+comando WebServer por la UART, que es lo que se mide.
+Usa el emulador, no necesita hardware.
+
+    python3 Software/Benchmark/bench_sse.py --actualizaciones 200 --periodo 2
+    python3 Software/Benchmark/bench_sse.py --baudios 115200 --periodo 0.5
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.publicador import PublicadorEndpoints  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=921600)
+    parser.add_argument("--actualizaciones", type=int, default=200)
+    parser.add_argument("--intervalo", type=float, default=1.0, help="segundos promedio entre actualizaciones")
+    parser.add_argument("--periodo", type=float, default=2.0, help="segundos entre consultas del navegador")
+    parser.add_argument("--latencia-comando", type=float, default=0.002)
+    args = parser.parse_args()
+
+    emu = EmuladorESP32(latencias={"comando": args.latencia_comando})
+    esp = ESP32UART(uart=TransporteEmulado(emu, baudrate=args.baudios))
+    esp.capacidades()
+    publicador = PublicadorEndpoints(esp, periodo=0)
+    _, _, cliente = emu.servir("/events?label=Temperatura")
+
+    instante = 0.0
+    instantes = []
+    latencias_sse = []
+    for i in range(args.actualizaciones):
+        instante += random.expovariate(1.0 / args.intervalo)
+        instantes.append(instante)
+        publicador.actualizar("Temperatura", {"dato1": i})
+        inicio = time.perf_counter()
+        publicador.publicar()
+        confirmado = time.perf_counter()
+        if cliente.leer():
+            latencias_sse.append(confirmado - inicio)
+
+    # El navegador que consulta ve cada valor en la consulta siguiente a su publicación
+    latencias_consulta = [math.ceil(t / args.periodo) * args.periodo - t for t in instantes]
+    consultas = int(math.ceil(instantes[-1] / args.periodo))
+    print("consultas   %5d peticiones HTTP  latencia media %8.1f ms  máxima %8.1f ms  (valores nunca vistos: %d)"
+          % (consultas, 1000 * sum(latencias_consulta) / len(latencias_consulta), 1000 * max(latencias_consulta),
+             len(instantes) - len(set(math.ceil(t / args.periodo) for t in instantes))))
+    print("SSE         %5d peticiones HTTP  latencia media %8.1f ms  máxima %8.1f ms  (%d eventos)"
+          % (1, 1000 * sum(latencias_sse) / len(latencias_sse), 1000 * max(latencias_sse), len(latencias_sse)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark de tramas binarias (FRAMING binary) contra líneas JSON.
+
+Mide el cuerpo útil por segundo de un GET y de una subida de HTML en ambos
+modos, y si el contenido llegó intacto: en modo texto el firmware reemplaza
+los saltos de línea del cuerpo y el HTML viaja escapado dentro de JSON.
+
+    python3 Software/Benchmark/bench_tramas.py --baudios 921600 --kb 16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+from archinet.respuestas import CUERPO  # noqa: E402
+
+
+def generar_html(kb):
+    fila = '<tr><td class="v">%d</td><td>"ñandú"</td></tr>\n'
+    partes = ["<table>\n"]
+    i = 0
+    while sum(len(p) for p in partes) < kb * 1024:
+        partes.append(fila % i)
+        i += 1
+    return "".join(partes) + "</table>\n"
+
+
+def crear_esp(baudios, html):
+    emu = EmuladorESP32(redes=[{"ssid": "Bench", "pass": "12345678"}],
+                        http=lambda metodo, url, cuerpo: (200, html))
+    emu.red_conectada = emu.redes[0]
+    return emu, ESP32UART(uart=TransporteEmulado(emu, baudrate=baudios))
+
+
+def medir_get(esp, html, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        esp.solicitar_comando({"cmd": "GET", "url": "http://servidor/tabla.html"})
+        partes = [r.valor for r in esp.respuestas(timeout=30) if r.tipo == CUERPO]
+    duracion = time.perf_counter() - inicio
+    if partes and isinstance(partes[0], bytes):
+        intacto = b"".join(partes) == html.encode()
+    else:
+        intacto = "".join(partes) == html
+    return repeticiones * len(html.encode()) / duracion, intacto
+
+
+def medir_html(emu, esp, html, fragmento=512):
+    inicio = time.perf_counter()
+    if esp.tramas is not None:
+        esp.enviar_datos(html.encode())
+        esp.solicitar_comando({"cmd": "HTML", "raw": True})
+        list(esp.respuestas(timeout=30))
+    else:
+        total = (len(html) + fragmento - 1) // fragmento
+        for i in range(total):
+            esp.solicitar_comando({"cmd": "HTML", "index": i, "total": total,
+                                   "content": html[i * fragmento:(i + 1) * fragmento]})
+            list(esp.respuestas(timeout=30))
+    duracion = time.perf_counter() - inicio
+    return len(html.encode()) / duracion, emu.html_page == html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=921600)
+    parser.add_argument("--kb", type=int, default=16)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    html = generar_html(args.kb)
+    for modo in ("texto", "tramas"):
+        emu, esp = crear_esp(args.baudios, html)
+        if modo == "tramas" and not esp.activar_tramas():
+            print("El ESP32 no aceptó FRAMING binary")
+            return
+        for nombre, (velocidad, intacto) in (("GET", medir_get(esp, html, args.repeticiones)),
+                                             ("HTML", medir_html(emu, esp, html))):
+            print("%-7s %-5s %9.0f B/s de contenido  %s"
+                  % (modo, nombre, velocidad, "intacto" if intacto else "MODIFICADO"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark de CONNECT: esperar la respuesta contra "async" con eventos, y la reconexión automática.
+
+Con CONNECT esperando la respuesta, el host no publica nada hasta que el ESP32
+conecta. Con "async": true el CONNECT vuelve al momento y el host sigue
+publicando un endpoint cada --periodo segundos mientras atiende los eventos
+hasta ver "connected". Después se apaga el AP y se mide cuánto tarda la
+reconexión automática, que usa el BSSID y el canal guardados. Usa el
+emulador con --connect y --rapido segundos por intento; no necesita hardware.
+
+    python3 Software/Benchmark/bench_wifi.py --connect 3 --rapido 0.6
+    python3 Software/Benchmark/bench_wifi.py --periodo 0.05
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archinet import ESP32UART  # noqa: E402
+from archinet.emulador import EmuladorESP32, TransporteEmulado  # noqa: E402
+
+
+def publicar(esp, n):
+    esp.solicitar_comando({"cmd": "WebServer", "label": "Temperatura", "data": {"n": n}})
+    list(esp.respuestas(5))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baudios", type=int, default=115200)
+    parser.add_argument("--connect", type=float, default=3.0, help="segundos de un CONNECT con escaneo")
+    parser.add_argument("--rapido", type=float, default=0.6, help="segundos con BSSID y canal en caché")
+    parser.add_argument("--periodo", type=float, default=0.1, help="segundos entre publicaciones")
+    args = parser.parse_args()
+
+    redes = [{"ssid": "Bench", "pass": "12345678", "channel": 6}]
+    for nombre, asincrono in (("CONNECT esperando", False), ("CONNECT async", True)):
+        emu = EmuladorESP32(redes=redes, latencias={"connect": args.connect, "connect_rapido": args.rapido})
+        esp = ESP32UART(uart=TransporteEmulado(emu, baudrate=args.baudios))
+        publicaciones = 0
+        inicio = time.perf_counter()
+        comando = {"cmd": "CONNECT", "ssid": "Bench", "pass": "12345678"}
+        if asincrono:
+            comando["async"] = True
+        esp.solicitar_comando(comando)
+        list(esp.respuestas(args.connect + 15))
+        # Mientras conecta, el host sigue con lo suyo y solo mira los eventos ya recibidos
+        while esp.wifi is not None and esp.wifi["state"] != "connected":
+            publicar(esp, publicaciones)
+            publicaciones += 1
+            esp.atender_eventos(args.periodo)
+        conexion = time.perf_counter() - inicio
+        print("%-22s %6.2f s hasta conectar  %4d publicaciones mientras tanto" % (nombre, conexion, publicaciones))
+
+    # El AP se reinicia: el enlace se cae y vuelve solo, sin un CONNECT nuevo
+    redes[0]["activa"] = False
+    esp.atender_eventos(1)
+    inicio = time.perf_counter()
+    redes[0]["activa"] = True
+    esp.esperar_wifi(args.connect + 15)
+    print("%-22s %6.2f s hasta volver (intento %d, rápido: %s)"
+          % ("reconexión automática", time.perf_counter() - inicio, esp.wifi["attempt"], esp.wifi["fast"]))
+
+
+if __name__ == "__main__":
+    main()
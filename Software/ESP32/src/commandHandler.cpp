@@ -15,6 +15,8 @@ const gpio_num_t READY_PIN = GPIO_NUM_48;
 HardwareSerial UART1(2);
 WebServer server(80);
 bool uartEnabled = true; // Variable global para estado UART
+unsigned long uartBaud = 115200; // Velocidad actual de UART1 (cambia con BAUD)
+bool binaryFraming = false;      // Tramas binarias en lugar de líneas JSON (cambia con FRAMING)
 // === Fragmentos HTML ===
 String htmlPage = "<h1> ArchiNET </h1>";
 String htmlBuffer = "";
@@ -22,13 +24,22 @@ int expectedTotalParts = 0;
 int receivedParts = 0;
 
 // === Endpoints ===
-const int MAX_ENDPOINTS = 10;
-EndpointData endpoints[MAX_ENDPOINTS];
-int endpointCount = 0;
+std::vector<EndpointData> endpoints;
+int endpointCapacity = 0; // Se calcula en initEndpointTable() según el heap libre
+
+// === Identificador de petición ===
+String currentRequestId = "";
+
+// Limpia el id de la petición al salir de handleCommand, también en los return anticipados
+struct RequestIdScope
+{
+  ~RequestIdScope() { currentRequestId = ""; }
+};
 
 void handleCommand(const String &cmd)
 {
   Serial.printf("[ESP32] Procesando comando: %s\n", cmd.c_str());
+  RequestIdScope requestIdScope;
 
   if (cmd.startsWith("{") && cmd.endsWith("}"))
   {
@@ -36,15 +47,22 @@ void handleCommand(const String &cmd)
     DeserializationError error = deserializeJson(doc, cmd);
     if (error)
     {
-      UART1.printf("[ESP32] Error al parsear JSON: %s\n", error.c_str());
+      uartPrintf("[ESP32] Error al parsear JSON: %s\n", error.c_str());
       return;
     }
 
+    // "id" opcional: se repite como prefijo "@<id> " en cada línea de la respuesta
+    if (!doc["id"].isNull())
+    {
+      currentRequestId = doc["id"].as<String>();
+      currentRequestId.replace(" ", "_");
+    }
+
     String command = doc["cmd"] | "";
 
     if (command == "SCAN")
     {
-      scanNetworks();
+      scanNetworks(doc);
     }
     else if (command == "CONNECT")
     {
@@ -52,11 +70,11 @@ void handleCommand(const String &cmd)
       String pass = doc["pass"] | "";
       if (ssid != "" && pass != "")
       {
-        connectToWiFi(ssid, pass);
+        connectToWiFi(ssid, pass, doc["async"] | false);
       }
       else
       {
-        UART1.println("[ESP32] Falta SSID o PASS en CONNECT.");
+        uartPrintln("[ESP32] Falta SSID o PASS en CONNECT.");
       }
     }
     else if (command == "DISCONNECT")
@@ -77,8 +95,8 @@ void handleCommand(const String &cmd)
       }
       else
       {
-        UART1.println("[ESP32] Faltan datos para AP");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] Faltan datos para AP");
+        uartEnd();
       }
     }
     else if (command == "PING")
@@ -87,25 +105,37 @@ void handleCommand(const String &cmd)
                          ? WiFi.softAPIP()
                          : WiFi.localIP();
 
-      UART1.println("[ESP32] PING recibido. Estoy activo.");
-      UART1.printf("[ESP32] IP actual: %s\n", ip.toString().c_str());
-      UART1.println("{\"end\": true}");
+      uartPrintln("[ESP32] PING recibido. Estoy activo.");
+      uartPrintf("[ESP32] IP actual: %s\n", ip.toString().c_str());
+      uartEnd();
     }
     else if (command == "POST")
     {
       String url = doc["url"] | "";
       String payload;
-      if (doc.containsKey("data"))
+      String contentType = "application/json";
+      if (doc["raw"] | false)
+      {
+        // Cuerpo enviado antes en tramas 'D', sin pasar por JSON
+        if (!takeRawBody(payload))
+        {
+          uartPrintln("[ESP32] Datos binarios inválidos para POST (demasiado grandes o con una trama corrupta)");
+          uartEnd();
+          return;
+        }
+        contentType = doc["type"] | "application/octet-stream";
+      }
+      else if (doc.containsKey("data"))
         serializeJson(doc["data"], payload);
 
       if (url != "" && payload != "")
       {
-        handleHttpPost(url, payload);
+        handleHttpPost(url, payload, contentType, httpOptions(doc));
       }
       else
       {
-        UART1.println("[ESP32] POST mal formado: falta 'url' o 'data'");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] POST mal formado: falta 'url' o 'data'");
+        uartEnd();
       }
     }
     else if (command == "WebServer")
@@ -113,18 +143,47 @@ void handleCommand(const String &cmd)
       int mode = WiFi.getMode();
       if (!(WiFi.status() == WL_CONNECTED || mode == WIFI_AP || mode == WIFI_AP_STA))
       {
-        UART1.println("[ESP32] No se puede crear endpoint. No conectado a WiFi ni en modo AP.");
+        uartPrintln("[ESP32] No se puede crear endpoint. No conectado a WiFi ni en modo AP.");
+        return;
+      }
+
+      // "batch": varios labels en un solo comando; "merge": solo se envían las claves que cambiaron
+      bool merge = doc["merge"] | false;
+      JsonObject batch = doc["batch"].as<JsonObject>();
+      if (!batch.isNull())
+      {
+        handleWebServerBatch(batch, merge);
         return;
       }
 
       String ep = doc["label"] | "";
       if (ep == "")
       {
-        UART1.println("[ESP32] Comando WebServer mal formado: falta 'label'");
+        uartPrintln("[ESP32] Comando WebServer mal formado: falta 'label'");
         return;
       }
 
       JsonObject dataObj = doc["data"].as<JsonObject>();
+      if (merge)
+      {
+        if (dataObj.isNull())
+        {
+          uartPrintln("[ESP32] Comando WebServer mal formado: 'data' no es un objeto para merge");
+          uartEnd();
+          return;
+        }
+        if (!mergeEndpointData(ep, dataObj))
+        {
+          JsonDocument missing;
+          missing.add(ep);
+          sendMissingEndpoints(missing.as<JsonArrayConst>());
+          return;
+        }
+        uartPrintf("[ESP32] Endpoint /%s actualizado\n", ep.c_str());
+        uartEnd();
+        return;
+      }
+
       String jsonData;
       if (!dataObj.isNull())
       {
@@ -136,14 +195,14 @@ void handleCommand(const String &cmd)
       }
 
       setEndpointData(ep, jsonData);
-      UART1.printf("[ESP32] Endpoint /%s actualizado\n", ep.c_str());
-      UART1.println("{\"end\": true}");
+      uartPrintf("[ESP32] Endpoint /%s actualizado\n", ep.c_str());
+      uartEnd();
     }
     else if (command == "GET")
     {
       String url = doc["url"] | "";
       if (url != "")
-        handleHttpGet(url);
+        handleHttpGet(url, httpOptions(doc));
     }
     else if (command == "INFO")
     {
@@ -151,16 +210,18 @@ void handleCommand(const String &cmd)
                          ? WiFi.softAPIP()
                          : WiFi.localIP();
 
-      UART1.printf("{\"chip\":\"ESP32-S3\",\"ip\":\"%s\",\"rssi\":%d,\"heap\":%d}\n",
-                   ip.toString().c_str(), WiFi.RSSI(), ESP.getFreeHeap());
-      UART1.println("{\"end\": true}");
+      // "http": GET/POST hechos, "reuse": cuántos usaron una conexión ya abierta; "wifi": estado de CONNECT
+      uartPrintf("{\"chip\":\"ESP32-S3\",\"ip\":\"%s\",\"rssi\":%d,\"heap\":%d,\"http\":%lu,\"reuse\":%lu,\"wifi\":\"%s\"}\n",
+                 ip.toString().c_str(), WiFi.RSSI(), ESP.getFreeHeap(),
+                 (unsigned long)httpRequestCount(), (unsigned long)httpReuseCount(), wifiState());
+      uartEnd();
     }
     else if (command == "UART_OFF")
     {
       if (uartEnabled)
       {
-        UART1.println("[ESP32] UART apagado.");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] UART apagado.");
+        uartEnd();
         UART1.flush();
         UART1.end();
         uartEnabled = false;
@@ -174,24 +235,62 @@ void handleCommand(const String &cmd)
     {
       if (!uartEnabled)
       {
-        UART1.begin(115200, SERIAL_8N1, RXD_PIN, TXD_PIN);
+        UART1.setRxBufferSize(UART_RX_BUF_SIZE);
+        UART1.begin(uartBaud, SERIAL_8N1, RXD_PIN, TXD_PIN);
         uartEnabled = true;
-        UART1.println("[ESP32] UART encendido.");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] UART encendido.");
+        uartEnd();
       }
       else
       {
-        UART1.println("[ESP32] UART ya estaba encendido.");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] UART ya estaba encendido.");
+        uartEnd();
       }
     }
     else if (command == "HTML")
     {
-      handleHtmlPart(doc);
+      if (doc["raw"] | false)
+        handleHtmlRaw(doc);
+      else if (!doc["xfer"].isNull())
+        handleHtmlWindowPart(doc);
+      else
+        handleHtmlPart(doc);
+    }
+    else if (command == "FRAMING")
+    {
+      handleFramingRequest(doc);
+    }
+    else if (command == "CAPS")
+    {
+      handleCapabilities();
+    }
+    else if (command == "HASH")
+    {
+      handleHashQuery(doc);
+    }
+    else if (command == "ASSETS")
+    {
+      handleAssetsRequest(doc);
+    }
+    else if (command == "ENDPOINTS")
+    {
+      handleEndpointsRequest(doc);
+    }
+    else if (command == "HISTORY")
+    {
+      handleHistoryRequest(doc);
+    }
+    else if (command == "BAUD")
+    {
+      handleBaudRequest(doc);
+    }
+    else if (command == "PROBE")
+    {
+      handleBaudProbe(doc);
     }
 
     return;
   }
 
-  UART1.println("[ESP32] Comando no reconocido (no JSON y no clásico).");
+  uartPrintln("[ESP32] Comando no reconocido (no JSON y no clásico).");
 }
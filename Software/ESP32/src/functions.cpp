@@ -1,6 +1,727 @@
 #include <Arduino.h>
 #include "globals.h"
 #include "functions.h"
+#include "commandHandler.h"
+#include <algorithm>
+#include <utility>
+#include <vector>
+#include <LittleFS.h>
+#include <WiFiClientSecure.h>
+#include "mbedtls/base64.h"
+#include "rom/miniz.h"
+// ================================= Respuestas UART =======================================================
+// Toda línea de respuesta pasa por aquí para llevar el prefijo "@<id> " cuando el comando trae "id"
+
+void uartPrefix()
+{
+    if (currentRequestId.length() > 0)
+    {
+        UART1.print('@');
+        UART1.print(currentRequestId);
+        UART1.print(' ');
+    }
+}
+
+void uartPrintln(const String &line)
+{
+    if (binaryFraming)
+    {
+        uartSendTextFrame(line.c_str(), line.length());
+        return;
+    }
+    uartPrefix();
+    UART1.println(line);
+}
+
+// Texto ya formateado que termina en '\n'; en modo tramas cada línea va en una trama 'T'
+static void uartWriteText(const char *text, size_t len)
+{
+    if (!binaryFraming)
+    {
+        uartPrefix();
+        UART1.write((const uint8_t *)text, len);
+        return;
+    }
+    size_t start = 0;
+    for (size_t i = 0; i <= len; i++)
+    {
+        if (i == len || text[i] == '\n')
+        {
+            size_t end = i;
+            if (end > start && text[end - 1] == '\r')
+                end--;
+            if (end > start || i < len)
+                uartSendTextFrame(text + start, end - start);
+            start = i + 1;
+        }
+    }
+}
+
+void uartPrintf(const char *format, ...)
+{
+    char buf[256];
+    va_list args;
+    va_start(args, format);
+    int len = vsnprintf(buf, sizeof(buf), format, args);
+    va_end(args);
+    if (len < 0)
+        return;
+
+    if ((size_t)len < sizeof(buf))
+    {
+        uartWriteText(buf, len);
+        return;
+    }
+    // Línea más larga que el buffer local: se formatea en el heap
+    char *big = (char *)malloc(len + 1);
+    if (big == nullptr)
+        return;
+    va_start(args, format);
+    vsnprintf(big, len + 1, format, args);
+    va_end(args);
+    uartWriteText(big, len);
+    free(big);
+}
+
+// Marcador de fin de respuesta
+void uartEnd()
+{
+    uartPrintln("{\"end\": true}");
+}
+
+// Evento espontáneo: una línea "!{...}" fuera de las respuestas, sin "@<id> " aunque se envíe durante un comando
+void uartEvent(const JsonDocument &doc)
+{
+    String line = "!";
+    serializeJson(doc, line);
+    String requestId = currentRequestId;
+    currentRequestId = "";
+    uartPrintln(line);
+    currentRequestId = requestId;
+}
+
+// Cuerpo de una respuesta HTTP. En modo texto va en una sola línea (los saltos se
+// reemplazan por espacios); en modo tramas va sin modificar en tramas 'D'.
+void uartBody(String &payload, bool trim)
+{
+    if (binaryFraming)
+    {
+        const uint8_t *data = (const uint8_t *)payload.c_str();
+        size_t len = payload.length();
+        for (size_t sent = 0; sent < len; sent += FRAME_MAX_PAYLOAD)
+            uartSendFrame(FRAME_DATA, data + sent, min(len - sent, FRAME_MAX_PAYLOAD));
+        return;
+    }
+    if (trim)
+        payload.trim();
+    payload.replace("\n", " ");
+    payload.replace("\r", " ");
+    uartPrefix();
+    UART1.print(payload);
+    UART1.println();
+}
+
+// ================================= CRC =====================================================================
+// CRC-16/CCITT-FALSE (polinomio 0x1021, valor inicial 0xFFFF); 'crc' permite encadenar bloques
+uint16_t crc16(const uint8_t *data, size_t len, uint16_t crc)
+{
+    for (size_t i = 0; i < len; i++)
+    {
+        crc ^= (uint16_t)data[i] << 8;
+        for (int bit = 0; bit < 8; bit++)
+            crc = (crc & 0x8000) ? (uint16_t)((crc << 1) ^ 0x1021) : (uint16_t)(crc << 1);
+    }
+    return crc;
+}
+
+// ================================= Tramas binarias ========================================================
+// Modo opcional (comando FRAMING): cada mensaje va como
+//   0xA5 | tipo | largo (2 bytes LE) | datos | CRC16 (2 bytes LE, sobre tipo + largo + datos)
+// 'J' comando JSON, 'T' línea de respuesta, 'D' bytes crudos, 'N' trama recibida corrupta.
+static const unsigned long FRAME_TIMEOUT_MS = 200; // Trama incompleta: se descarta
+static const size_t RAW_BODY_MAX = 65536;
+static uint8_t frameBuf[FRAME_MAX_PAYLOAD + 6];
+static size_t frameLen = 0;
+static unsigned long frameLastByte = 0;
+// Se excedió RAW_BODY_MAX o llegó una trama corrupta: el cuerpo en curso está incompleto
+static bool rawBodyInvalid = false;
+static String rawBody = "";
+
+void uartSendFrame(uint8_t type, const uint8_t *data, size_t len)
+{
+    uint8_t header[4] = {FRAME_START, type, (uint8_t)(len & 0xFF), (uint8_t)(len >> 8)};
+    uint16_t crc = crc16(header + 1, 3);
+    crc = crc16(data, len, crc);
+    uint8_t tail[2] = {(uint8_t)(crc & 0xFF), (uint8_t)(crc >> 8)};
+    UART1.write(header, sizeof(header));
+    if (len > 0)
+        UART1.write(data, len);
+    UART1.write(tail, sizeof(tail));
+}
+
+void uartSendTextFrame(const char *text, size_t len)
+{
+    if (currentRequestId.length() == 0)
+    {
+        uartSendFrame(FRAME_TEXT, (const uint8_t *)text, len);
+        return;
+    }
+    String line = "@" + currentRequestId + " ";
+    line.concat(text, len);
+    uartSendFrame(FRAME_TEXT, (const uint8_t *)line.c_str(), line.length());
+}
+
+// Toma los bytes recibidos con tramas 'D'; false si se excedió RAW_BODY_MAX o hubo un NAK desde el último comando
+bool takeRawBody(String &out)
+{
+    bool ok = !rawBodyInvalid;
+    out = std::move(rawBody);
+    rawBody = "";
+    rawBodyInvalid = false;
+    return ok;
+}
+
+// NAK de una trama corrupta: pudo ser una 'D', así que el cuerpo crudo pendiente ya no sirve
+static void sendNak()
+{
+    uartSendFrame(FRAME_NAK, nullptr, 0);
+    rawBody = "";
+    rawBodyInvalid = true;
+}
+
+static void dispatchFrame(uint8_t type, const uint8_t *data, size_t len)
+{
+    if (type == FRAME_JSON)
+    {
+        String cmd;
+        cmd.concat((const char *)data, len);
+        cmd.trim();
+        if (!cmd.isEmpty())
+            handleCommand(cmd);
+        // El cuerpo crudo es solo para el comando que lo sigue: no pasa al próximo
+        rawBody = "";
+        rawBodyInvalid = false;
+    }
+    else if (type == FRAME_DATA)
+    {
+        if (rawBody.length() + len > RAW_BODY_MAX)
+            rawBodyInvalid = true;
+        else
+            rawBody.concat((const char *)data, len);
+    }
+}
+
+void pollFrames()
+{
+    if (frameLen > 0 && millis() - frameLastByte > FRAME_TIMEOUT_MS)
+        frameLen = 0;
+
+    while (binaryFraming && UART1.available() > 0)
+    {
+        uint8_t c = UART1.read();
+        frameLastByte = millis();
+        if (frameLen == 0 && c != FRAME_START)
+            continue; // Fuera de trama: se busca el próximo inicio
+        frameBuf[frameLen++] = c;
+        if (frameLen < 4)
+            continue;
+
+        size_t payloadLen = frameBuf[2] | (frameBuf[3] << 8);
+        if (payloadLen > FRAME_MAX_PAYLOAD)
+        {
+            frameLen = 0;
+            sendNak();
+            continue;
+        }
+        if (frameLen < payloadLen + 6)
+            continue;
+
+        frameLen = 0;
+        uint16_t crc = frameBuf[payloadLen + 4] | (frameBuf[payloadLen + 5] << 8);
+        if (crc16(frameBuf + 1, payloadLen + 3) != crc)
+        {
+            Serial.println("[ESP32] Trama con CRC inválido descartada");
+            sendNak();
+            continue;
+        }
+        dispatchFrame(frameBuf[1], frameBuf + 4, payloadLen);
+    }
+}
+
+void handleFramingRequest(const JsonDocument &doc)
+{
+    String mode = doc["mode"] | "";
+    if (mode != "binary" && mode != "text")
+    {
+        uartPrintln("[ESP32] FRAMING mal formado: 'mode' debe ser \"binary\" o \"text\"");
+        uartEnd();
+        return;
+    }
+
+    // La respuesta sale en el modo actual; el cambio aplica desde el próximo mensaje
+    uartPrintf("{\"framing\":\"%s\",\"max\":%u}\n", mode.c_str(), (unsigned)FRAME_MAX_PAYLOAD);
+    uartEnd();
+    binaryFraming = (mode == "binary");
+    frameLen = 0;
+    rawBody = "";
+    rawBodyInvalid = false;
+}
+
+// CRC-32 (el de zlib, polinomio reflejado 0xEDB88320); 'crc' permite encadenar bloques
+uint32_t crc32(const uint8_t *data, size_t len, uint32_t crc)
+{
+    crc = ~crc;
+    for (size_t i = 0; i < len; i++)
+    {
+        crc ^= data[i];
+        for (int bit = 0; bit < 8; bit++)
+            crc = (crc >> 1) ^ (0xEDB88320UL & (0UL - (crc & 1)));
+    }
+    return ~crc;
+}
+
+// ================================= Gzip ====================================================================
+// Los archivos subidos con "enc": "gzip" se guardan comprimidos y se sirven tal cual con
+// Content-Encoding: gzip. Para clientes sin gzip se descomprimen al vuelo desde la flash con
+// el inflador de la ROM (tinfl), de a TINFL_LZ_DICT_SIZE bytes, sin armarlos en RAM.
+static const size_t GUNZIP_IN_SIZE = 1024;
+
+// Largo del encabezado gzip (RFC 1952) o 0 si los datos no son un gzip válido
+size_t gzipHeaderLength(const uint8_t *data, size_t len)
+{
+    if (len < 18 || data[0] != 0x1F || data[1] != 0x8B || data[2] != 8)
+        return 0;
+    uint8_t flags = data[3];
+    size_t pos = 10;
+    if (flags & 0x04) // FEXTRA
+    {
+        if (pos + 2 > len)
+            return 0;
+        pos += 2 + (data[pos] | (data[pos + 1] << 8));
+    }
+    if (flags & 0x08) // FNAME
+        while (pos < len && data[pos++] != 0)
+            ;
+    if (flags & 0x10) // FCOMMENT
+        while (pos < len && data[pos++] != 0)
+            ;
+    if (flags & 0x02) // FHCRC
+        pos += 2;
+    return (pos + 8 <= len) ? pos : 0;
+}
+
+// Envía 'file' (gzip) descomprimido; false si no se pudo empezar (nada enviado todavía)
+bool sendGunzipped(File &file, const char *contentType)
+{
+    size_t len = file.size();
+    uint8_t *in = (uint8_t *)malloc(GUNZIP_IN_SIZE);
+    if (in == nullptr)
+        return false;
+    size_t pos = gzipHeaderLength(in, file.read(in, GUNZIP_IN_SIZE));
+    tinfl_decompressor *inflator = (tinfl_decompressor *)malloc(sizeof(tinfl_decompressor));
+    uint8_t *dict = (uint8_t *)malloc(TINFL_LZ_DICT_SIZE);
+    if (pos == 0 || inflator == nullptr || dict == nullptr)
+    {
+        free(in);
+        free(inflator);
+        free(dict);
+        return false;
+    }
+    // ISIZE: largo descomprimido en los últimos 4 bytes
+    uint8_t trailer[4];
+    file.seek(len - 4);
+    file.read(trailer, 4);
+    uint32_t isize = trailer[0] | (trailer[1] << 8) | (trailer[2] << 16) | ((uint32_t)trailer[3] << 24);
+    size_t remaining = len - 8 - pos; // Datos deflate sin leer de la flash
+    file.seek(pos);
+    tinfl_init(inflator);
+
+    server.setContentLength(isize);
+    server.send(200, contentType, "");
+    size_t inOfs = 0;
+    size_t inAvail = 0;
+    size_t dictOfs = 0;
+    tinfl_status status;
+    do
+    {
+        if (inAvail == 0 && remaining > 0)
+        {
+            inAvail = file.read(in, remaining < GUNZIP_IN_SIZE ? remaining : GUNZIP_IN_SIZE);
+            if (inAvail == 0)
+                break;
+            remaining -= inAvail;
+            inOfs = 0;
+        }
+        size_t inBytes = inAvail;
+        size_t outBytes = TINFL_LZ_DICT_SIZE - dictOfs;
+        status = tinfl_decompress(inflator, in + inOfs, &inBytes, dict, dict + dictOfs, &outBytes,
+                                  remaining > 0 ? TINFL_FLAG_HAS_MORE_INPUT : 0);
+        inOfs += inBytes;
+        inAvail -= inBytes;
+        if (outBytes > 0)
+            server.sendContent((const char *)(dict + dictOfs), outBytes);
+        dictOfs = (dictOfs + outBytes) & (TINFL_LZ_DICT_SIZE - 1);
+    } while (status == TINFL_STATUS_HAS_MORE_OUTPUT || (status == TINFL_STATUS_NEEDS_MORE_INPUT && remaining > 0));
+
+    if (status != TINFL_STATUS_DONE)
+        Serial.printf("[ESP32] gzip cortado al descomprimir (%d)\n", (int)status);
+    free(in);
+    free(inflator);
+    free(dict);
+    return true;
+}
+
+// Decodifica 'text' (base64) en el mismo String; false si no es base64 válido
+bool decodeBase64(String &text)
+{
+    size_t len = 0;
+    size_t capacity = (text.length() / 4) * 3 + 3;
+    uint8_t *buf = (uint8_t *)malloc(capacity);
+    if (buf == nullptr)
+        return false;
+    int err = mbedtls_base64_decode(buf, capacity, &len, (const uint8_t *)text.c_str(), text.length());
+    if (err == 0)
+    {
+        text = "";
+        text.concat((const char *)buf, len);
+    }
+    free(buf);
+    return err == 0;
+}
+
+// ================================= Almacén de archivos ===================================================
+// Las páginas y archivos subidos con HTML se guardan en LittleFS, uno por ruta, y sobreviven a los
+// reinicios. En RAM solo queda el índice (ruta, tipo, gzip, CRC-32 y largo), que también se guarda
+// en ASSET_INDEX; el contenido se sirve directo desde la flash. Sin LittleFS, la ruta "/" vuelve
+// a la página en RAM (htmlPage) de siempre.
+struct Asset
+{
+    String path;
+    String type;
+    bool gzip;
+    uint32_t crc;
+    size_t len;
+};
+
+static const int ASSET_MAX = 16;
+static const size_t ASSET_PATH_MAX = 64;
+static const char *ASSET_INDEX = "/assets.json";
+static const char *ASSET_TMP = "/upload.tmp";
+static Asset assets[ASSET_MAX];
+static int assetCount = 0;
+static bool assetStoreReady = false;
+// HASH de la página en RAM: se calcula solo después de cada cambio de htmlPage
+static uint32_t htmlPageCrc = 0;
+static bool htmlPageCrcValid = false;
+
+// Archivo de la flash para 'path' (nombre corto y fijo, sin directorios)
+static String assetFileName(const String &path)
+{
+    char name[16];
+    snprintf(name, sizeof(name), "/a%08lx", (unsigned long)crc32((const uint8_t *)path.c_str(), path.length()));
+    return String(name);
+}
+
+static int findAsset(const String &path)
+{
+    for (int i = 0; i < assetCount; i++)
+    {
+        if (assets[i].path == path)
+            return i;
+    }
+    return -1;
+}
+
+static void saveAssetIndex()
+{
+    JsonDocument index;
+    JsonArray list = index.to<JsonArray>();
+    for (int i = 0; i < assetCount; i++)
+    {
+        JsonObject entry = list.add<JsonObject>();
+        entry["path"] = assets[i].path;
+        entry["type"] = assets[i].type;
+        entry["gzip"] = assets[i].gzip;
+        entry["crc"] = assets[i].crc;
+        entry["len"] = assets[i].len;
+    }
+    File file = LittleFS.open(ASSET_INDEX, "w");
+    if (!file)
+    {
+        Serial.println("[ESP32] No se pudo guardar el índice de archivos");
+        return;
+    }
+    serializeJson(index, file);
+    file.close();
+}
+
+void initAssetStore()
+{
+    assetStoreReady = LittleFS.begin(true); // Formatea la partición si no se puede montar
+    if (!assetStoreReady)
+    {
+        Serial.println("[ESP32] LittleFS no disponible: la página queda en RAM");
+        return;
+    }
+    File file = LittleFS.open(ASSET_INDEX, "r");
+    if (!file)
+        return;
+    JsonDocument index;
+    DeserializationError error = deserializeJson(index, file);
+    file.close();
+    if (error)
+    {
+        Serial.printf("[ESP32] Índice de archivos inválido: %s\n", error.c_str());
+        return;
+    }
+    for (JsonObject entry : index.as<JsonArray>())
+    {
+        if (assetCount >= ASSET_MAX)
+            break;
+        Asset &asset = assets[assetCount];
+        asset.path = entry["path"] | "";
+        asset.type = entry["type"] | "text/html";
+        asset.gzip = entry["gzip"] | false;
+        asset.crc = entry["crc"] | 0UL;
+        asset.len = entry["len"] | 0UL;
+        if (asset.path.length() > 0 && LittleFS.exists(assetFileName(asset.path)))
+            assetCount++;
+    }
+    Serial.printf("[ESP32] %d archivos en flash\n", assetCount);
+}
+
+bool validAssetPath(const String &path)
+{
+    return path.startsWith("/") && path.length() <= ASSET_PATH_MAX && path.indexOf('"') < 0;
+}
+
+// Guarda en 'path' la concatenación de 'parts' sin armarla en RAM. La escritura va a un archivo
+// temporal que reemplaza al anterior solo si se completó: un corte de energía no deja la ruta a medias.
+bool storeAsset(const String &path, const String &type, bool gzip, const String *parts, size_t count)
+{
+    if (!assetStoreReady)
+        return false;
+    int idx = findAsset(path);
+    if (idx < 0 && assetCount >= ASSET_MAX)
+    {
+        Serial.println("[ESP32] No hay espacio para nuevos archivos");
+        return false;
+    }
+
+    File file = LittleFS.open(ASSET_TMP, "w");
+    if (!file)
+        return false;
+    uint32_t crc = 0;
+    size_t len = 0;
+    bool ok = true;
+    for (size_t i = 0; i < count && ok; i++)
+    {
+        const uint8_t *data = (const uint8_t *)parts[i].c_str();
+        size_t n = parts[i].length();
+        ok = file.write(data, n) == n;
+        crc = crc32(data, n, crc);
+        len += n;
+    }
+    file.close();
+    if (!ok || !LittleFS.rename(ASSET_TMP, assetFileName(path)))
+    {
+        LittleFS.remove(ASSET_TMP);
+        return false;
+    }
+
+    if (idx < 0)
+        idx = assetCount++;
+    assets[idx].path = path;
+    assets[idx].type = type;
+    assets[idx].gzip = gzip;
+    assets[idx].crc = crc;
+    assets[idx].len = len;
+    saveAssetIndex();
+    return true;
+}
+
+// Sirve el archivo de 'path' desde la flash; false si no existe
+bool serveAsset(const String &path)
+{
+    int idx = findAsset(path);
+    if (idx < 0)
+        return false;
+    const Asset &asset = assets[idx];
+    File file = LittleFS.open(assetFileName(path), "r");
+    if (!file)
+    {
+        server.send(500, "text/plain", "Archivo no disponible");
+        return true;
+    }
+    if (asset.gzip && server.header("Accept-Encoding").indexOf("gzip") < 0)
+    {
+        if (!sendGunzipped(file, asset.type.c_str()))
+            server.send(500, "text/plain", "No se pudo descomprimir");
+    }
+    else
+    {
+        // El navegador descomprime: se envía el gzip tal como está guardado
+        if (asset.gzip)
+            server.sendHeader("Content-Encoding", "gzip");
+        server.streamFile(file, asset.type);
+    }
+    file.close();
+    return true;
+}
+
+void setHtmlPage(const String &page)
+{
+    htmlPage = page;
+    htmlPageCrcValid = false;
+}
+
+static void printAssetInfo(const String &path, const String &type, bool gzip, uint32_t crc, size_t len)
+{
+    char hex[9];
+    snprintf(hex, sizeof(hex), "%08lx", (unsigned long)crc);
+    JsonDocument info;
+    info["path"] = path;
+    info["type"] = type;
+    info["crc32"] = hex;
+    info["len"] = len;
+    info["enc"] = gzip ? "gzip" : "identity";
+    String line;
+    serializeJson(info, line);
+    uartPrintln(line);
+}
+
+// HASH informa el CRC-32 de un archivo para que Archi no vuelva a subirlo si no cambió
+void handleHashQuery(const JsonDocument &doc)
+{
+    String path = doc["path"] | "/";
+    int idx = findAsset(path);
+    if (idx >= 0)
+    {
+        const Asset &asset = assets[idx];
+        printAssetInfo(asset.path, asset.type, asset.gzip, asset.crc, asset.len);
+    }
+    else if (path == "/")
+    {
+        if (!htmlPageCrcValid)
+        {
+            htmlPageCrc = crc32((const uint8_t *)htmlPage.c_str(), htmlPage.length());
+            htmlPageCrcValid = true;
+        }
+        printAssetInfo(path, "text/html", false, htmlPageCrc, htmlPage.length());
+    }
+    else
+    {
+        uartPrintf("[ESP32] Recurso no encontrado: %s\n", path.c_str());
+    }
+    uartEnd();
+}
+
+// ASSETS lista los archivos guardados; con "delete" borra uno
+void handleAssetsRequest(const JsonDocument &doc)
+{
+    String target = doc["delete"] | "";
+    if (target.length() > 0)
+    {
+        int idx = findAsset(target);
+        if (idx < 0)
+        {
+            uartPrintf("[ESP32] Recurso no encontrado: %s\n", target.c_str());
+            uartEnd();
+            return;
+        }
+        LittleFS.remove(assetFileName(target));
+        assets[idx] = assets[--assetCount];
+        saveAssetIndex();
+        uartPrintf("[ESP32] Archivo borrado: %s\n", target.c_str());
+        uartEnd();
+        return;
+    }
+
+    for (int i = 0; i < assetCount; i++)
+        printAssetInfo(assets[i].path, assets[i].type, assets[i].gzip, assets[i].crc, assets[i].len);
+    if (assetStoreReady)
+        uartPrintf("{\"used\":%u,\"total\":%u}\n", (unsigned)LittleFS.usedBytes(), (unsigned)LittleFS.totalBytes());
+    else
+        uartPrintln("[ESP32] LittleFS no disponible");
+    uartEnd();
+}
+
+// ================================= Negociación de baudios ===============================================
+// BAUD responde a la velocidad actual y cambia; si no llega un PROBE válido a la nueva
+// velocidad en BAUD_PROBE_TIMEOUT_MS se vuelve a la anterior.
+static const unsigned long BAUD_MIN = 9600;
+static const unsigned long BAUD_MAX = 5000000;
+static const unsigned long BAUD_PROBE_TIMEOUT_MS = 2000;
+static unsigned long pendingBaudPrevious = 0; // 0: no hay cambio a confirmar
+static unsigned long pendingBaudSince = 0;
+
+static void switchUartBaud(unsigned long baud)
+{
+    UART1.flush(); // Termina de enviar la respuesta a la velocidad anterior
+    UART1.updateBaudRate(baud);
+    while (UART1.available() > 0)
+        UART1.read(); // Bytes recibidos durante el cambio: basura
+    uartBaud = baud;
+}
+
+void handleBaudRequest(const JsonDocument &doc)
+{
+    unsigned long rate = doc["rate"] | 0UL;
+    if (rate < BAUD_MIN || rate > BAUD_MAX)
+    {
+        uartPrintf("[ESP32] Velocidad no soportada: %lu\n", rate);
+        uartEnd();
+        return;
+    }
+
+    unsigned long previous = pendingBaudPrevious ? pendingBaudPrevious : uartBaud;
+    uartPrintf("{\"baud\":%lu,\"prev\":%lu}\n", rate, previous);
+    uartEnd();
+    switchUartBaud(rate);
+    pendingBaudPrevious = previous;
+    pendingBaudSince = millis();
+    Serial.printf("[ESP32] UART a %lu baudios, esperando PROBE\n", rate);
+}
+
+void handleBaudProbe(const JsonDocument &doc)
+{
+    String data = doc["data"] | "";
+    long crc = doc["crc"] | -1L;
+    uint16_t computed = crc16((const uint8_t *)data.c_str(), data.length());
+
+    if (data.length() == 0 || crc != (long)computed)
+    {
+        uartPrintln("[ESP32] PROBE inválido");
+        uartEnd();
+        if (pendingBaudPrevious)
+        {
+            switchUartBaud(pendingBaudPrevious);
+            pendingBaudPrevious = 0;
+        }
+        return;
+    }
+
+    pendingBaudPrevious = 0; // Enlace confirmado a la velocidad actual
+    JsonDocument reply;
+    reply["probe"] = data;
+    reply["crc"] = computed;
+    reply["baud"] = uartBaud;
+    String line;
+    serializeJson(reply, line);
+    uartPrintln(line);
+    uartEnd();
+}
+
+void checkBaudProbeTimeout()
+{
+    if (pendingBaudPrevious && millis() - pendingBaudSince > BAUD_PROBE_TIMEOUT_MS)
+    {
+        Serial.printf("[ESP32] Sin PROBE, UART vuelve a %lu baudios\n", pendingBaudPrevious);
+        switchUartBaud(pendingBaudPrevious);
+        pendingBaudPrevious = 0;
+    }
+}
+
 // ================================= Manejador de interrupción para RESET =================================
 void IRAM_ATTR onResetSignalHigh()
 {
@@ -9,205 +730,1297 @@ void IRAM_ATTR onResetSignalHigh()
 // ================================================= Manejadores HTTP ======================================
 void handleRoot()
 {
-    server.send(200, "text/html", htmlPage);
+    if (!serveAsset("/"))
+        server.send(200, "text/html", htmlPage);
+}
+
+// Guarda una página completa recibida por HTML (sin "path": la principal) y responde por UART
+static void finishHtmlUpload(const String &path, const String &type, bool gzip, const String *parts, size_t count)
+{
+    if (gzip && (count == 0 || gzipHeaderLength((const uint8_t *)parts[0].c_str(), parts[0].length()) == 0))
+    {
+        uartPrintln("[ESP32] gzip inválido, HTML sin cambios");
+        return;
+    }
+    if (storeAsset(path, type, gzip, parts, count))
+    {
+        uartPrintln("[ESP32] HTML actualizado");
+        return;
+    }
+    if (assetStoreReady || path != "/" || gzip || type != "text/html")
+    {
+        uartPrintln("[ESP32] No se pudo guardar en flash");
+        return;
+    }
+    // Sin LittleFS: la página principal queda en RAM hasta el próximo reinicio
+    size_t len = 0;
+    for (size_t i = 0; i < count; i++)
+        len += parts[i].length();
+    String page;
+    page.reserve(len);
+    for (size_t i = 0; i < count; i++)
+        page += parts[i];
+    setHtmlPage(page);
+    uartPrintln("[ESP32] HTML actualizado");
+}
+
+void handleHtmlPart(const JsonDocument &doc)
+{
+    int index = doc["index"] | -1;
+    int total = doc["total"] | -1;
+    String content = doc["content"] | "";
+
+    if (index < 0 || total < 1 || content.length() == 0)
+    {
+        uartPrintln("[ESP32] Datos HTML_PART inválidos.");
+        uartEnd();
+        return;
+    }
+
+    if (index == 0)
+    {
+        // Primer fragmento: inicializar buffer y contadores
+        htmlBuffer = "";
+        expectedTotalParts = total;
+        receivedParts = 0;
+        Serial.printf("[ESP32] Inicio recepción HTML en %d fragmentos\n", total);
+    }
+
+    // Validar orden correcto de fragmentos
+    if (index != receivedParts)
+    {
+        uartPrintf("[ESP32] Fragmento fuera de orden: esperado %d, recibido %d\n", receivedParts, index);
+        uartEnd();
+        return;
+    }
+
+    // Concatenar fragmento al buffer
+    htmlBuffer += content;
+    receivedParts++;
+
+    // UART1.printf("[ESP32] Recibido fragmento %d/%d\n", index + 1, total);
+
+    // Cuando llegan todos los fragmentos, actualizo la página HTML
+    if (receivedParts == expectedTotalParts)
+    {
+        finishHtmlUpload("/", "text/html", false, &htmlBuffer, 1);
+        htmlBuffer = "";
+        // Serial.println("[ESP32] HTML actualizado con todos los fragmentos recibidos.");
+        expectedTotalParts = 0;
+        receivedParts = 0;
+    }
+
+    uartEnd();
+}
+
+// ======================= HTML por ventana deslizante ==================================
+// Con "xfer" los fragmentos pueden llegar en cualquier orden y Archi envía varios sin
+// esperar. Cada respuesta confirma de forma acumulada: "ack" es la cantidad de fragmentos
+// contiguos desde 0 y "missing" los que faltan hasta "high", para reenviar solo esos.
+static const int HTML_PARTS_MAX = 256;
+static const size_t HTML_MISSING_MAX = 16;
+static long htmlXfer = -1;     // Transferencia en curso
+static long htmlXferDone = -1; // Última transferencia completada (ignora reenvíos tardíos)
+static String htmlXferPath;    // Ruta y tipo de la transferencia en curso
+static String htmlXferType;
+static std::vector<String> htmlParts;
+static std::vector<bool> htmlHave;
+static int htmlHaveCount = 0;
+static int htmlHighest = -1;
+
+static void sendHtmlAck(int total)
+{
+    JsonDocument reply;
+    JsonArray missing = reply["missing"].to<JsonArray>();
+    int ack = total;
+    int high = total - 1;
+    if (htmlXfer >= 0)
+    {
+        ack = 0;
+        while (ack < total && htmlHave[ack])
+            ack++;
+        high = htmlHighest;
+        for (int i = ack; i <= htmlHighest; i++)
+        {
+            if (htmlHave[i])
+                continue;
+            if (missing.size() == HTML_MISSING_MAX)
+            {
+                high = i - 1; // La lista de faltantes está completa solo hasta aquí
+                break;
+            }
+            missing.add(i);
+        }
+    }
+    reply["ack"] = ack;
+    reply["high"] = high;
+    String line;
+    serializeJson(reply, line);
+    uartPrintln(line);
+}
+
+void handleHtmlWindowPart(const JsonDocument &doc)
+{
+    long xfer = doc["xfer"] | -1L;
+    int index = doc["index"] | -1;
+    int total = doc["total"] | -1;
+    String content = doc["content"] | "";
+    String path = doc["path"] | "/";
+
+    if (xfer < 0 || index < 0 || total < 1 || total > HTML_PARTS_MAX || index >= total || content.length() == 0 ||
+        !validAssetPath(path))
+    {
+        uartPrintln("[ESP32] Datos HTML_PART inválidos.");
+        uartEnd();
+        return;
+    }
+
+    if (xfer == htmlXferDone)
+    {
+        // Reenvío de una transferencia ya completa: solo se confirma
+        sendHtmlAck(total);
+        uartEnd();
+        return;
+    }
+
+    // "gzip": base64 de un gzip; "base64": base64 de un archivo binario
+    String enc = doc["enc"] | "";
+    bool gzip = enc == "gzip";
+    if ((gzip || enc == "base64") && !decodeBase64(content))
+    {
+        uartPrintln("[ESP32] Datos HTML_PART inválidos.");
+        uartEnd();
+        return;
+    }
+
+    if (xfer != htmlXfer || (int)htmlParts.size() != total)
+    {
+        htmlXfer = xfer;
+        htmlXferPath = path;
+        htmlXferType = doc["type"] | "text/html";
+        htmlParts.assign(total, String());
+        htmlHave.assign(total, false);
+        htmlHaveCount = 0;
+        htmlHighest = -1;
+        Serial.printf("[ESP32] Inicio recepción HTML %ld en %d fragmentos\n", xfer, total);
+    }
+
+    if (!htmlHave[index])
+    {
+        htmlParts[index] = content;
+        htmlHave[index] = true;
+        htmlHaveCount++;
+    }
+    if (index > htmlHighest)
+        htmlHighest = index;
+
+    if (htmlHaveCount == total)
+    {
+        finishHtmlUpload(htmlXferPath, htmlXferType, gzip, htmlParts.data(), htmlParts.size());
+        htmlXferDone = xfer;
+        htmlXfer = -1;
+        std::vector<String>().swap(htmlParts); // Libera la memoria de los fragmentos
+        std::vector<bool>().swap(htmlHave);
+    }
+
+    sendHtmlAck(total);
+    uartEnd();
+}
+
+// Archivo completo enviado en tramas 'D' (modo FRAMING binary): reemplaza el de "path" de una vez
+void handleHtmlRaw(const JsonDocument &doc)
+{
+    String content;
+    String path = doc["path"] | "/";
+    if (!takeRawBody(content) || content.length() == 0 || !validAssetPath(path))
+    {
+        uartPrintln("[ESP32] Datos HTML binarios inválidos.");
+        uartEnd();
+        return;
+    }
+    finishHtmlUpload(path, doc["type"] | "text/html", String(doc["enc"] | "") == "gzip", &content, 1);
+    uartEnd();
+}
+
+// ========================== Funciones para gestionar el Access Point (AP) =============================
+
+// Inicia el Access Point con el SSID y la contraseña proporcionados
+void startAccessPoint(const String &ssid, const String &pass)
+{
+
+    bool result = WiFi.softAP(ssid.c_str(), pass.c_str());
+
+    if (result)
+    {
+        IPAddress IP = WiFi.softAPIP();
+        uartPrintf("[ESP32] AP iniciado: %s | IP: %s\n", ssid.c_str(), IP.toString().c_str());
+        uartEnd();
+    }
+    else
+    {
+        uartPrintln("[ESP32] Error al iniciar AP");
+        uartEnd();
+    }
+}
+// Detiene el Access Point si está activo
+void stopAccessPoint()
+{
+    WiFi.softAPdisconnect(true);
+    uartPrintln("[ESP32] AP detenido");
+    uartEnd();
+}
+
+//===============================End POINT=======================================================
+// Los endpoints se buscan por hash (FNV-1a del label) en cubetas encadenadas, sin recorrer toda la
+// tabla. La capacidad sale del heap libre al arrancar (el comando ENDPOINTS la cambia). Con la tabla
+// llena, un label nuevo reemplaza al endpoint vencido, al menos usado (LRU) o al actualizado hace
+// más tiempo (TTL). Con 'ttl' los endpoints sin actualizar por más de esos segundos no se sirven.
+static const int ENDPOINTS_MIN = 10;
+static const int ENDPOINTS_MAX = 1024;
+static const size_t ENDPOINT_HEAP_BYTES = 384;          // Estimado por endpoint: label, JSON y Strings
+static const size_t ENDPOINT_HEAP_RESERVE = 48 * 1024; // Heap que se deja para WiFi y HTTP
+enum EvictionPolicy
+{
+    EVICT_LRU,
+    EVICT_TTL
+};
+static EvictionPolicy evictionPolicy = EVICT_LRU;
+static unsigned long endpointTtlMs = 0; // 0: sin vencimiento
+static std::vector<int> endpointBuckets; // Primer endpoint de cada cubeta (-1: vacía)
+static uint32_t endpointUseClock = 0;
+static uint32_t endpointHits = 0;
+static uint32_t endpointMisses = 0;
+static uint32_t endpointEvictions = 0;
+
+static uint32_t hashLabel(const String &label)
+{
+    uint32_t hash = 2166136261UL;
+    for (size_t i = 0; i < label.length(); i++)
+        hash = (hash ^ (uint8_t)label[i]) * 16777619UL;
+    return hash;
+}
+
+static void linkEndpoint(int idx)
+{
+    int bucket = endpoints[idx].hash & (endpointBuckets.size() - 1);
+    endpoints[idx].next = endpointBuckets[bucket];
+    endpointBuckets[bucket] = idx;
+}
+
+static void unlinkEndpoint(int idx)
+{
+    int *link = &endpointBuckets[endpoints[idx].hash & (endpointBuckets.size() - 1)];
+    while (*link >= 0 && *link != idx)
+        link = &endpoints[*link].next;
+    if (*link == idx)
+        *link = endpoints[idx].next;
+}
+
+static bool endpointExpired(int idx)
+{
+    return endpointTtlMs > 0 && millis() - endpoints[idx].updated > endpointTtlMs;
+}
+
+// Endpoint a reemplazar con la tabla llena: uno vencido o, si no hay, el que indica la política
+static int pickEvictionVictim()
+{
+    int victim = 0;
+    for (int i = 0; i < (int)endpoints.size(); i++)
+    {
+        if (endpointExpired(i))
+            return i;
+        if (evictionPolicy == EVICT_LRU ? endpoints[i].lastUse < endpoints[victim].lastUse
+                                        : millis() - endpoints[i].updated > millis() - endpoints[victim].updated)
+            victim = i;
+    }
+    return victim;
+}
+
+// Fija la capacidad (<= 0: según el heap libre) y rehace el índice; si sobran endpoints se desalojan
+void initEndpointTable(int capacity)
+{
+    if (capacity <= 0)
+    {
+        size_t heap = ESP.getFreeHeap();
+        capacity = heap > ENDPOINT_HEAP_RESERVE ? (heap - ENDPOINT_HEAP_RESERVE) / ENDPOINT_HEAP_BYTES : 0;
+    }
+    endpointCapacity = constrain(capacity, ENDPOINTS_MIN, ENDPOINTS_MAX);
+    while ((int)endpoints.size() > endpointCapacity)
+    {
+        int victim = pickEvictionVictim();
+        endpoints[victim] = endpoints.back();
+        endpoints.pop_back();
+        endpointEvictions++;
+    }
+
+    size_t buckets = 16;
+    while (buckets < (size_t)endpointCapacity) // Carga máxima de un endpoint por cubeta
+        buckets <<= 1;
+    endpointBuckets.assign(buckets, -1);
+    for (int i = 0; i < (int)endpoints.size(); i++)
+        linkEndpoint(i);
+}
+
+// Busca endpoint, devuelve índice o -1 si no existe (incluye los vencidos)
+int findEndpoint(const String &ep)
+{
+    if (endpointBuckets.empty())
+        return -1;
+    uint32_t hash = hashLabel(ep);
+    for (int i = endpointBuckets[hash & (endpointBuckets.size() - 1)]; i >= 0; i = endpoints[i].next)
+    {
+        if (endpoints[i].hash == hash && endpoints[i].endpoint == ep)
+            return i;
+    }
+    return -1;
+}
+
+// Como findEndpoint, pero un endpoint vencido cuenta como inexistente
+int findLiveEndpoint(const String &ep)
+{
+    int idx = findEndpoint(ep);
+    return (idx >= 0 && !endpointExpired(idx)) ? idx : -1;
+}
+
+// ENDPOINTS informa el estado de la tabla; con "max", "policy" ("lru" o "ttl") y "ttl" (segundos) la configura
+void handleEndpointsRequest(const JsonDocument &doc)
+{
+    String policy = doc["policy"] | "";
+    if (policy == "lru")
+        evictionPolicy = EVICT_LRU;
+    else if (policy == "ttl")
+        evictionPolicy = EVICT_TTL;
+    else if (policy.length() > 0)
+    {
+        uartPrintln("[ESP32] ENDPOINTS mal formado: 'policy' debe ser \"lru\" o \"ttl\"");
+        uartEnd();
+        return;
+    }
+    if (!doc["ttl"].isNull())
+        endpointTtlMs = (doc["ttl"] | 0UL) * 1000UL;
+    if (!doc["max"].isNull())
+        initEndpointTable(doc["max"] | 0);
+
+    uartPrintf("{\"count\":%u,\"max\":%d,\"policy\":\"%s\",\"ttl\":%lu,\"hits\":%lu,\"misses\":%lu,\"evictions\":%lu,\"subscribers\":%d,\"heap\":%lu}\n",
+               (unsigned)endpoints.size(), endpointCapacity, evictionPolicy == EVICT_LRU ? "lru" : "ttl",
+               endpointTtlMs / 1000UL, (unsigned long)endpointHits, (unsigned long)endpointMisses,
+               (unsigned long)endpointEvictions, eventClientCount(), (unsigned long)ESP.getFreeHeap());
+    uartEnd();
+}
+
+//=========================================Cuerpo en bloques ==========================================
+// Con "stream": true el cuerpo de un GET/POST no se junta en un String: writeToStream() lo lee de a poco
+// (y resuelve Content-Length y Transfer-Encoding: chunked) y UartChunkStream lo reenvía en bloques de
+// tamaño fijo ("chunk" bytes). Después de la línea del código HTTP llegan:
+//   {"stream":true,"len":53211,"chunk":512}       (len -1 si el servidor no lo informa)
+//   {"n":0,"data":"<base64>"} ...                   (en modo tramas, tramas 'D' con los bytes)
+//   {"chunks":104,"len":53211,"complete":true}
+// Así la memoria usada en ambos lados no depende del tamaño de la respuesta.
+static const int HTTP_CHUNK_DEFAULT = 512;
+static const int HTTP_CHUNK_MIN = 64;
+
+class UartChunkStream : public Stream
+{
+public:
+    UartChunkStream(uint8_t *buf, size_t size, char *text) : buf(buf), size(size), text(text) {}
+
+    size_t write(uint8_t c) override { return write(&c, 1); }
+
+    size_t write(const uint8_t *data, size_t len) override
+    {
+        for (size_t i = 0; i < len;)
+        {
+            size_t n = min(len - i, size - used);
+            memcpy(buf + used, data + i, n);
+            used += n;
+            i += n;
+            if (used == size)
+                sendChunk();
+        }
+        return len;
+    }
+
+    int available() override { return 0; }
+    int read() override { return -1; }
+    int peek() override { return -1; }
+
+    // Envía lo acumulado como el próximo bloque numerado
+    void sendChunk()
+    {
+        if (used == 0)
+            return;
+        if (binaryFraming)
+        {
+            uartSendFrame(FRAME_DATA, buf, used);
+        }
+        else
+        {
+            size_t len = 0;
+            mbedtls_base64_encode((unsigned char *)text, 4 * ((size + 2) / 3) + 1, &len, buf, used);
+            text[len] = '\0';
+            uartPrintf("{\"n\":%d,\"data\":\"%s\"}\n", chunks, text);
+        }
+        chunks++;
+        bytes += used;
+        used = 0;
+    }
+
+    int chunks = 0;
+    size_t bytes = 0;
+
+private:
+    uint8_t *buf;
+    size_t size;
+    char *text; // Bloque en base64 (modo texto)
+    size_t used = 0;
+};
+
+// Marca en 'node' (un filtro de ArduinoJson) la ruta desde 'start': "main.temp", "weather[].description",
+// "[].id" o "*.temp". Un arreglo de filtro con un solo elemento se aplica a todos los elementos y la clave
+// "*" a todos los miembros; true conserva el subárbol entero.
+static void addFilterPath(JsonVariant node, const String &path, int start)
+{
+    if (node.is<bool>())
+        return; // Ya se conserva entero
+    while (start < (int)path.length() && path[start] == '.')
+        start++;
+    if (start >= (int)path.length())
+    {
+        node.set(true);
+        return;
+    }
+    if (path.startsWith("[]", start))
+    {
+        JsonArray items = node.is<JsonArray>() ? node.as<JsonArray>() : node.to<JsonArray>();
+        if (items.size() == 0)
+            items.add<JsonObject>();
+        addFilterPath(items[0], path, start + 2);
+        return;
+    }
+    int end = start;
+    while (end < (int)path.length() && path[end] != '.' && !path.startsWith("[]", end))
+        end++;
+    String key = path.substring(start, end);
+    JsonObject members = node.is<JsonObject>() ? node.as<JsonObject>() : node.to<JsonObject>();
+    if (members[key].isNull())
+        members[key].to<JsonObject>();
+    addFilterPath(members[key], path, end);
+}
+
+// Opciones de un comando GET/POST: "stream"/"chunk", "reuse", "fields" y "etag"/"modified"/"cache"
+HttpOptions httpOptions(const JsonDocument &doc)
+{
+    HttpOptions options;
+    if (doc["stream"] | false)
+        options.chunkSize = constrain(doc["chunk"] | HTTP_CHUNK_DEFAULT, HTTP_CHUNK_MIN, (int)FRAME_MAX_PAYLOAD);
+    options.reuse = doc["reuse"] | true;
+    options.etag = doc["etag"] | "";
+    options.modified = doc["modified"] | "";
+    options.validators = doc["cache"] | false;
+
+    // "fields": ["main.temp", ...] o una sola ruta como texto
+    JsonVariantConst fields = doc["fields"];
+    if (fields.is<const char *>())
+    {
+        addFilterPath(options.filter.as<JsonVariant>(), fields.as<String>(), 0);
+    }
+    else if (fields.is<JsonArrayConst>())
+    {
+        for (JsonVariantConst field : fields.as<JsonArrayConst>())
+        {
+            if (field.is<const char *>())
+                addFilterPath(options.filter.as<JsonVariant>(), field.as<String>(), 0);
+        }
+    }
+    return options;
+}
+
+// Validadores de caché de la respuesta en curso (pedidos con collectHeaders), en una línea JSON antes del
+// código: {"etag": "\"33a64df5\"", "modified": "Wed, 21 Oct 2015 07:28:00 GMT", "cache": "max-age=60"}
+static void sendValidators(HTTPClient &http)
+{
+    JsonDocument validators;
+    validators["etag"] = http.header("ETag");
+    validators["modified"] = http.header("Last-Modified");
+    validators["cache"] = http.header("Cache-Control");
+    String line;
+    serializeJson(validators, line);
+    uartPrintln(line);
+}
+
+// Reenvía en una línea solo los campos de 'filter' del cuerpo JSON de la respuesta en curso. Se
+// interpreta directo del socket, sin juntar el cuerpo en memoria; por eso la petición se hace en HTTP/1.0
+// (useHTTP10), sin "Transfer-Encoding: chunked" y sin reusar la conexión.
+static void relayFilteredBody(HTTPClient &http, const JsonDocument &filter)
+{
+    JsonDocument result;
+    DeserializationError error = deserializeJson(result, http.getStream(), DeserializationOption::Filter(filter));
+    if (error)
+    {
+        uartPrintf("[ESP32] La respuesta no es JSON válido: %s\n", error.c_str());
+        return;
+    }
+    String payload;
+    serializeJson(result, payload);
+    uartBody(payload, false);
+}
+
+// Reenvía el cuerpo de la respuesta en curso de 'http' en bloques de 'size' bytes
+static void relayHttpBody(HTTPClient &http, size_t size)
+{
+    uint8_t *buf = (uint8_t *)malloc(size);
+    char *text = (char *)malloc(4 * ((size + 2) / 3) + 1);
+    if (buf == nullptr || text == nullptr)
+    {
+        free(buf);
+        free(text);
+        uartPrintln("[ESP32] Sin memoria para el cuerpo en bloques");
+        return;
+    }
+    uartPrintf("{\"stream\":true,\"len\":%d,\"chunk\":%u}\n", http.getSize(), (unsigned)size);
+    UartChunkStream out(buf, size, text);
+    int result = http.writeToStream(&out);
+    out.sendChunk(); // Último bloque, más corto
+    uartPrintf("{\"chunks\":%d,\"len\":%u,\"complete\":%s}\n", out.chunks, (unsigned)out.bytes,
+               result >= 0 ? "true" : "false");
+    free(buf);
+    free(text);
+}
+
+//=========================================Conexiones HTTP ==========================================
+// Cada GET/POST a un mismo host:puerto reusa la conexión TCP (y la sesión TLS en https) del anterior si
+// el servidor la dejó abierta, en lugar de pagar DNS, handshake y TLS en cada comando. El pool guarda
+// hasta HTTP_POOL_SIZE conexiones; las que pasan HTTP_IDLE_MS sin usarse se cierran desde loop().
+// Como con http.begin(url), en https no se verifica el certificado del servidor.
+static const int HTTP_POOL_SIZE = 3;
+static const unsigned long HTTP_IDLE_MS = 15000;
+
+struct HttpConnection
+{
+    String host;
+    uint16_t port;
+    bool https;
+    WiFiClient *client; // WiFiClientSecure si https; nullptr: libre
+    unsigned long lastUse;
+};
+
+static HttpConnection httpPool[HTTP_POOL_SIZE];
+static uint32_t httpRequests = 0;
+static uint32_t httpReuses = 0;
+
+uint32_t httpRequestCount() { return httpRequests; }
+uint32_t httpReuseCount() { return httpReuses; }
+
+static void closeConnection(HttpConnection &c)
+{
+    if (c.client == nullptr)
+        return;
+    c.client->stop();
+    if (c.https)
+        delete static_cast<WiFiClientSecure *>(c.client);
+    else
+        delete c.client;
+    c.client = nullptr;
+}
+
+// "http(s)://[usuario@]host[:puerto]/..." -> host, puerto y esquema
+static bool parseHttpUrl(const String &url, String &host, uint16_t &port, bool &https)
+{
+    int scheme = url.indexOf("://");
+    if (scheme < 0)
+        return false;
+    https = url.substring(0, scheme).equalsIgnoreCase("https");
+    int start = scheme + 3;
+    int end = start;
+    while (end < (int)url.length() && url[end] != '/' && url[end] != '?' && url[end] != '#')
+        end++;
+    String authority = url.substring(start, end);
+    authority = authority.substring(authority.lastIndexOf('@') + 1);
+    port = https ? 443 : 80;
+    int colon = authority.lastIndexOf(':');
+    if (colon >= 0 && colon > authority.lastIndexOf(']'))
+    {
+        port = authority.substring(colon + 1).toInt();
+        authority = authority.substring(0, colon);
+    }
+    host = authority;
+    host.toLowerCase();
+    return host.length() > 0 && port > 0;
+}
+
+// Prepara 'http' para 'url' sobre una conexión del pool; devuelve la conexión usada (nullptr sin pool)
+static HttpConnection *beginHttp(HTTPClient &http, const String &url, bool reuse)
+{
+    httpRequests++;
+    String host;
+    uint16_t port;
+    bool https;
+    if (!reuse || !parseHttpUrl(url, host, port, https))
+    {
+        http.begin(url);
+        return nullptr;
+    }
+
+    HttpConnection *slot = nullptr;
+    HttpConnection *oldest = nullptr;
+    for (HttpConnection &c : httpPool)
+    {
+        if (c.client != nullptr && c.host == host && c.port == port && c.https == https)
+        {
+            slot = &c;
+            break;
+        }
+        if (oldest == nullptr || c.client == nullptr ||
+            (oldest->client != nullptr && c.lastUse < oldest->lastUse))
+            oldest = &c;
+    }
+
+    if (slot != nullptr && slot->client->connected() && millis() - slot->lastUse < HTTP_IDLE_MS)
+    {
+        httpReuses++;
+    }
+    else
+    {
+        if (slot == nullptr)
+            slot = oldest; // Una libre o la usada hace más tiempo
+        closeConnection(*slot);
+        if (https)
+        {
+            WiFiClientSecure *secure = new WiFiClientSecure();
+            secure->setInsecure();
+            slot->client = secure;
+        }
+        else
+        {
+            slot->client = new WiFiClient();
+        }
+        slot->host = host;
+        slot->port = port;
+        slot->https = https;
+    }
+    http.setReuse(true); // Keep-alive: end() no cierra la conexión si el servidor la deja abierta
+    http.begin(*slot->client, url);
+    return slot;
+}
+
+static void endHttp(HTTPClient &http, HttpConnection *slot)
+{
+    http.end();
+    if (slot == nullptr)
+        return;
+    slot->lastUse = millis();
+    if (!slot->client->connected())
+        closeConnection(*slot); // El servidor respondió con Connection: close
+}
+
+// Llamada desde loop(): cierra las conexiones ociosas y libera sus sockets y buffers TLS
+void pollHttpPool()
+{
+    for (HttpConnection &c : httpPool)
+    {
+        if (c.client != nullptr && (millis() - c.lastUse >= HTTP_IDLE_MS || !c.client->connected()))
+            closeConnection(c);
+    }
+}
+
+//=========================================Solicitud GET ==========================================
+
+void handleHttpGet(const String &url, const HttpOptions &options)
+{
+    if (WiFi.status() != WL_CONNECTED)
+    {
+        uartPrintln("[ESP32] No conectado a WiFi, no se puede hacer GET.");
+        uartEnd(); //
+
+        return;
+    }
+
+    HTTPClient http;
+    bool filtered = !options.filter.isNull();
+    HttpConnection *connection = beginHttp(http, url, options.reuse && !filtered);
+    if (filtered)
+        http.useHTTP10(true);
+    // Revalidación: el servidor responde 304 sin cuerpo si la copia del host sigue vigente
+    if (options.etag.length() > 0)
+        http.addHeader("If-None-Match", options.etag);
+    if (options.modified.length() > 0)
+        http.addHeader("If-Modified-Since", options.modified);
+    if (options.validators)
+    {
+        const char *keys[] = {"ETag", "Last-Modified", "Cache-Control"};
+        http.collectHeaders(keys, 3);
+    }
+
+    int httpCode = http.GET();
+    if (httpCode > 0)
+    {
+        if (options.validators)
+            sendValidators(http);
+        uartPrintf("[ESP32] GET %s -> Código: %d\n", url.c_str(), httpCode);
+        if (httpCode == HTTP_CODE_NOT_MODIFIED)
+        {
+            // Sin cuerpo: leerlo esperaría a que el servidor cierre la conexión
+        }
+        else if (filtered)
+        {
+            relayFilteredBody(http, options.filter);
+        }
+        else if (options.chunkSize > 0)
+        {
+            relayHttpBody(http, options.chunkSize);
+        }
+        else
+        {
+            String payload = http.getString(); // Obtener todo el contenido de la respuesta
+            uartBody(payload, true);           // Modo texto: TODO en UNA SOLA LÍNEA, sin espacios al principio o final
+        }
+    }
+    else
+    {
+        uartPrintf("[ESP32] Error en GET -> Código: %d\n", httpCode);
+    }
+
+    endHttp(http, connection);
+    uartEnd(); //
+}
+//================================ Solicitud POST ======================================================
+void handleHttpPost(const String &url, const String &jsonPayload, const String &contentType,
+                    const HttpOptions &options)
+{
+    if (WiFi.status() != WL_CONNECTED)
+    {
+        uartPrintln("[ESP32] No conectado a WiFi, no se puede hacer POST.");
+        uartEnd();
+        return;
+    }
+
+    HTTPClient http;
+    bool filtered = !options.filter.isNull();
+    HttpConnection *connection = beginHttp(http, url, options.reuse && !filtered);
+    if (filtered)
+        http.useHTTP10(true);
+    http.addHeader("Content-Type", contentType);
+
+    int httpCode = http.POST(jsonPayload);
+
+    if (httpCode > 0)
+    {
+        uartPrintf("[ESP32] POST %s -> Código: %d\n", url.c_str(), httpCode);
+        if (filtered)
+        {
+            relayFilteredBody(http, options.filter);
+        }
+        else if (options.chunkSize > 0)
+        {
+            relayHttpBody(http, options.chunkSize);
+        }
+        else
+        {
+            String response = http.getString();
+            uartBody(response, false);
+        }
+    }
+    else
+    {
+        uartPrintf("[ESP32] Error en POST -> Código: %d\n", httpCode);
+    }
+
+    endHttp(http, connection);
+    uartEnd();
+}
+
+//================================ Manejo dinámico de endpoint==========================================
+void handleDynamic()
+{
+    String path = server.uri(); // ej. "/Temperatura" o utro (:)
+    if (serveAsset(path))
+        return; // Archivo guardado en flash
+    if (path.startsWith("/"))
+        path = path.substring(1); // quito /
+
+    if (server.hasArg("since") || server.hasArg("last"))
+    {
+        sendHistory(path); // ?since=<t> o ?last=N: las muestras guardadas
+        return;
+    }
+
+    int idx = findLiveEndpoint(path);
+    if (idx >= 0)
+    {
+        endpointHits++;
+        endpoints[idx].lastUse = ++endpointUseClock;
+        server.send(200, "application/json", endpoints[idx].jsonData);
+    }
+    else
+    {
+        endpointMisses++;
+        server.send(404, "text/plain", "No encontrado");
+    }
+}
+
+// Actualiza o agrega un endpoint con JSON; con la tabla llena (o poco heap) reemplaza otro
+void setEndpointData(const String &ep, const String &jsonData)
+{
+    int idx = findEndpoint(ep);
+    if (idx < 0)
+    {
+        if ((int)endpoints.size() < endpointCapacity &&
+            (endpoints.empty() || ESP.getFreeHeap() > ENDPOINT_HEAP_RESERVE))
+        {
+            endpoints.push_back(EndpointData());
+            idx = endpoints.size() - 1;
+        }
+        else
+        {
+            idx = pickEvictionVictim();
+            unlinkEndpoint(idx);
+            endpointEvictions++;
+            Serial.printf("[ESP32] Endpoint /%s desalojado por /%s\n", endpoints[idx].endpoint.c_str(), ep.c_str());
+        }
+        endpoints[idx].endpoint = ep;
+        endpoints[idx].hash = hashLabel(ep);
+        linkEndpoint(idx);
+    }
+    endpoints[idx].jsonData = jsonData;
+    endpoints[idx].updated = millis();
+    endpoints[idx].lastUse = ++endpointUseClock;
+    recordHistory(ep, jsonData);
+    pushEndpointEvent(ep, jsonData);
+}
+
+// Combina 'patch' con el JSON guardado de 'ep' (como JSON Merge Patch, solo en el primer nivel):
+// las claves nuevas se agregan, las existentes se reemplazan y las que valen null se borran.
+// Devuelve false si el endpoint no existe.
+bool mergeEndpointData(const String &ep, JsonObjectConst patch)
+{
+    int idx = findLiveEndpoint(ep);
+    if (idx < 0)
+        return false;
+    JsonDocument merged;
+    if (deserializeJson(merged, endpoints[idx].jsonData) || !merged.is<JsonObject>())
+        merged.to<JsonObject>();
+    for (JsonPairConst entry : patch)
+    {
+        if (entry.value().isNull())
+            merged.remove(entry.key());
+        else
+            merged[entry.key()] = entry.value();
+    }
+    String jsonData;
+    serializeJson(merged, jsonData);
+    endpoints[idx].jsonData = jsonData;
+    endpoints[idx].updated = millis();
+    endpoints[idx].lastUse = ++endpointUseClock;
+    recordHistory(ep, jsonData);
+    pushEndpointEvent(ep, jsonData);
+    return true;
+}
+
+// Merge sobre labels que no están en la tabla (por ejemplo después de un reinicio): además del texto envía
+// {"error":"missing","labels":[...]}, que el host reconoce sin depender de la redacción del mensaje
+void sendMissingEndpoints(JsonArrayConst labels)
+{
+    for (JsonVariantConst label : labels)
+        uartPrintf("[ESP32] No existe el endpoint /%s para merge\n", label.as<const char *>());
+    JsonDocument doc;
+    doc["error"] = "missing";
+    doc["labels"] = labels;
+    String line;
+    serializeJson(doc, line);
+    uartPrintln(line);
+    uartEnd();
 }
 
-void handleHtmlPart(const JsonDocument &doc)
+// Actualiza varios endpoints con un solo comando: {"batch": {"Temperatura": {...}, "Humedad": {...}}}.
+// Es atómico: si el lote no entra en la tabla no se modifica ningún endpoint. Con 'merge' cada
+// entrada se combina con lo guardado (mergeEndpointData): todas tienen que ser objetos y todos los
+// labels tienen que existir.
+void handleWebServerBatch(JsonObjectConst batch, bool merge)
 {
-    int index = doc["index"] | -1;
-    int total = doc["total"] | -1;
-    String content = doc["content"] | "";
-
-    if (index < 0 || total < 1 || content.length() == 0)
+    if (batch.size() == 0)
     {
-        UART1.println("[ESP32] Datos HTML_PART inválidos.");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] Comando WebServer mal formado: 'batch' vacío");
+        uartEnd();
         return;
     }
-
-    if (index == 0)
+    JsonDocument missing;
+    JsonArray missingLabels = missing.to<JsonArray>();
+    for (JsonPairConst entry : batch)
     {
-        // Primer fragmento: inicializar buffer y contadores
-        htmlBuffer = "";
-        expectedTotalParts = total;
-        receivedParts = 0;
-        Serial.printf("[ESP32] Inicio recepción HTML en %d fragmentos\n", total);
+        if (entry.key().size() == 0)
+        {
+            uartPrintln("[ESP32] Comando WebServer mal formado: label vacío");
+            uartEnd();
+            return;
+        }
+        if (merge && !entry.value().is<JsonObjectConst>())
+        {
+            uartPrintf("[ESP32] Comando WebServer mal formado: /%s no es un objeto para merge\n", entry.key().c_str());
+            uartEnd();
+            return;
+        }
+        if (merge && findLiveEndpoint(entry.key().c_str()) < 0)
+            missingLabels.add(entry.key().c_str());
     }
-
-    // Validar orden correcto de fragmentos
-    if (index != receivedParts)
+    if (missingLabels.size() > 0)
     {
-        UART1.printf("[ESP32] Fragmento fuera de orden: esperado %d, recibido %d\n", receivedParts, index);
-        UART1.println("{\"end\": true}");
+        sendMissingEndpoints(missingLabels);
         return;
     }
-
-    // Concatenar fragmento al buffer
-    htmlBuffer += content;
-    receivedParts++;
-
-    // UART1.printf("[ESP32] Recibido fragmento %d/%d\n", index + 1, total);
-
-    // Cuando llegan todos los fragmentos, actualizo la página HTML
-    if (receivedParts == expectedTotalParts)
+    // Los labels ya actualizados del lote son los más recientes: el desalojo nunca los elige
+    if ((int)batch.size() > endpointCapacity)
     {
-        htmlPage = htmlBuffer;
-        // Serial.println("[ESP32] HTML actualizado con todos los fragmentos recibidos.");
-        UART1.println("[ESP32] HTML actualizado");
-        expectedTotalParts = 0;
-        receivedParts = 0;
+        uartPrintf("[ESP32] No hay espacio para %u endpoints (máximo %d)\n", (unsigned)batch.size(), endpointCapacity);
+        uartEnd();
+        return;
     }
 
-    UART1.println("{\"end\": true}");
+    String jsonData;
+    for (JsonPairConst entry : batch)
+    {
+        jsonData = "";
+        JsonObjectConst dataObj = entry.value().as<JsonObjectConst>();
+        if (merge)
+        {
+            mergeEndpointData(entry.key().c_str(), dataObj);
+            continue;
+        }
+        if (!dataObj.isNull())
+            serializeJson(dataObj, jsonData);
+        else
+            jsonData = "{}";
+        setEndpointData(entry.key().c_str(), jsonData);
+    }
+    uartPrintf("[ESP32] %u endpoints actualizados\n", (unsigned)batch.size());
+    uartEnd();
 }
 
-// ========================== Funciones para gestionar el Access Point (AP) =============================
+//==================================================Historial=================================================
+// Los labels configurados con HISTORY guardan sus últimas 'size' actualizaciones en un buffer circular,
+// con el millis() de cada una. GET /<label>?since=<t> devuelve las posteriores a 't' y ?last=N las
+// últimas N, así un cliente que consulta cada tanto no pierde las intermedias. El historial no depende
+// de la tabla de endpoints: sobrevive a un desalojo o al vencimiento por TTL.
+static const int HISTORY_LABELS = 16;
+static const int HISTORY_SIZE_MAX = 512;
+static const size_t HISTORY_SAMPLE_BYTES = 64; // Estimado por muestra: JSON chico y String
 
-// Inicia el Access Point con el SSID y la contraseña proporcionados
-void startAccessPoint(const String &ssid, const String &pass)
+struct HistorySample
 {
+    unsigned long t;
+    String json;
+};
 
-    bool result = WiFi.softAP(ssid.c_str(), pass.c_str());
+struct EndpointHistory
+{
+    String label;
+    std::vector<HistorySample> samples; // Buffer circular de samples.size() muestras
+    size_t head;                         // Próxima posición a escribir
+    size_t count;
+};
 
-    if (result)
-    {
-        IPAddress IP = WiFi.softAPIP();
-        UART1.printf("[ESP32] AP iniciado: %s | IP: %s\n", ssid.c_str(), IP.toString().c_str());
-        UART1.println("{\"end\": true}");
-    }
-    else
+static std::vector<EndpointHistory> histories;
+
+static int findHistory(const String &label)
+{
+    for (int i = 0; i < (int)histories.size(); i++)
     {
-        UART1.println("[ESP32] Error al iniciar AP");
-        UART1.println("{\"end\": true}");
+        if (histories[i].label == label)
+            return i;
     }
+    return -1;
 }
-// Detiene el Access Point si está activo
-void stopAccessPoint()
+
+// Muestra i-ésima desde la más vieja
+static HistorySample &historySample(EndpointHistory &h, size_t i)
 {
-    WiFi.softAPdisconnect(true);
-    UART1.println("[ESP32] AP detenido");
-    UART1.println("{\"end\": true}");
+    return h.samples[(h.head + h.samples.size() - h.count + i) % h.samples.size()];
 }
 
-//===============================End POINT=======================================================
+// Guarda una actualización de 'label' si tiene historial
+void recordHistory(const String &label, const String &jsonData)
+{
+    int idx = findHistory(label);
+    if (idx < 0)
+        return;
+    EndpointHistory &h = histories[idx];
+    unsigned long t = millis();
+    if (h.count > 0 && (long)(t - historySample(h, h.count - 1).t) <= 0)
+        t = historySample(h, h.count - 1).t + 1; // Estrictamente creciente, para que ?since no saltee muestras
+    h.samples[h.head].t = t;
+    h.samples[h.head].json = jsonData;
+    h.head = (h.head + 1) % h.samples.size();
+    if (h.count < h.samples.size())
+        h.count++;
+}
 
-// Busca endpoint, devuelve índice o -1 si no existe
-int findEndpoint(const String &ep)
+// Cambia el tamaño del historial conservando las muestras más nuevas que entren
+static void resizeHistory(EndpointHistory &h, size_t size)
 {
-    for (int i = 0; i < endpointCount; i++)
-    {
-        if (endpoints[i].endpoint == ep)
-            return i;
-    }
-    return -1;
+    std::vector<HistorySample> samples(size);
+    size_t keep = h.count < size ? h.count : size;
+    for (size_t i = 0; i < keep; i++)
+        samples[i] = historySample(h, h.count - keep + i);
+    h.samples.swap(samples);
+    h.count = keep;
+    h.head = keep % size;
 }
 
-//=========================================Solicitud GET ==========================================
+static void printHistoryInfo(EndpointHistory &h)
+{
+    JsonDocument info;
+    info["label"] = h.label;
+    info["size"] = h.samples.size();
+    info["count"] = h.count;
+    info["oldest"] = h.count > 0 ? historySample(h, 0).t : 0UL;
+    info["newest"] = h.count > 0 ? historySample(h, h.count - 1).t : 0UL;
+    String line;
+    serializeJson(info, line);
+    uartPrintln(line);
+}
 
-void handleHttpGet(const String &url)
+// HISTORY con "label" y "size" configura el historial de un label (size 0 lo borra); sin "size"
+// informa el de ese label, y sin "label" lista todos
+void handleHistoryRequest(const JsonDocument &doc)
 {
-    if (WiFi.status() != WL_CONNECTED)
+    String label = doc["label"] | "";
+    if (doc["size"].isNull())
     {
-        UART1.println("[ESP32] No conectado a WiFi, no se puede hacer GET.");
-        UART1.println("{\"end\": true}"); //
-
+        for (EndpointHistory &h : histories)
+        {
+            if (label == "" || h.label == label)
+                printHistoryInfo(h);
+        }
+        uartEnd();
         return;
     }
-
-    HTTPClient http;
-    http.begin(url);
-
-    int httpCode = http.GET();
-    if (httpCode > 0)
+    int size = doc["size"] | -1;
+    if (label == "" || size < 0)
     {
-        UART1.printf("[ESP32] GET %s -> Código: %d\n", url.c_str(), httpCode);
-        String payload = http.getString(); // Obtener todo el contenido de la respuesta
-        payload.trim();                    // Eliminar espacios o saltos al principio o final
-
-        // Imprimir TODO el contenido en UNA SOLA LÍNEA (sin saltos de línea)
-        payload.replace("\n", " ");
-        payload.replace("\r", " ");
-
-        UART1.print(payload);
-        UART1.println(); // Solo un salto de línea final
+        uartPrintln("[ESP32] Comando HISTORY mal formado: faltan 'label' o 'size'");
+        uartEnd();
+        return;
     }
-    else
+    int idx = findHistory(label);
+    if (size == 0)
     {
-        UART1.printf("[ESP32] Error en GET -> Código: %d\n", httpCode);
+        if (idx >= 0)
+            histories.erase(histories.begin() + idx);
+        uartPrintf("[ESP32] Historial de /%s borrado\n", label.c_str());
+        uartEnd();
+        return;
     }
-
-    http.end();
-    UART1.println("{\"end\": true}"); //
-}
-//================================ Solicitud POST ======================================================
-void handleHttpPost(const String &url, const String &jsonPayload)
-{
-    if (WiFi.status() != WL_CONNECTED)
+    if (size > HISTORY_SIZE_MAX)
+    {
+        uartPrintf("[ESP32] Historial de %d muestras: el máximo es %d\n", size, HISTORY_SIZE_MAX);
+        uartEnd();
+        return;
+    }
+    if (idx < 0 && (int)histories.size() >= HISTORY_LABELS)
+    {
+        uartPrintf("[ESP32] No hay lugar para otro historial (máximo %d)\n", HISTORY_LABELS);
+        uartEnd();
+        return;
+    }
+    int current = idx >= 0 ? histories[idx].samples.size() : 0;
+    if (size > current && ESP.getFreeHeap() < ENDPOINT_HEAP_RESERVE + (size - current) * HISTORY_SAMPLE_BYTES)
     {
-        UART1.println("[ESP32] No conectado a WiFi, no se puede hacer POST.");
-        UART1.println("{\"end\": true}");
+        uartPrintf("[ESP32] Sin memoria para %d muestras\n", size);
+        uartEnd();
         return;
     }
 
-    HTTPClient http;
-    http.begin(url);
-    http.addHeader("Content-Type", "application/json");
+    if (idx < 0)
+    {
+        histories.push_back(EndpointHistory());
+        idx = histories.size() - 1;
+        histories[idx].label = label;
+        histories[idx].head = 0;
+        histories[idx].count = 0;
+    }
+    resizeHistory(histories[idx], size);
+    uartPrintf("[ESP32] Historial de /%s: %d muestras\n", label.c_str(), size);
+    uartEnd();
+}
 
-    int httpCode = http.POST(jsonPayload);
+// Responde GET /<label>?since=<t>&last=N con {"label", "now", "samples": [{"t", "data"}, ...]}, en orden.
+// Un label sin historial devuelve su valor actual como única muestra.
+void sendHistory(const String &label)
+{
+    unsigned long since = 0;
+    bool hasSince = server.hasArg("since");
+    if (hasSince)
+        since = strtoul(server.arg("since").c_str(), nullptr, 10);
+    long last = server.hasArg("last") ? server.arg("last").toInt() : -1;
 
-    if (httpCode > 0)
+    int idx = findHistory(label);
+    int ep = idx < 0 ? findLiveEndpoint(label) : -1;
+    if (idx < 0 && ep < 0)
     {
-        UART1.printf("[ESP32] POST %s -> Código: %d\n", url.c_str(), httpCode);
-        String response = http.getString();
-        response.replace("\n", " ");
-        response.replace("\r", " ");
-        UART1.print(response);
-        UART1.println();
+        endpointMisses++;
+        server.send(404, "text/plain", "No encontrado");
+        return;
     }
-    else
+    endpointHits++;
+
+    // Primera muestra a enviar: posterior a 'since' y dentro de las últimas 'last'
+    size_t count = idx >= 0 ? histories[idx].count : 1;
+    size_t first = 0;
+    if (hasSince)
     {
-        UART1.printf("[ESP32] Error en POST -> Código: %d\n", httpCode);
+        while (first < count &&
+               (long)((idx >= 0 ? historySample(histories[idx], first).t : endpoints[ep].updated) - since) <= 0)
+            first++;
     }
+    if (last >= 0 && count - first > (size_t)last)
+        first = count - last;
 
-    http.end();
-    UART1.println("{\"end\": true}");
+    server.setContentLength(CONTENT_LENGTH_UNKNOWN);
+    server.send(200, "application/json", "");
+    JsonDocument head;
+    head["label"] = label;
+    head["now"] = millis();
+    String chunk;
+    serializeJson(head, chunk);
+    chunk.remove(chunk.length() - 1); // Sin la '}': siguen las muestras
+    chunk += ",\"samples\":[";
+    for (size_t i = first; i < count; i++)
+    {
+        unsigned long t = idx >= 0 ? historySample(histories[idx], i).t : endpoints[ep].updated;
+        const String &json = idx >= 0 ? historySample(histories[idx], i).json : endpoints[ep].jsonData;
+        if (i > first)
+            chunk += ",";
+        chunk += "{\"t\":";
+        chunk += String(t);
+        chunk += ",\"data\":";
+        chunk += json;
+        chunk += "}";
+        if (chunk.length() >= 1024) // Se envía de a tramos para no armar toda la respuesta en RAM
+        {
+            server.sendContent(chunk);
+            chunk = "";
+        }
+    }
+    chunk += "]}";
+    server.sendContent(chunk);
+    server.sendContent("");
 }
 
-//================================ Manejo dinámico de endpoint==========================================
-void handleDynamic()
+//==================================================Eventos (SSE)=================================================
+// GET /events mantiene abierta la conexión (text/event-stream) y cada actualización de un endpoint se
+// envía al momento como "event: <label>\ndata: <json>\n\n", sin que el navegador tenga que consultar.
+// Con ?label=Temperatura,Humedad solo llegan esos labels (y su valor actual al suscribirse). La conexión
+// sigue abierta porque eventClients guarda una copia del WiFiClient que WebServer suelta al terminar.
+static const int SSE_MAX_CLIENTS = 4;            // Cada suscriptor ocupa un socket de lwIP
+static const unsigned long SSE_PING_MS = 15000; // Comentario periódico para detectar clientes caídos
+
+struct EventClient
 {
-    String path = server.uri(); // ej. "/Temperatura" o utro (:)
-    if (path.startsWith("/"))
-        path = path.substring(1); // quito /
+    WiFiClient client;
+    String labels; // ",Temperatura,Humedad," o "" para todos
+    unsigned long lastWrite;
+};
 
-    int idx = findEndpoint(path);
-    if (idx >= 0)
+static EventClient eventClients[SSE_MAX_CLIENTS];
+
+// Escribe 'text' completo o descarta al suscriptor: una escritura parcial rompería el stream
+static bool sendEvent(EventClient &c, const String &text)
+{
+    if (c.client.write((const uint8_t *)text.c_str(), text.length()) != text.length())
     {
-        server.send(200, "application/json", endpoints[idx].jsonData);
+        c.client.stop();
+        return false;
     }
-    else
+    c.lastWrite = millis();
+    return true;
+}
+
+static bool sendEndpointEvent(EventClient &c, const String &label, const String &jsonData)
+{
+    String text = "event: ";
+    text += label;
+    text += "\ndata: ";
+    text += jsonData;
+    text += "\n\n";
+    return sendEvent(c, text);
+}
+
+int eventClientCount()
+{
+    int count = 0;
+    for (EventClient &c : eventClients)
     {
-        server.send(404, "text/plain", "No encontrado");
+        if (c.client.connected())
+            count++;
     }
+    return count;
 }
 
-// Actualiza o agrega un endpoint con JSON
-void setEndpointData(const String &ep, const String &jsonData)
+void handleEvents()
 {
-    int idx = findEndpoint(ep);
-    if (idx >= 0)
+    int slot = -1;
+    for (int i = 0; i < SSE_MAX_CLIENTS && slot < 0; i++)
     {
-        endpoints[idx].jsonData = jsonData;
+        if (!eventClients[i].client.connected())
+            slot = i;
     }
-    else if (endpointCount < MAX_ENDPOINTS)
+    if (slot < 0)
     {
-        endpoints[endpointCount].endpoint = ep;
-        endpoints[endpointCount].jsonData = jsonData;
-        endpointCount++;
+        server.send(503, "text/plain", "Demasiados suscriptores");
+        return;
     }
-    else
+
+    EventClient &c = eventClients[slot];
+    c.client.stop(); // Libera el socket del suscriptor anterior, si quedó cerrado
+    c.client = server.client();
+    c.client.setNoDelay(true);
+    String filter = server.arg("label");
+    c.labels = filter.length() > 0 ? "," + filter + "," : "";
+    if (!sendEvent(c, "HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                      "Connection: keep-alive\r\nAccess-Control-Allow-Origin: *\r\n\r\nretry: 2000\n\n"))
+        return;
+
+    // Valor actual de los labels pedidos, para no esperar a la próxima actualización
+    int start = 0;
+    while (filter.length() > 0 && start <= (int)filter.length())
+    {
+        int end = filter.indexOf(',', start);
+        if (end < 0)
+            end = filter.length();
+        int idx = findLiveEndpoint(filter.substring(start, end));
+        if (idx >= 0 && !sendEndpointEvent(c, endpoints[idx].endpoint, endpoints[idx].jsonData))
+            return;
+        start = end + 1;
+    }
+}
+
+// Envía la actualización de 'label' a los suscriptores que la piden
+void pushEndpointEvent(const String &label, const String &jsonData)
+{
+    String key;
+    for (EventClient &c : eventClients)
+    {
+        if (!c.client.connected())
+            continue;
+        if (c.labels.length() > 0)
+        {
+            if (key.length() == 0)
+                key = "," + label + ",";
+            if (c.labels.indexOf(key) < 0)
+                continue;
+        }
+        sendEndpointEvent(c, label, jsonData);
+    }
+}
+
+// Llamada desde loop(): mantiene viva la conexión y libera los sockets de los clientes que se fueron
+void pollEventClients()
+{
+    for (EventClient &c : eventClients)
     {
-        Serial.println("[ESP32] No hay espacio para nuevos endpoints");
+        if (!c.client.connected())
+            c.client.stop();
+        else if (millis() - c.lastWrite >= SSE_PING_MS)
+            sendEvent(c, ": ping\n\n");
     }
 }
 
@@ -215,98 +2028,506 @@ void setEndpointData(const String &ep, const String &jsonData)
 
 void sendReadySignal()
 {
+    // Durante el arranque el pin flota y el pull-down de Archi lo lee en bajo;
+    // el pulso corto solo garantiza el flanco de subida que espera el host
     pinMode(READY_PIN, OUTPUT);
     digitalWrite(READY_PIN, LOW);
-    delay(100);
+    delay(10);
     digitalWrite(READY_PIN, HIGH);
     Serial.println("[ESP32] READY_PIN en HIGH (listo para recibir)");
 }
 
 //===================================================SCAN===================================================
+// WiFi.scanNetworks(true) escanea sin bloquear loop() y pollScan() guarda el resultado en scanCache, ordenado
+// por RSSI. Un SCAN con un resultado de menos de "ttl" segundos (SCAN_TTL_DEFAULT_MS; 0 fuerza un escaneo
+// nuevo) se responde al momento desde la caché; si no, la respuesta llega al terminar el escaneo, o con
+// "async": true se responde enseguida y el evento {"event":"scan"} avisa cuando hay resultado. La respuesta es
+// una línea JSON, {"networks":[{"ssid","bssid","rssi","channel","auth"},...],"total","age","cached"}, filtrada
+// aquí con "min_rssi", "channel", "prefix" y "max"; con "unique" (por defecto) queda el BSSID más fuerte de cada
+// SSID, con un índice ordenado por hash en lugar de comparar contra todos los SSID ya listados.
+static const unsigned long SCAN_TTL_DEFAULT_MS = 10000;
+static const int SCAN_PENDING_MAX = 4;
+
+struct ScanEntry
+{
+    String ssid;
+    uint8_t bssid[6];
+    int8_t rssi;
+    uint8_t channel;
+    uint8_t auth; // wifi_auth_mode_t
+};
 
-void scanNetworks()
+struct ScanRequest
 {
-    UART1.println("[ESP32] Escaneando redes WiFi...");
-    int n = WiFi.scanNetworks();
+    String id; // Id del SCAN que espera el resultado
+    int minRssi;
+    int channel; // 0: todos
+    String prefix;
+    int max; // 0: sin límite
+    bool unique;
+};
+
+static std::vector<ScanEntry> scanCache;
+static bool scanValid = false;
+static unsigned long scanAt = 0;      // millis() del último escaneo terminado
+static unsigned long scanStarted = 0;
+static bool scanRunning = false;
+static bool scanEvents = false; // Algún SCAN con "async" espera el evento
+static ScanRequest scanPending[SCAN_PENDING_MAX];
+static int scanPendingCount = 0;
 
-    if (n <= 0)
+static const char *authName(uint8_t auth)
+{
+    switch (auth)
     {
-        UART1.println("[ESP32] No se encontraron redes WiFi.");
+    case WIFI_AUTH_OPEN:
+        return "open";
+    case WIFI_AUTH_WEP:
+        return "wep";
+    case WIFI_AUTH_WPA_PSK:
+        return "wpa";
+    case WIFI_AUTH_WPA2_PSK:
+        return "wpa2";
+    case WIFI_AUTH_WPA_WPA2_PSK:
+        return "wpa_wpa2";
+    case WIFI_AUTH_WPA2_ENTERPRISE:
+        return "wpa2_enterprise";
+    case WIFI_AUTH_WPA3_PSK:
+        return "wpa3";
+    case WIFI_AUTH_WPA2_WPA3_PSK:
+        return "wpa2_wpa3";
+    default:
+        return "other";
     }
-    else
-    {
-        String ssids[50]; // Arreglo para almacenar SSIDs únicos
-        int uniqueCount = 0;
+}
 
-        for (int i = 0; i < n; i++)
+static ScanRequest scanRequest(const JsonDocument &doc)
+{
+    ScanRequest request;
+    request.id = currentRequestId;
+    request.minRssi = doc["min_rssi"] | -127;
+    request.channel = doc["channel"] | 0;
+    request.prefix = doc["prefix"] | "";
+    request.max = doc["max"] | 0;
+    request.unique = doc["unique"] | true;
+    return request;
+}
+
+static void sendScanResult(const ScanRequest &request, bool fresh)
+{
+    JsonDocument doc;
+    JsonArray networks = doc["networks"].to<JsonArray>();
+    std::vector<std::pair<uint32_t, int>> seen; // (hash del SSID, índice en scanCache), ordenado
+    for (size_t i = 0; i < scanCache.size(); i++)
+    {
+        const ScanEntry &entry = scanCache[i];
+        if (entry.rssi < request.minRssi || (request.channel > 0 && entry.channel != request.channel) ||
+            !entry.ssid.startsWith(request.prefix))
+            continue;
+        if (request.unique)
         {
-            String currentSSID = WiFi.SSID(i);
-            bool esRepetido = false;
-            // Verificar si ya se agregó
-            for (int j = 0; j < uniqueCount; j++)
-            {
-                if (ssids[j] == currentSSID)
+            // scanCache está ordenado por RSSI: el primero de cada SSID es el más fuerte
+            std::pair<uint32_t, int> key(hashLabel(entry.ssid), (int)i);
+            auto it = std::lower_bound(seen.begin(), seen.end(), std::make_pair(key.first, -1));
+            bool repeated = false;
+            for (auto same = it; same != seen.end() && same->first == key.first; ++same)
+                if (scanCache[same->second].ssid == entry.ssid)
                 {
-                    esRepetido = true;
+                    repeated = true;
                     break;
                 }
-            }
-            if (!esRepetido && currentSSID.length() > 0)
-            {
-                ssids[uniqueCount++] = currentSSID;
-                UART1.printf("SSID: %s | RSSI: %d\n", currentSSID.c_str(), WiFi.RSSI(i));
-            }
+            if (repeated)
+                continue;
+            seen.insert(std::lower_bound(it, seen.end(), key), key);
         }
+        char bssid[18];
+        snprintf(bssid, sizeof(bssid), "%02X:%02X:%02X:%02X:%02X:%02X", entry.bssid[0], entry.bssid[1],
+                 entry.bssid[2], entry.bssid[3], entry.bssid[4], entry.bssid[5]);
+        JsonObject network = networks.add<JsonObject>();
+        network["ssid"] = entry.ssid;
+        network["bssid"] = bssid;
+        network["rssi"] = entry.rssi;
+        network["channel"] = entry.channel;
+        network["auth"] = authName(entry.auth);
+        if (request.max > 0 && networks.size() >= (size_t)request.max)
+            break;
+    }
+    doc["total"] = scanCache.size();
+    doc["age"] = millis() - scanAt;
+    doc["cached"] = !fresh;
+    String line;
+    serializeJson(doc, line);
+
+    String requestId = currentRequestId; // La respuesta diferida sale desde loop() con el id del SCAN
+    currentRequestId = request.id;
+    uartPrintln(line);
+    uartEnd(); // fin de carrera
+    currentRequestId = requestId;
+}
+
+static bool startScan()
+{
+    if (scanRunning)
+        return true;
+    scanRunning = WiFi.scanNetworks(true) == WIFI_SCAN_RUNNING;
+    scanStarted = millis();
+    return scanRunning;
+}
+
+void scanNetworks(const JsonDocument &doc)
+{
+    ScanRequest request = scanRequest(doc);
+    unsigned long ttl = doc["ttl"].isNull() ? SCAN_TTL_DEFAULT_MS : (unsigned long)((doc["ttl"] | 0.0) * 1000);
+    bool async = doc["async"] | false;
+
+    if (!async && scanValid && millis() - scanAt < ttl)
+    {
+        sendScanResult(request, false);
+        return;
+    }
+    if (!startScan())
+    {
+        // Por ejemplo durante un CONNECT en curso
+        uartPrintln("[ESP32] No se pudo iniciar el escaneo WiFi.");
+        uartEnd();
+        return;
+    }
+    if (async)
+    {
+        scanEvents = true;
+        uartPrintln("[ESP32] Escaneando redes WiFi...");
+        uartEnd();
+        return;
+    }
+    if (scanPendingCount >= SCAN_PENDING_MAX)
+    {
+        uartPrintln("[ESP32] Demasiados SCAN esperando el escaneo en curso.");
+        uartEnd();
+        return;
     }
+    scanPending[scanPendingCount++] = request;
+}
+
+// Desde loop(): guarda el resultado del escaneo en curso y responde los SCAN que lo esperaban
+void pollScan()
+{
+    if (!scanRunning)
+        return;
+    int16_t n = WiFi.scanComplete();
+    if (n == WIFI_SCAN_RUNNING)
+        return;
+    scanRunning = false;
 
+    if (n >= 0)
+    {
+        scanCache.clear();
+        scanCache.reserve(n);
+        for (int i = 0; i < n; i++)
+        {
+            ScanEntry entry;
+            entry.ssid = WiFi.SSID(i);
+            if (entry.ssid.length() == 0)
+                continue; // Red oculta
+            const uint8_t *bssid = WiFi.BSSID(i);
+            if (bssid != nullptr)
+                memcpy(entry.bssid, bssid, sizeof(entry.bssid));
+            else
+                memset(entry.bssid, 0, sizeof(entry.bssid));
+            entry.rssi = WiFi.RSSI(i);
+            entry.channel = WiFi.channel(i);
+            entry.auth = WiFi.encryptionType(i);
+            scanCache.push_back(entry);
+        }
+        std::stable_sort(scanCache.begin(), scanCache.end(),
+                         [](const ScanEntry &a, const ScanEntry &b) { return a.rssi > b.rssi; });
+        scanValid = true;
+        scanAt = millis();
+    }
     WiFi.scanDelete(); // Limpiar memoria
     Serial.println("[ESP32] Escaneo terminado.");
-    UART1.println("{\"end\": true}"); // fin de carrera
+
+    for (int i = 0; i < scanPendingCount; i++)
+    {
+        if (n >= 0)
+        {
+            sendScanResult(scanPending[i], true);
+            continue;
+        }
+        String requestId = currentRequestId;
+        currentRequestId = scanPending[i].id;
+        uartPrintln("[ESP32] Error al escanear redes WiFi.");
+        uartEnd();
+        currentRequestId = requestId;
+    }
+    scanPendingCount = 0;
+
+    if (scanEvents && uartEnabled)
+    {
+        JsonDocument event;
+        event["event"] = "scan";
+        event["state"] = n >= 0 ? "done" : "failed";
+        event["total"] = scanCache.size();
+        event["ms"] = millis() - scanStarted;
+        uartEvent(event);
+    }
+    scanEvents = false;
 }
+
 //================================================Connect a WIFI ======================================================
+// CONNECT no bloquea loop(): WiFi.begin() arranca el intento y pollWiFi() lo sigue, así mientras tanto se
+// atienden otros comandos, el servidor web y los clientes SSE. Sin "async" la respuesta (OK|IP o error) se
+// completa al terminar el intento, con el mismo id; con "async": true se responde al momento y el progreso
+// llega como eventos "!{...}" fuera de toda respuesta. El BSSID y el canal de la última conexión se guardan
+// para reconectar sin escanear (si el intento rápido falla se repite con un escaneo completo), y si el
+// enlace se cae se reintenta solo, con espera creciente, hasta el próximo CONNECT o DISCONNECT.
+static const unsigned long WIFI_CONNECT_TIMEOUT_MS = 10000;
+static const unsigned long WIFI_FAST_TIMEOUT_MS = 3000; // Intento con BSSID y canal de la caché
+static const unsigned long WIFI_RETRY_MIN_MS = 1000;
+static const unsigned long WIFI_RETRY_MAX_MS = 30000;
 
-void connectToWiFi(const String &ssid, const String &pass)
+enum WifiLinkState
 {
-    // UART1.printf("[ESP32] Intentando conectar a: %s\n", ssid.c_str());
+    LINK_IDLE,       // Sin CONNECT, o después de DISCONNECT o de un CONNECT fallido
+    LINK_CONNECTING, // Intento en curso
+    LINK_UP,
+    LINK_RETRY // Enlace caído: esperando el próximo intento
+};
 
-    WiFi.disconnect(true); // Borrar configuraciones anteriores
-    WiFi.begin(ssid.c_str(), pass.c_str());
+struct WifiLink
+{
+    String ssid;
+    String pass;
+    WifiLinkState state = LINK_IDLE;
+    uint8_t bssid[6];
+    int32_t channel = 0; // 0: sin BSSID/canal en caché
+    bool fast = false;   // El intento en curso usa la caché
+    bool reconnect = false; // El intento en curso es una reconexión automática
+    bool events = false;    // El último CONNECT pidió "async": se informan eventos
+    bool replyPending = false;
+    String replyId; // Id del CONNECT sin "async" que espera su respuesta
+    unsigned long since = 0;   // CONNECT o caída del enlace: base de "ms" en los eventos
+    unsigned long started = 0; // Inicio del intento en curso
+    unsigned long retryAt = 0;
+    unsigned long retryDelay = WIFI_RETRY_MIN_MS;
+    uint32_t attempts = 0;
+};
 
-    unsigned long startAttemptTime = millis();
-    const unsigned long timeout = 10000; // 10 segundos
+static WifiLink wifiLink;
 
-    while (WiFi.status() != WL_CONNECTED && millis() - startAttemptTime < timeout)
+static const char *wifiStateName(WifiLinkState state)
+{
+    switch (state)
     {
-        delay(500);
-        // UART1.print(".");
+    case LINK_CONNECTING:
+        return "connecting";
+    case LINK_UP:
+        return "connected";
+    case LINK_RETRY:
+        return "retrying";
+    default:
+        return "idle";
     }
+}
 
-    if (WiFi.status() == WL_CONNECTED)
+const char *wifiState()
+{
+    return wifiStateName(wifiLink.state);
+}
+
+static void sendWifiEvent(const char *event, const char *extra = "")
+{
+    if (!wifiLink.events || !uartEnabled)
+        return;
+    JsonDocument doc;
+    doc["event"] = "wifi";
+    doc["state"] = event;
+    doc["ssid"] = wifiLink.ssid;
+    doc["attempt"] = wifiLink.attempts;
+    doc["fast"] = wifiLink.fast;
+    if (wifiLink.state == LINK_UP)
+    {
+        doc["ip"] = WiFi.localIP().toString();
+        doc["bssid"] = WiFi.BSSIDstr();
+        doc["channel"] = WiFi.channel();
+        doc["rssi"] = WiFi.RSSI();
+    }
+    if (wifiLink.state == LINK_RETRY)
+    {
+        long wait = (long)(wifiLink.retryAt - millis());
+        doc["in"] = wait > 0 ? wait : 0;
+    }
+    if (extra[0] != '\0')
+        doc["reason"] = extra;
+    doc["ms"] = millis() - wifiLink.since;
+    uartEvent(doc);
+}
+
+// Respuesta diferida del CONNECT sin "async", con el id que traía el comando
+static void finishConnectReply(bool ok)
+{
+    if (!wifiLink.replyPending)
+        return;
+    wifiLink.replyPending = false;
+    String requestId = currentRequestId; // Puede llegar en medio de otro comando (un CONNECT nuevo)
+    currentRequestId = wifiLink.replyId;
+    if (ok)
+        uartPrintf("[ESP32] OK|IP: %s\n", WiFi.localIP().toString().c_str());
+    else
+        uartPrintf("[ESP32] Error al conectar a la red: %s\n", wifiLink.ssid.c_str());
+    uartEnd(); // fin de carrera
+    currentRequestId = requestId;
+}
+
+static void startWifiAttempt()
+{
+    wifiLink.fast = wifiLink.channel > 0;
+    wifiLink.attempts++;
+    wifiLink.started = millis();
+    wifiLink.state = LINK_CONNECTING;
+    WiFi.disconnect(false);
+    if (wifiLink.fast)
+        WiFi.begin(wifiLink.ssid.c_str(), wifiLink.pass.c_str(), wifiLink.channel, wifiLink.bssid);
+    else
+        WiFi.begin(wifiLink.ssid.c_str(), wifiLink.pass.c_str());
+    sendWifiEvent("connecting");
+}
+
+static void wifiConnected()
+{
+    wifiLink.state = LINK_UP;
+    const uint8_t *bssid = WiFi.BSSID();
+    if (bssid != nullptr)
     {
-        // UART1.println("\n[ESP32] Conexión WiFi exitosa.");
-        // UART1.printf("[ESP32] IP: %s\n", WiFi.localIP().toString().c_str());
-        UART1.printf("[ESP32] OK|IP: %s\n", WiFi.localIP().toString().c_str());
-        UART1.println("{\"end\": true}"); // fin de carrera
+        memcpy(wifiLink.bssid, bssid, sizeof(wifiLink.bssid));
+        wifiLink.channel = WiFi.channel();
     }
+    sendWifiEvent("connected");
+    finishConnectReply(true);
+    wifiLink.attempts = 0;
+    wifiLink.reconnect = false;
+    wifiLink.retryDelay = WIFI_RETRY_MIN_MS;
+}
+
+void connectToWiFi(const String &ssid, const String &pass, bool async)
+{
+    if (wifiLink.replyPending)
+        finishConnectReply(false); // Un CONNECT nuevo reemplaza al que seguía esperando
+
+    bool same = ssid == wifiLink.ssid && pass == wifiLink.pass;
+    if (!same)
+        wifiLink.channel = 0; // Otra red: la caché no sirve
+    wifiLink.ssid = ssid;
+    wifiLink.pass = pass;
+    wifiLink.events = async;
+    wifiLink.reconnect = false;
+    wifiLink.retryDelay = WIFI_RETRY_MIN_MS;
+
+    wifiLink.replyPending = !async;
+    wifiLink.replyId = currentRequestId;
+    wifiLink.attempts = 0;
+    wifiLink.since = millis();
+    // El primer evento sale antes que la respuesta: al terminar el CONNECT el host ya conoce el estado nuevo
+    if (same && WiFi.status() == WL_CONNECTED)
+        wifiConnected(); // Ya conectado a esa red: no se corta el enlace
     else
+        startWifiAttempt();
+
+    if (async)
+    {
+        uartPrintf("[ESP32] Conectando a: %s\n", ssid.c_str());
+        uartEnd();
+    }
+}
+
+// Desde loop(): sigue el intento en curso y reconecta si el enlace se cae
+void pollWiFi()
+{
+    if (wifiLink.state == LINK_IDLE)
+        return;
+    bool up = WiFi.status() == WL_CONNECTED;
+    unsigned long now = millis();
+
+    switch (wifiLink.state)
     {
-        UART1.printf("\n[ESP32] Error al conectar a la red: %s\n", ssid.c_str());
-        UART1.println("{\"end\": true}"); // fin de carrera
+    case LINK_CONNECTING:
+        if (up)
+        {
+            wifiConnected();
+        }
+        else if (now - wifiLink.started > (wifiLink.fast ? WIFI_FAST_TIMEOUT_MS : WIFI_CONNECT_TIMEOUT_MS))
+        {
+            if (wifiLink.fast)
+            {
+                // El AP cambió de canal o ya no está: se repite con un escaneo completo
+                wifiLink.channel = 0;
+                startWifiAttempt();
+            }
+            else if (wifiLink.reconnect)
+            {
+                wifiLink.state = LINK_RETRY;
+                wifiLink.retryAt = now + wifiLink.retryDelay;
+                wifiLink.retryDelay = min(wifiLink.retryDelay * 2, WIFI_RETRY_MAX_MS);
+                sendWifiEvent("retrying", "timeout");
+            }
+            else
+            {
+                WiFi.disconnect(false); // El driver no sigue intentando por su cuenta
+                wifiLink.state = LINK_IDLE;
+                sendWifiEvent("failed", "timeout");
+                finishConnectReply(false);
+            }
+        }
+        break;
+    case LINK_UP:
+        if (!up)
+        {
+            // Enlace caído: primer reintento enseguida, con BSSID y canal de la caché
+            wifiLink.reconnect = true;
+            wifiLink.state = LINK_RETRY;
+            wifiLink.retryAt = now;
+            wifiLink.since = now;
+            sendWifiEvent("lost");
+        }
+        break;
+    case LINK_RETRY:
+        if (up)
+            wifiConnected();
+        else if ((long)(now - wifiLink.retryAt) >= 0)
+            startWifiAttempt();
+        break;
+    default:
+        break;
     }
 }
 
 // Deconexion de WIFI actual
 void disconnectWiFi()
 {
+    // Sin reconexión automática hasta el próximo CONNECT; la caché de BSSID y canal se conserva
+    if (wifiLink.replyPending)
+        finishConnectReply(false);
+    wifiLink.state = LINK_IDLE;
+    wifiLink.reconnect = false;
     if (WiFi.status() == WL_CONNECTED)
     {
         WiFi.disconnect(true);
-        UART1.println("[ESP32] WiFi desconectado.");
-        UART1.println("{\"end\": true}");
+        uartPrintln("[ESP32] WiFi desconectado.");
+        uartEnd();
     }
     else
     {
-        UART1.println("[ESP32] No está conectado a ninguna red.");
-        UART1.println("{\"end\": true}");
+        WiFi.disconnect(false); // Corta también un intento en curso
+        uartPrintln("[ESP32] No está conectado a ninguna red.");
+        uartEnd();
     }
 }
+
+// ================================= Capacidades ============================================================
+// Límites reales del firmware para que Archi arme comandos y fragmentos sin exceder los buffers
+void handleCapabilities()
+{
+    uartPrintf("{\"line\":%u,\"rx\":%u,\"frame\":%u,\"html_parts\":%d,\"endpoints\":%d,\"baud_max\":%lu,\"hash\":\"crc32\",\"assets\":%d,\"batch\":true,\"merge\":true,\"history\":%d,\"sse\":%d,\"stream\":true,\"fields\":true,\"validators\":true}\n",
+               (unsigned)BUF_SIZE, (unsigned)UART_RX_BUF_SIZE, (unsigned)FRAME_MAX_PAYLOAD,
+               HTML_PARTS_MAX, endpointCapacity, BAUD_MAX, assetStoreReady ? ASSET_MAX : 0, HISTORY_LABELS, SSE_MAX_CLIENTS);
+    uartEnd();
+}
@@ -6,6 +6,52 @@
 #include <WiFi.h>
 #include <HTTPClient.h>
 #include <ArduinoJson.h>
+#include <FS.h>
+
+// ===================== Respuestas UART =====================
+void uartPrefix();
+void uartPrintln(const String &line);
+void uartPrintf(const char *format, ...);
+void uartEnd();
+void uartEvent(const JsonDocument &doc);
+void uartBody(String &payload, bool trim);
+
+// ===================== Tramas binarias =====================
+const uint8_t FRAME_START = 0xA5;
+const uint8_t FRAME_JSON = 'J';  // Comando JSON (Archi -> ESP32)
+const uint8_t FRAME_TEXT = 'T';  // Línea de respuesta (ESP32 -> Archi)
+const uint8_t FRAME_DATA = 'D';  // Bytes crudos: cuerpos y archivos (ambos sentidos)
+const uint8_t FRAME_NAK = 'N';   // El ESP32 recibió una trama corrupta
+const size_t FRAME_MAX_PAYLOAD = 4096;
+
+void uartSendFrame(uint8_t type, const uint8_t *data, size_t len);
+void uartSendTextFrame(const char *text, size_t len);
+void pollFrames();
+void handleFramingRequest(const JsonDocument &doc);
+bool takeRawBody(String &out);
+
+// ===================== CRC =====================
+uint16_t crc16(const uint8_t *data, size_t len, uint16_t crc = 0xFFFF);
+uint32_t crc32(const uint8_t *data, size_t len, uint32_t crc = 0);
+
+// ===================== Gzip =====================
+size_t gzipHeaderLength(const uint8_t *data, size_t len);
+bool sendGunzipped(File &file, const char *contentType);
+bool decodeBase64(String &text);
+
+// ===================== Almacén de archivos =====================
+void initAssetStore();
+bool validAssetPath(const String &path);
+bool storeAsset(const String &path, const String &type, bool gzip, const String *parts, size_t count);
+bool serveAsset(const String &path);
+void setHtmlPage(const String &page);
+void handleHashQuery(const JsonDocument &doc);
+void handleAssetsRequest(const JsonDocument &doc);
+
+// ===================== Negociación de baudios =====================
+void handleBaudRequest(const JsonDocument &doc);
+void handleBaudProbe(const JsonDocument &doc);
+void checkBaudProbeTimeout();
 
 // ===================== Interrupciones =====================
 void IRAM_ATTR onResetSignalHigh();
@@ -13,28 +59,68 @@ void IRAM_ATTR onResetSignalHigh();
 // ===================== HTTP handlers =====================
 void handleRoot();
 void handleHtmlPart(const JsonDocument &doc);
+void handleHtmlWindowPart(const JsonDocument &doc);
+void handleHtmlRaw(const JsonDocument &doc);
 
 // ===================== Access Point =====================
 void startAccessPoint(const String &ssid, const String &pass);
 void stopAccessPoint();
 
 // ===================== Endpoints =====================
+void initEndpointTable(int capacity = 0);
 int findEndpoint(const String &ep);
+int findLiveEndpoint(const String &ep);
+void handleEndpointsRequest(const JsonDocument &doc);
 void setEndpointData(const String &ep, const String &jsonData);
+bool mergeEndpointData(const String &ep, JsonObjectConst patch);
+void sendMissingEndpoints(JsonArrayConst labels);
+void handleWebServerBatch(JsonObjectConst batch, bool merge = false);
 void handleDynamic();
 
+// ===================== Historial =====================
+void recordHistory(const String &label, const String &jsonData);
+void handleHistoryRequest(const JsonDocument &doc);
+void sendHistory(const String &label);
+
+// ===================== Eventos (SSE) =====================
+void handleEvents();
+void pushEndpointEvent(const String &label, const String &jsonData);
+void pollEventClients();
+int eventClientCount();
+
 // ===================== HTTP Requests =====================
-void handleHttpGet(const String &url);
-void handleHttpPost(const String &url, const String &jsonPayload);
+struct HttpOptions
+{
+    int chunkSize = 0; // > 0: el cuerpo se reenvía en bloques de ese tamaño ("stream": true)
+    bool reuse = true; // Conexión keep-alive del pool ("reuse": false abre y cierra una propia)
+    JsonDocument filter; // "fields": filtro de ArduinoJson; vacío reenvía el cuerpo entero
+    String etag;         // "etag": se envía como If-None-Match (solo GET)
+    String modified;     // "modified": se envía como If-Modified-Since (solo GET)
+    bool validators = false; // "cache": true informa ETag, Last-Modified y Cache-Control de la respuesta
+};
+
+HttpOptions httpOptions(const JsonDocument &doc);
+void handleHttpGet(const String &url, const HttpOptions &options = HttpOptions());
+void handleHttpPost(const String &url, const String &jsonPayload, const String &contentType = "application/json",
+                    const HttpOptions &options = HttpOptions());
+void pollHttpPool();
+uint32_t httpRequestCount();
+uint32_t httpReuseCount();
+
+// ===================== Capacidades =====================
+void handleCapabilities();
 
 // ===================== Señal READY =====================
 void sendReadySignal();
 
 // ===================== Escaneo WiFi =====================
-void scanNetworks();
+void scanNetworks(const JsonDocument &doc);
+void pollScan();
 
 // ===================== Conexión WiFi =====================
-void connectToWiFi(const String &ssid, const String &pass);
+void connectToWiFi(const String &ssid, const String &pass, bool async = false);
+void pollWiFi();
+const char *wifiState();
 void disconnectWiFi();
 
 #endif
@@ -4,6 +4,7 @@
 #include <Arduino.h>
 #include <WiFi.h>
 #include <WebServer.h>
+#include <vector>
 
 // === Pines ===
 extern const gpio_num_t RESET_SIGNAL_PIN;
@@ -12,11 +13,15 @@ extern const int RXD_PIN;
 extern const gpio_num_t READY_PIN;
 
 extern const size_t BUF_SIZE;
+extern const size_t UART_RX_BUF_SIZE;
 
 // === UART y Web Server ===
 extern HardwareSerial UART1;
 extern WebServer server;
 extern bool uartEnabled;
+extern unsigned long uartBaud;
+extern bool binaryFraming;
+extern String currentRequestId;
 
 // === Fragmentos HTML ===
 extern String htmlPage;
@@ -28,10 +33,13 @@ extern int receivedParts;
 struct EndpointData {
   String endpoint;
   String jsonData;
+  uint32_t hash;         // Hash del label (índice de la tabla)
+  int next;              // Siguiente endpoint de la misma cubeta (-1: ninguno)
+  uint32_t lastUse;      // Orden del último uso, para LRU
+  unsigned long updated; // millis() de la última actualización, para TTL
 };
 
-extern const int MAX_ENDPOINTS;
-extern EndpointData endpoints[];
-extern int endpointCount;
+extern std::vector<EndpointData> endpoints;
+extern int endpointCapacity;
 
 #endif
@@ -14,20 +14,27 @@
 #include "functions.h"
 #include "commandHandler.h"
 const size_t BUF_SIZE = 1024;
+const size_t UART_RX_BUF_SIZE = 4096; // Permite varios comandos en vuelo (pipelining) mientras se atiende uno lento
 
 //=================================SETUP & LOOP ============================================================
 void setup()
 {
   Serial.begin(115200); // Debug
-  UART1.begin(115200, SERIAL_8N1, RXD_PIN, TXD_PIN);
+  UART1.setRxBufferSize(UART_RX_BUF_SIZE);
+  UART1.begin(uartBaud, SERIAL_8N1, RXD_PIN, TXD_PIN);
   pinMode(RESET_SIGNAL_PIN, INPUT);
   attachInterrupt(digitalPinToInterrupt(RESET_SIGNAL_PIN), onResetSignalHigh, RISING);
-  sendReadySignal();
   WiFi.mode(WIFI_AP_STA);
+  WiFi.setAutoReconnect(false); // La reconexión la lleva pollWiFi(), con la caché de BSSID y canal
+  const char *collectedHeaders[] = {"Accept-Encoding"}; // Para servir páginas gzip
+  server.collectHeaders(collectedHeaders, 1);
+  initAssetStore(); // Archivos guardados antes del último reinicio
+  initEndpointTable();
   server.onNotFound(handleDynamic);
   server.on("/", handleRoot);
+  server.on("/events", HTTP_GET, handleEvents); // Server-Sent Events de los endpoints
   server.begin();
-  delay(100);
+  sendReadySignal(); // Al final: el flanco de READY_PIN indica que ya se atienden comandos
   Serial.println("[ESP32] Setup completado.");
 }
 
@@ -36,7 +43,10 @@ void loop()
   static char buffer[BUF_SIZE];
   static size_t index = 0;
 
-  while (UART1.available() > 0)
+  if (binaryFraming)
+    pollFrames();
+
+  while (!binaryFraming && UART1.available() > 0)
   {
     char c = UART1.read();
     if (c == '\n' || c == '\r')
@@ -58,5 +68,10 @@ void loop()
       }
     }
   }
+  checkBaudProbeTimeout();
   server.handleClient();
+  pollEventClients();
+  pollHttpPool();
+  pollWiFi();
+  pollScan();
 }
\ No newline at end of file
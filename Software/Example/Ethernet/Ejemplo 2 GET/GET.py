@@ -9,6 +9,7 @@ import digitalio
 import adafruit_connection_manager
 import adafruit_requests
 from adafruit_wiznet5k.adafruit_wiznet5k import WIZNET5K
+from archinet.cache import CacheHTTP, pedir_requests
 
 
 # ================================
@@ -61,13 +62,17 @@ def mostrar_info_red(eth):
 # ================================
 # PETICIÓN HTTP
 # ================================
-def obtener_texto_url(requests, url):
-    """Realiza una petición GET y muestra el texto"""
+def obtener_texto_url(requests, url, cache=None):
+    """Realiza una petición GET y muestra el texto (con 'cache' reusa la copia guardada si sigue vigente)"""
     print("Fetching text from", url)
-    r = requests.get(url)
+    if cache is not None:
+        codigo, texto = cache.obtener(url, pedir_requests(requests))
+    else:
+        r = requests.get(url)
+        texto = r.text
+        r.close()
     print("-" * 40)
-    print(r.text)
-    r.close()
+    print(texto)
 
 
 # ================================
@@ -84,8 +89,11 @@ def main():
     # Información de red
     mostrar_info_red(eth)
 
-    # Realizar petición HTTP
-    obtener_texto_url(requests, TEXT_URL)
+    # Realizar petición HTTP; la segunda sale de la caché (o de un 304 si el servidor lo permite)
+    cache = CacheHTTP(max_bytes=4096, ttl=60)
+    obtener_texto_url(requests, TEXT_URL, cache)
+    obtener_texto_url(requests, TEXT_URL, cache)
+    print("Sin red:", cache.hits, "| Revalidadas:", cache.revalidadas, "| Descargadas:", cache.misses)
 
     # eth._debug = True  # Activar si necesitas ver más logs
 
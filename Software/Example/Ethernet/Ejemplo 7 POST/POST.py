@@ -9,6 +9,7 @@ import digitalio
 import adafruit_connection_manager
 import adafruit_requests
 from adafruit_wiznet5k.adafruit_wiznet5k import WIZNET5K
+from archinet.cola import ColaTelemetria, enviar_requests
 
 
 # ================================
@@ -59,6 +60,24 @@ def enviar_dato_post(requests, url, data):
         print("-" * 40)
 
 
+# ================================
+# ENVÍO EN LOTES
+# ================================
+def enviar_lecturas_en_lote(eth, requests, url, cantidad):
+    """
+    Guarda cada lectura en la flash y las envía de a 10 como un arreglo JSON; lo medido sin
+    enlace se envía cuando vuelve. Requiere CIRCUITPY con escritura habilitada en boot.py:
+    storage.remount("/", readonly=False)
+    """
+    cola = ColaTelemetria(enviar_requests(requests, url), ruta="/telemetria", lote=10, antiguedad=30)
+    for _ in range(cantidad):
+        cola.agregar({"t": time.monotonic(), "dato": DATA_A_ENVIAR})
+        cola.tick(conectado=eth.link_status)
+        time.sleep(1)
+    cola.vaciar()
+    print("Enviadas:", cola.enviadas, "| Peticiones:", cola.envios, "| Pendientes:", cola.pendientes)
+
+
 # ================================
 # FUNCIÓN PRINCIPAL
 # ================================
@@ -73,6 +92,9 @@ def main():
     # Enviar POST
     enviar_dato_post(requests, JSON_POST_URL, DATA_A_ENVIAR)
 
+    # Enviar varias lecturas en lotes
+    enviar_lecturas_en_lote(eth, requests, JSON_POST_URL, 25)
+
 
 # ================================
 # PUNTO DE ENTRADA
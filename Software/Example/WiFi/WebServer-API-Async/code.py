@@ -0,0 +1,70 @@
+import time
+import board
+import busio
+import digitalio
+import random
+import asyncio
+
+from archinet.asincrono import ClienteESP32Async
+
+
+async def muestrear_sensor(estado):
+    # Tarea de sensor: sigue muestreando aunque el ESP32 esté ocupado
+    while True:
+        estado["temperatura"] = round(random.uniform(20, 30), 1)
+        estado["muestras"] += 1
+        await asyncio.sleep(0.1)
+
+
+async def publicar_api(esp, estado):
+    # Publica el último valor cada 5 s en http://{ip}/Temperatura
+    while True:
+        try:
+            await esp.publish_endpoint("Temperatura", {"dato1": estado["temperatura"],
+                                                       "muestras": estado["muestras"]})
+        except Exception as e:
+            print("No se pudo publicar:", e)
+        await asyncio.sleep(5)
+
+
+async def main():
+    # --- Reset físico del ESP32 ---
+    # Se reinicia el ESP32 para que no queden tareas previas o estados inconsistentes.
+    reset_pin = digitalio.DigitalInOut(board.GP15)
+    reset_pin.direction = digitalio.Direction.OUTPUT
+    print("Reiniciando ESP32-S3...")
+
+    # Pulso de reset: alto - bajo - alto, con pausas para asegurar que se registre
+    reset_pin.value = True
+    time.sleep(0.1)
+    reset_pin.value = False
+    time.sleep(0.1)
+    reset_pin.value = True
+    time.sleep(1)  # Espera a que el ESP32 arranque completamente
+    reset_pin.deinit()  # Libera el pin para evitar consumo o interferencias
+
+    # UART con timeout 0: la tarea de lectura solo lee lo que ya llegó
+    uart = busio.UART(tx=board.GP12, rx=board.GP13, baudrate=115200, timeout=0)
+    esp = ClienteESP32Async(uart, ready_pin=board.GP14)
+
+    # Espera que el ESP32 indique que está listo para comunicarse
+    if not await esp.esperar_ready(timeout=10):
+        print("ESP32 no está listo.")
+        return
+    await esp.iniciar()
+
+    # Conectar a WiFi (reemplazar ssid y pass por los reales)
+    print("\n--- TEST: CONNECT ---")
+    try:
+        print("IP:", await esp.connect("xxx", "xxx"))
+    except Exception as e:
+        print(e)
+        return
+
+    print("\n--- INICIANDO API ---")
+    estado = {"temperatura": 0.0, "muestras": 0}
+    await asyncio.gather(muestrear_sensor(estado), publicar_api(esp, estado))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
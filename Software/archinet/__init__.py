@@ -0,0 +1,12 @@
+"""
+ArchiNET - librería de host para el ESP32-S3 como coprocesador de comunicaciones.
+
+Copiar la carpeta ``archinet`` a ``CIRCUITPY/lib`` para usarla desde Archi (RP2040).
+En CPython (Linux) se puede usar con un transporte pty/socket o con el emulador
+del firmware (``archinet.emulador``) para pruebas y benchmarks sin hardware.
+"""
+
+from .errores import ErrorESP32, TiempoAgotado, TramaCorrupta
+from .uart import ESP32UART
+
+__all__ = ["ESP32UART", "ErrorESP32", "TiempoAgotado", "TramaCorrupta"]
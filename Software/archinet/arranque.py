@@ -0,0 +1,113 @@
+"""
+Arranque del ESP32 guiado por el pin ready, sin pausas fijas.
+
+Los ejemplos reiniciaban el ESP32 con un pulso en GP15 y esperaban un segundo
+fijo antes de mirar el pin ready: más de 1 s perdido en cada arranque, y aun
+así un ESP32 lento podía no estar listo (o el pin seguir en alto desde la
+sesión anterior). GestorArranque hace el pulso (el flanco de subida en GPIO0
+dispara esp_restart()), ve caer el pin ready mientras el ESP32 reinicia y
+vuelve apenas sendReadySignal() lo sube, midiendo el tiempo de arranque.
+
+Con iniciar() ni siquiera reinicia si el ESP32 ya responde a PING
+("arranque tibio", por ejemplo al volver a ejecutar code.py):
+
+    from archinet.arranque import GestorArranque
+
+    esp = ESP32UART(tx_pin=board.GP12, rx_pin=board.GP13, ready_pin=board.GP14)
+    arranque = GestorArranque(esp, reset_pin=board.GP15)
+    arranque.iniciar()
+    print(arranque.modo, arranque.latencia)  # "tibio" o "reinicio", en segundos
+
+La espera es un sondeo continuo del pin: un pulso de ready dura más que una
+vuelta del bucle, así que no hace falta countio ni keypad (que además
+necesitan el pin libre, y ESP32UART ya lo usa como DigitalInOut).
+"""
+
+import time
+
+from .errores import ErrorESP32, TiempoAgotado
+from .respuestas import ESTADO
+
+
+class GestorArranque:
+    def __init__(self, esp, reset_pin, pulso=0.01):
+        """
+        esp: el ESP32UART, creado con 'ready_pin'.
+        reset_pin: pin de 'board' conectado a GPIO0 del ESP32 (GP15), o un
+        objeto que ya exponga '.value' escribible.
+        pulso: segundos en bajo antes del flanco de subida que reinicia.
+        """
+        if esp.ready_pin is None:
+            raise ErrorESP32("GestorArranque necesita el pin ready del ESP32UART")
+        self.esp = esp
+        self.pulso = pulso
+        # La UART se crea a la velocidad de arranque del firmware (uartBaud); un reinicio vuelve a ella
+        self.baudios = getattr(esp.uart, "baudrate", None)
+        if hasattr(reset_pin, "value"):
+            self.reset_pin = reset_pin
+        else:
+            import digitalio
+            # GPIO0 es pin de arranque: queda en alto para que el ESP32 no entre en modo descarga
+            self.reset_pin = digitalio.DigitalInOut(reset_pin)
+            self.reset_pin.switch_to_output(value=True)
+        self.modo = None  # "tibio" o "reinicio" después de iniciar()
+        self.latencia = None  # Segundos del último arranque (o del PING en un arranque tibio)
+
+    def iniciar(self, tibio=True, timeout=5):
+        """
+        Deja el ESP32 listo para recibir comandos: si 'tibio' y responde a
+        PING lo usa tal como está; si no, lo reinicia. Devuelve 'latencia'.
+        Lanza TiempoAgotado si no arranca dentro de 'timeout' segundos.
+        """
+        if tibio:
+            inicio = time.monotonic_ns()
+            if self.responde():
+                self.modo = "tibio"
+                self.latencia = (time.monotonic_ns() - inicio) / 1e9
+                return self.latencia
+        self.reiniciar(timeout)
+        self.modo = "reinicio"
+        return self.latencia
+
+    def responde(self, timeout=0.2):
+        """True si el ESP32 contesta un PING a la velocidad y el modo actuales de la UART."""
+        try:
+            self.esp.solicitar_comando({"cmd": "PING"})
+            textos = [registro.texto for registro in self.esp.respuestas(timeout) if registro.tipo == ESTADO]
+        except ErrorESP32:
+            self.esp._descartar()
+            return False
+        return any("PING recibido" in texto for texto in textos)
+
+    def reiniciar(self, timeout=5):
+        """
+        Reinicia el ESP32 y espera el flanco de subida del pin ready.
+        Devuelve los segundos desde el reinicio hasta que quedó listo.
+        """
+        ready = self.esp.ready_pin
+        self.reset_pin.value = False
+        time.sleep(self.pulso)
+        self.reset_pin.value = True  # Flanco de subida: esp_restart()
+        inicio = time.monotonic_ns()
+        limite = inicio + int(timeout * 1e9)
+        bajo = False  # Hay que verlo en bajo: en alto puede ser todavía el de antes del reinicio
+        while True:
+            ahora = time.monotonic_ns()
+            if ready.value:
+                if bajo:
+                    break
+            else:
+                bajo = True
+            if ahora >= limite:
+                raise TiempoAgotado("El ESP32 no indicó ready en %g s" % timeout)
+        self.latencia = (ahora - inicio) / 1e9
+
+        # El firmware vuelve a la velocidad inicial y a modo texto
+        if self.baudios:
+            self.esp.uart.baudrate = self.baudios
+        self.esp.tramas = None
+        self.esp.wifi = None
+        if hasattr(self.esp.uart, "reset_input_buffer"):
+            self.esp.uart.reset_input_buffer()  # Lo que quedó del firmware anterior
+        self.esp._descartar()
+        return self.latencia
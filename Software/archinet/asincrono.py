@@ -0,0 +1,239 @@
+"""
+Cliente asyncio del ESP32 para CircuitPython y CPython.
+
+La lectura de la UART corre como tarea de fondo: solo lee cuando 'in_waiting'
+indica datos, así que nunca bloquea el bucle de eventos y las tareas de
+sensores siguen corriendo mientras el ESP32 atiende un GET o un CONNECT.
+Los comandos se envían con "id" (ver archinet.pipeline), por lo que varias
+tareas pueden usar el mismo cliente a la vez.
+
+    import asyncio
+    from archinet.asincrono import ClienteESP32Async
+
+    async def main():
+        esp = ClienteESP32Async(uart, ready_pin=board.GP14)
+        await esp.iniciar()
+        ip = await esp.connect("mi_red", "mi_clave")
+        # O sin esperar: la conexión sigue mientras corren otras tareas
+        await esp.begin_connect("mi_red", "mi_clave")
+        ip = await esp.wait_connected(timeout=15)
+        codigo, cuerpo = await esp.get("http://jsonplaceholder.typicode.com/todos/1")
+"""
+
+import time
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+from .errores import ErrorESP32, TiempoAgotado
+from .pipeline import ClientePipeline
+from .respuestas import CUERPO, ESTADO, HTTP, JSON
+from .uart import ESP32UART
+from .wifi import comando_scan, redes_de
+
+
+class ClienteESP32Async:
+    def __init__(self, uart=None, ready_pin=None, tx_pin=None, rx_pin=None, baudrate=115200,
+                 max_en_vuelo=4, intervalo=0.005):
+        """
+        uart: transporte con la interfaz de busio.UART; si es None se crea uno
+        con tx_pin/rx_pin. intervalo: segundos entre sondeos de 'in_waiting'
+        cuando la UART está vacía.
+        """
+        self.esp = ESP32UART(tx_pin=tx_pin, rx_pin=rx_pin, ready_pin=ready_pin,
+                             baudrate=baudrate, uart=uart)
+        self.pipeline = ClientePipeline(self.esp, max_en_vuelo)
+        self.pipeline.al_terminar = self._al_terminar
+        self.intervalo = intervalo
+        self._eventos = {}
+        self._tarea = None
+        # Excepción que terminó la tarea de lectura (transporte caído, error en al_evento)
+        self.fallo = None
+
+    # ------------------------------------------------------------------ ciclo de vida
+    async def iniciar(self):
+        """Arranca la tarea de lectura de la UART (o la vuelve a arrancar si falló)."""
+        if self._tarea is None:
+            self.fallo = None
+            self._tarea = asyncio.create_task(self._leer())
+
+    async def _leer(self):
+        uart = self.esp.uart
+        try:
+            while True:
+                if uart.in_waiting:
+                    self.pipeline.bombear()
+                    await asyncio.sleep(0)
+                else:
+                    await asyncio.sleep(self.intervalo)
+        except Exception as e:
+            # Nadie espera esta tarea: se guarda el error y se despierta a los comandos
+            # en vuelo para que lo lancen, en lugar de esperar hasta su timeout
+            self.fallo = e
+            self._tarea = None
+            eventos, self._eventos = self._eventos, {}
+            for evento in eventos.values():
+                evento.set()
+
+    def _revisar_fallo(self, comando=None):
+        if self.fallo is not None:
+            raise ErrorESP32("Falló la lectura de la UART%s: %r"
+                             % (" esperando %s" % comando.get("cmd") if comando else "", self.fallo))
+
+    def cerrar(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+
+    async def esperar_ready(self, timeout=5):
+        """Igual que ESP32UART.esperar_ready, sin bloquear el bucle de eventos."""
+        if self.esp.ready_pin is None:
+            return True
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < timeout:
+            if self.esp.ready_pin.value:
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    # ------------------------------------------------------------------ comandos
+    def _al_terminar(self, pedido):
+        evento = self._eventos.pop(pedido.id, None)
+        if evento is not None:
+            evento.set()
+
+    async def comando(self, comando, timeout=5):
+        """
+        Envía un comando JSON y devuelve la lista de registros de su respuesta.
+        Lanza ErrorESP32 si la tarea de lectura falla mientras espera (por
+        ejemplo un OSError del transporte); el próximo comando la rearranca.
+        """
+        await self.iniciar()
+        inicio = time.monotonic()
+        while self.pipeline.en_vuelo >= self.pipeline.max_en_vuelo:
+            self._revisar_fallo()
+            if time.monotonic() - inicio >= timeout:
+                raise TiempoAgotado("Ningún comando en vuelo terminó en %s s" % timeout)
+            await asyncio.sleep(self.intervalo)
+
+        evento = asyncio.Event()
+        pedido = self.pipeline.enviar(comando)
+        self._eventos[pedido.id] = evento
+        try:
+            await asyncio.wait_for(evento.wait(), max(0, timeout - (time.monotonic() - inicio)))
+        except asyncio.TimeoutError:
+            self._eventos.pop(pedido.id, None)
+            self.pipeline.abandonar(pedido)
+            raise TiempoAgotado("Sin respuesta a %s en %s s" % (comando.get("cmd"), timeout))
+        if not pedido.terminado:
+            self.pipeline.abandonar(pedido)
+            self._revisar_fallo(comando)
+        if pedido.perdido:
+            raise ErrorESP32("Sin respuesta completa a %s" % comando.get("cmd"))
+        return pedido.registros
+
+    async def connect(self, ssid, clave, timeout=15):
+        """Conecta a una red WiFi y devuelve la IP obtenida."""
+        registros = await self.comando({"cmd": "CONNECT", "ssid": ssid, "pass": clave}, timeout)
+        for registro in registros:
+            if registro.tipo == ESTADO and "OK|IP: " in registro.valor:
+                return registro.valor.split("OK|IP: ", 1)[1]
+        raise ErrorESP32(_mensaje(registros, "No se pudo conectar a %s" % ssid))
+
+    async def begin_connect(self, ssid, clave, timeout=5):
+        """
+        Inicia la conexión a una red WiFi (CONNECT con "async": true) y
+        vuelve sin esperarla; el firmware informa el progreso con eventos.
+        """
+        registros = await self.comando({"cmd": "CONNECT", "ssid": ssid, "pass": clave, "async": True}, timeout)
+        for registro in registros:
+            if registro.tipo == ESTADO and "Conectando a" in registro.valor:
+                return
+        raise ErrorESP32(_mensaje(registros, "No se pudo iniciar la conexión a %s" % ssid))
+
+    async def wait_connected(self, timeout=15):
+        """
+        Espera, sin bloquear el bucle de eventos, a que el WiFi pedido con
+        begin_connect (o una reconexión automática) quede conectado y
+        devuelve la IP. Lanza ErrorESP32 si el intento falla.
+        """
+        await self.iniciar()
+        inicio = time.monotonic()
+        while True:
+            wifi = self.esp.wifi
+            estado = wifi.get("state") if wifi else None
+            if estado == "connected":
+                return wifi.get("ip")
+            if estado == "failed":
+                raise ErrorESP32("No se pudo conectar a %s" % wifi.get("ssid"))
+            self._revisar_fallo()
+            if time.monotonic() - inicio >= timeout:
+                raise TiempoAgotado("Sin conexión WiFi en %s s (estado: %s)" % (timeout, estado))
+            await asyncio.sleep(self.intervalo)
+
+    async def get(self, url, timeout=30):
+        """Hace un GET desde el ESP32 y devuelve (codigo, cuerpo)."""
+        return _respuesta_http(await self.comando({"cmd": "GET", "url": url}, timeout))
+
+    async def post(self, url, datos, timeout=30):
+        """Hace un POST con 'datos' como JSON y devuelve (codigo, cuerpo)."""
+        return _respuesta_http(await self.comando({"cmd": "POST", "url": url, "data": datos}, timeout))
+
+    async def scan(self, ttl=None, min_rssi=None, canal=None, prefijo=None, maximo=None, timeout=30):
+        """
+        Escanea redes WiFi (o toma la caché del ESP32, ver archinet.wifi) y
+        devuelve una lista de dicts {"ssid", "bssid", "rssi", "channel", "auth"}.
+        """
+        registros = await self.comando(comando_scan(ttl, min_rssi, canal, prefijo, maximo), timeout)
+        return redes_de(registros)["networks"]
+
+    async def info(self, timeout=5):
+        """Devuelve el JSON de INFO (chip, ip, rssi, heap, http, reuse)."""
+        for registro in await self.comando({"cmd": "INFO"}, timeout):
+            if registro.tipo == JSON:
+                return registro.valor
+        raise ErrorESP32("INFO sin datos")
+
+    async def publish_endpoint(self, label, datos, timeout=5):
+        """Crea o actualiza el endpoint http://<ip>/<label> con 'datos'."""
+        registros = await self.comando({"cmd": "WebServer", "label": label, "data": datos}, timeout)
+        for registro in registros:
+            if registro.tipo == ESTADO and registro.valor.endswith("actualizado"):
+                return True
+        raise ErrorESP32(_mensaje(registros, "No se pudo publicar /%s" % label))
+
+    async def publish_endpoints(self, datos_por_label, timeout=5):
+        """
+        Actualiza varios endpoints con un solo comando WebServer "batch"
+        ({label: datos}); el ESP32 los aplica todos o ninguno.
+        """
+        registros = await self.comando({"cmd": "WebServer", "batch": datos_por_label}, timeout)
+        for registro in registros:
+            if registro.tipo == ESTADO and registro.valor.endswith("actualizados"):
+                return True
+        raise ErrorESP32(_mensaje(registros, "No se pudieron publicar %d endpoints" % len(datos_por_label)))
+
+
+def _respuesta_http(registros):
+    codigo = None
+    partes = []
+    for registro in registros:
+        if registro.tipo == HTTP:
+            codigo = registro.valor
+        elif registro.tipo == CUERPO:
+            partes.append(registro.valor)
+    if codigo is None:
+        raise ErrorESP32(_mensaje(registros, "Respuesta HTTP sin código"))
+    if partes and isinstance(partes[0], bytes):
+        # Modo tramas: cuerpo crudo en tramas 'D'
+        return codigo, b"".join(partes).decode("utf-8")
+    return codigo, "".join(partes)
+
+
+def _mensaje(registros, defecto):
+    for registro in registros:
+        if registro.tipo == ESTADO:
+            return registro.valor
+    return defecto
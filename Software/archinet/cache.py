@@ -0,0 +1,195 @@
+"""
+Caché de respuestas HTTP en el host, con TTL y revalidación.
+
+Cada GET de una configuración o una tabla que casi nunca cambia vuelve a bajar
+el cuerpo entero. CacheHTTP guarda las respuestas 200 por URL, con un límite de
+bytes y de entradas (desaloja la menos usada). Mientras una copia está vigente
+se devuelve sin red; cuando vence y el servidor había enviado ETag o
+Last-Modified se revalida con If-None-Match / If-Modified-Since, y un 304 (sin
+cuerpo) la renueva. La vigencia es el 'ttl' pedido, o el max-age de
+Cache-Control, o el 'ttl' de la caché; "no-store" no se guarda y "no-cache"
+se revalida siempre.
+
+Sirve para los dos caminos HTTP de Archi: el comando GET del ESP32
+(pedir_esp) y una sesión de adafruit_requests por Ethernet (pedir_requests):
+
+    from archinet.cache import CacheHTTP, pedir_esp, pedir_requests
+
+    cache = CacheHTTP(max_bytes=8192, ttl=60)
+    codigo, texto = cache.obtener("http://servidor/config.json", pedir_esp(esp))
+    codigo, texto = cache.obtener("http://servidor/config.json", pedir_requests(requests))
+"""
+
+import time
+
+from .errores import ErrorESP32
+from .respuestas import CUERPO, ESTADO, HTTP, JSON
+
+
+class CacheHTTP:
+    def __init__(self, max_bytes=16384, max_entradas=32, ttl=60):
+        """
+        max_bytes: suma máxima del largo de los cuerpos guardados.
+        max_entradas: URLs guardadas a la vez.
+        ttl: segundos de vigencia si ni obtener() ni el servidor indican otra.
+        """
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = {}  # url -> [cuerpo, etag, modificado, vence, uso]
+        self._bytes = 0
+        self._reloj_uso = 0
+        self.hits = 0  # Servidas sin red
+        self.revalidadas = 0  # Renovadas con un 304
+        self.misses = 0  # Cuerpo bajado entero
+        self.desalojos = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def obtener(self, url, pedir, ttl=None):
+        """
+        Devuelve (codigo, cuerpo) de un GET a 'url', de la caché si se puede.
+        pedir(url, validadores) hace la petición: 'validadores' es un dict con
+        "etag" y/o "modified" (vacío si no hay copia) y devuelve (codigo,
+        cuerpo, cabeceras), con "etag", "modified" y "cache" (Cache-Control)
+        en 'cabeceras'. Una copia revalidada se devuelve con código 200.
+        """
+        ahora = time.monotonic()
+        entrada = self._entradas.get(url)
+        if entrada is not None and ahora < entrada[3]:
+            self.hits += 1
+            self._usar(entrada)
+            return 200, entrada[0]
+
+        validadores = {}
+        if entrada is not None:
+            if entrada[1]:
+                validadores["etag"] = entrada[1]
+            if entrada[2]:
+                validadores["modified"] = entrada[2]
+        codigo, cuerpo, cabeceras = pedir(url, validadores)
+
+        if codigo == 304 and entrada is not None:
+            self.revalidadas += 1
+            # El 304 puede traer validadores y vigencia nuevos
+            entrada[1] = cabeceras.get("etag") or entrada[1]
+            entrada[2] = cabeceras.get("modified") or entrada[2]
+            entrada[3] = ahora + self._vigencia(cabeceras.get("cache", ""), ttl)
+            self._usar(entrada)
+            return 200, entrada[0]
+
+        self.misses += 1
+        if codigo <= 0:
+            return codigo, cuerpo  # Sin red: la copia vencida se conserva para revalidar después
+        self._quitar(url)
+        control = cabeceras.get("cache", "").lower()
+        if codigo == 200 and "no-store" not in control and len(cuerpo) <= self.max_bytes:
+            while self._entradas and (len(self._entradas) >= self.max_entradas
+                                      or self._bytes + len(cuerpo) > self.max_bytes):
+                victima = min(self._entradas, key=lambda clave: self._entradas[clave][4])
+                self._quitar(victima)
+                self.desalojos += 1
+            entrada = [cuerpo, cabeceras.get("etag", ""), cabeceras.get("modified", ""),
+                       ahora + self._vigencia(control, ttl), 0]
+            self._entradas[url] = entrada
+            self._bytes += len(cuerpo)
+            self._usar(entrada)
+        return codigo, cuerpo
+
+    def invalidar(self, url=None):
+        """Borra la copia de 'url', o todas si no se indica."""
+        if url is None:
+            self._entradas = {}
+            self._bytes = 0
+        else:
+            self._quitar(url)
+
+    def _usar(self, entrada):
+        self._reloj_uso += 1
+        entrada[4] = self._reloj_uso
+
+    def _quitar(self, url):
+        entrada = self._entradas.pop(url, None)
+        if entrada is not None:
+            self._bytes -= len(entrada[0])
+
+    def _vigencia(self, control, ttl):
+        control = control.lower()
+        if "no-cache" in control:
+            return 0
+        if ttl is not None:
+            return ttl
+        for directiva in control.split(","):
+            nombre, _, valor = directiva.strip().partition("=")
+            if nombre == "max-age":
+                try:
+                    return int(valor)
+                except ValueError:
+                    break
+        return self.ttl
+
+
+def pedir_esp(esp, timeout=10):
+    """
+    Función 'pedir' para CacheHTTP.obtener() con el comando GET del ESP32. Con
+    un firmware que no informa "validators" en CAPS solo se usa el TTL.
+    """
+    revalida = "validators" in esp.capacidades()
+
+    def pedir(url, validadores):
+        comando = {"cmd": "GET", "url": url}
+        if revalida:
+            comando["cache"] = True
+            comando.update(validadores)
+        esp.solicitar_comando(comando)
+        codigo = None
+        cabeceras = {}
+        partes = []
+        textos = []
+        for registro in esp.respuestas(timeout):
+            if registro.tipo == JSON and codigo is None:
+                cabeceras = registro.valor  # Validadores, antes del código
+            elif registro.tipo == HTTP:
+                codigo = registro.valor
+            elif registro.tipo == CUERPO:
+                partes.append(registro.valor)
+            elif registro.tipo == ESTADO:
+                textos.append(registro.texto)
+        if codigo is None:
+            raise ErrorESP32(textos[-1] if textos else "GET sin respuesta")
+        if partes and isinstance(partes[0], bytes):
+            cuerpo = b"".join(partes).decode("utf-8")  # Modo tramas
+        else:
+            cuerpo = "".join(partes)
+        return codigo, cuerpo, cabeceras
+
+    return pedir
+
+
+def pedir_requests(session):
+    """Función 'pedir' para CacheHTTP.obtener() con una sesión de adafruit_requests (o requests)."""
+
+    def pedir(url, validadores):
+        cabeceras = {}
+        if "etag" in validadores:
+            cabeceras["If-None-Match"] = validadores["etag"]
+        if "modified" in validadores:
+            cabeceras["If-Modified-Since"] = validadores["modified"]
+        respuesta = session.get(url, headers=cabeceras)
+        try:
+            codigo = respuesta.status_code
+            recibidas = {
+                "etag": respuesta.headers.get("etag", ""),
+                "modified": respuesta.headers.get("last-modified", ""),
+                "cache": respuesta.headers.get("cache-control", ""),
+            }
+            return codigo, "" if codigo == 304 else respuesta.text, recibidas
+        finally:
+            respuesta.close()
+
+    return pedir
@@ -0,0 +1,332 @@
+"""
+Cola de telemetría en la flash, enviada en lotes.
+
+Un POST por lectura paga una ida y vuelta HTTP completa por cada valor, y lo
+que se mide mientras no hay red se pierde. ColaTelemetria guarda cada lectura
+como una línea JSON en archivos de la flash (CIRCUITPY) y las envía de a
+varias, como un arreglo JSON, cuando se juntan 'lote' lecturas, cuando la más
+vieja pendiente tiene 'antiguedad' segundos o cuando vuelve el enlace. Lo
+enviado se marca en un cursor (ruta + ".pos"), así un reinicio no reenvía
+ni pierde nada.
+
+Los archivos rotan por tamaño: ruta + ".1", ".2", ... de max_bytes/segmentos
+bytes cada uno. Si la red falta tanto que se llenan todos, se borra el más
+viejo (y sus lecturas cuentan en 'descartadas').
+
+    from archinet.cola import ColaTelemetria, enviar_esp
+
+    cola = ColaTelemetria(enviar_esp(esp, "http://servidor/telemetria"), lote=20, antiguedad=60)
+    while True:
+        cola.agregar({"t": time.time(), "temperatura": leer_temperatura()})
+        cola.tick(conectado=wifi_conectado)
+        time.sleep(5)
+
+En CircuitPython el código solo puede escribir en CIRCUITPY si boot.py lo
+monta con storage.remount("/", readonly=False) (y entonces la PC lo ve de solo
+lectura).
+"""
+
+import json
+import os
+import time
+
+from .errores import ErrorESP32
+from .respuestas import HTTP
+
+RAW_BODY_MAX = 65536  # Mismo límite que el firmware para un POST "raw"
+
+
+class LecturaDescartada(Exception):
+    """
+    La primera lectura pasada a enviar() nunca va a poder enviarse (por
+    ejemplo, no entra en un comando): la cola la descarta y sigue con las
+    demás en lugar de reintentarla para siempre.
+    """
+
+
+class ColaTelemetria:
+    def __init__(self, enviar, ruta="/telemetria", max_bytes=65536, segmentos=4, lote=20, antiguedad=60,
+                 reintento=15):
+        """
+        enviar(lecturas): envía la lista 'lecturas' y devuelve cuántas, desde
+        el principio, quedaron enviadas (0 si falló), o lanza
+        LecturaDescartada si la primera no se puede enviar nunca; ver
+        enviar_esp y enviar_requests.
+        ruta: prefijo de los archivos en la flash.
+        max_bytes: espacio máximo entre todos los segmentos.
+        lote, antiguedad: tick() envía al juntar 'lote' lecturas o cuando la
+        más vieja pendiente tiene 'antiguedad' segundos.
+        reintento: segundos de espera después de un envío fallido.
+        """
+        self.enviar = enviar
+        self.ruta = ruta
+        self.max_segmentos = max(2, segmentos)
+        self.max_segmento = max(256, max_bytes // self.max_segmentos)
+        self.lote = lote
+        self.antiguedad = antiguedad
+        self.reintento = reintento
+        self.enviadas = 0
+        self.descartadas = 0
+        self.envios = 0  # Peticiones con éxito
+        self.error = None  # Último error de enviar(), si lo hubo
+        self._fallo = None
+        self._conectado = None
+
+        carpeta, _, base = ruta.rpartition("/")
+        self._carpeta = carpeta or "/"
+        prefijo = base + "."
+        self._segmentos = sorted(int(nombre[len(prefijo):]) for nombre in os.listdir(self._carpeta)
+                                 if nombre.startswith(prefijo) and nombre[len(prefijo):].isdigit())
+        self._siguiente = self._segmentos[-1] + 1 if self._segmentos else 1
+        self._cursor = self._leer_cursor()
+        self._tamano = _tamano(self._archivo(self._segmentos[-1])) if self._segmentos else 0
+        if self._tamano and not self._termina_en_linea(self._segmentos[-1]):
+            self._tamano = self.max_segmento  # Última línea cortada (sin energía): se sigue en otro segmento
+        self.pendientes = sum(self._contar(numero) for numero in self._segmentos)
+        # Lo que quedó de antes del reinicio se envía en el primer tick()
+        self._desde = time.monotonic() - antiguedad if self.pendientes else None
+
+    def agregar(self, lectura):
+        """Guarda 'lectura' (cualquier valor JSON) en la flash para el próximo envío."""
+        linea = (json.dumps(lectura) + "\n").encode()
+        if not self._segmentos or (self._tamano and self._tamano + len(linea) > self.max_segmento):
+            self._rotar()
+        with open(self._archivo(self._segmentos[-1]), "ab") as archivo:
+            archivo.write(linea)
+        self._tamano += len(linea)
+        self.pendientes += 1
+        if self._desde is None:
+            self._desde = time.monotonic()
+
+    def tick(self, conectado=None):
+        """
+        Envía si toca: 'lote' lecturas juntas, la más vieja con 'antiguedad'
+        segundos, o 'conectado' pasó de False a True (vuelve el enlace). Con
+        conectado=False no intenta. Devuelve cuántas lecturas se enviaron.
+        """
+        volvio = conectado is True and self._conectado is False
+        if conectado is not None:
+            self._conectado = conectado
+        if not self.pendientes or conectado is False:
+            return 0
+        if not volvio:
+            ahora = time.monotonic()
+            if self._fallo is not None and ahora - self._fallo < self.reintento:
+                return 0
+            if self.pendientes < self.lote and ahora - self._desde < self.antiguedad:
+                return 0
+        return self.vaciar()
+
+    def vaciar(self):
+        """Envía todas las lecturas pendientes, de a 'lote'; se detiene en el primer fallo."""
+        total = 0
+        while self.pendientes:
+            lecturas, posiciones = self._leer(self.lote)
+            if not lecturas:
+                break  # Solo quedaban líneas inválidas
+            try:
+                enviadas = self.enviar(lecturas)
+            except LecturaDescartada as error:
+                # Reintentarla bloquearía la cola: se saltea, como las de un segmento borrado
+                self.error = str(error)
+                self.descartadas += 1
+                self.pendientes -= 1
+                self._avanzar(posiciones[0])
+                continue
+            except Exception as error:  # noqa: BLE001 - sin red, el transporte puede lanzar cualquier cosa
+                self.error = str(error)
+                enviadas = 0
+            if enviadas <= 0:
+                self._fallo = time.monotonic()
+                break
+            self._fallo = None
+            self.error = None
+            self.envios += 1
+            self.enviadas += enviadas
+            self.pendientes -= enviadas
+            total += enviadas
+            self._avanzar(posiciones[enviadas - 1])
+        if not self.pendientes:
+            self._desde = None
+        return total
+
+    # ------------------------------------------------------------ archivos
+    def _archivo(self, numero):
+        return "%s.%d" % (self.ruta, numero)
+
+    def _leer_cursor(self):
+        try:
+            with open(self.ruta + ".pos") as archivo:
+                numero, posicion = archivo.read().split()
+            numero, posicion = int(numero), int(posicion)
+        except (OSError, ValueError):
+            numero, posicion = 0, 0
+        if numero not in self._segmentos:
+            return (self._segmentos[0] if self._segmentos else 0), 0
+        return numero, posicion
+
+    def _guardar_cursor(self):
+        with open(self.ruta + ".pos", "w") as archivo:
+            archivo.write("%d %d" % self._cursor)
+
+    def _termina_en_linea(self, numero):
+        with open(self._archivo(numero), "rb") as archivo:
+            archivo.seek(self._tamano - 1)
+            return archivo.read(1) == b"\n"
+
+    def _contar(self, numero):
+        # Líneas sin enviar del segmento 'numero'
+        desde = self._cursor[1] if numero == self._cursor[0] else 0
+        with open(self._archivo(numero), "rb") as archivo:
+            archivo.seek(desde)
+            return sum(1 for linea in archivo if linea.strip())
+
+    def _rotar(self):
+        numero = self._siguiente
+        self._siguiente += 1
+        self._segmentos.append(numero)
+        self._tamano = 0
+        if len(self._segmentos) == 1:
+            self._cursor = (numero, 0)
+        while len(self._segmentos) > self.max_segmentos:
+            # Sin espacio: se pierde lo más viejo
+            viejo = self._segmentos[0]
+            perdidas = self._contar(viejo)
+            self.descartadas += perdidas
+            self.pendientes -= perdidas
+            self._borrar(viejo)
+
+    def _borrar(self, numero):
+        os.remove(self._archivo(numero))
+        self._segmentos.remove(numero)
+        if self._cursor[0] == numero:
+            self._cursor = (self._segmentos[0] if self._segmentos else self._siguiente, 0)
+            self._guardar_cursor()
+
+    def _leer(self, cantidad):
+        # Hasta 'cantidad' lecturas desde el cursor y la posición (segmento, byte) donde termina cada una
+        lecturas = []
+        posiciones = []
+        salto = None  # Fin de las líneas inválidas previas a la primera lectura
+        numero, desde = self._cursor
+        for segmento in self._segmentos:
+            if segmento < numero:
+                continue
+            completo = True
+            with open(self._archivo(segmento), "rb") as archivo:
+                archivo.seek(desde if segmento == numero else 0)
+                posicion = archivo.tell()
+                for linea in archivo:
+                    posicion += len(linea)
+                    if not linea.strip():
+                        continue
+                    try:
+                        lectura = json.loads(linea)
+                    except ValueError:
+                        if lecturas:
+                            completo = False  # Se descarta en la próxima lectura, cuando quede primera
+                            break
+                        # Línea cortada por un corte de energía: se saltea
+                        self.descartadas += 1
+                        self.pendientes -= 1
+                        salto = (segmento, posicion)
+                        continue
+                    lecturas.append(lectura)
+                    posiciones.append((segmento, posicion))
+                    if len(lecturas) >= cantidad:
+                        completo = False
+                        break
+            if not completo:
+                break
+        if salto is not None:
+            self._avanzar(salto)
+        return lecturas, posiciones
+
+    def _avanzar(self, posicion):
+        # Marca como enviado todo hasta 'posicion'; los segmentos ya enviados se borran
+        numero, desde = posicion
+        for segmento in list(self._segmentos):
+            if segmento < numero:
+                self._borrar(segmento)
+        self._cursor = (numero, desde)
+        if numero == self._segmentos[-1] and desde >= self._tamano:
+            self._borrar(numero)  # Todo enviado: el próximo agregar() empieza otro segmento
+            self._tamano = 0
+        elif desde >= _tamano(self._archivo(numero)):
+            self._borrar(numero)
+        else:
+            self._guardar_cursor()
+
+
+def _tamano(ruta):
+    try:
+        return os.stat(ruta)[6]
+    except OSError:
+        return 0
+
+
+def enviar_esp(esp, url, timeout=10):
+    """
+    Función 'enviar' para ColaTelemetria: POST de las lecturas como arreglo
+    JSON por el ESP32. En modo texto van las que entran en un comando (largo
+    "line" de CAPS); en modo tramas, hasta 64 KB en un POST "raw".
+    Si un POST queda sin respuesta, su respuesta tardía y su {"end": true}
+    se descartan antes del reintento, así no cierran el comando siguiente.
+    """
+    estado = {"sucio": False}
+
+    def enviar(lecturas):
+        if estado["sucio"]:
+            # Lo que llegó del POST anterior después del timeout
+            if hasattr(esp.uart, "reset_input_buffer"):
+                esp.uart.reset_input_buffer()
+            esp._descartar()
+            estado["sucio"] = False
+        try:
+            return _enviar(lecturas)
+        except ErrorESP32:
+            esp._descartar()
+            estado["sucio"] = True
+            raise
+
+    def _enviar(lecturas):
+        if esp.tramas is not None:
+            cantidad = len(lecturas)
+            datos = json.dumps(lecturas).encode()
+            while len(datos) > RAW_BODY_MAX and cantidad > 1:
+                cantidad //= 2
+                datos = json.dumps(lecturas[:cantidad]).encode()
+            if len(datos) > RAW_BODY_MAX:
+                raise LecturaDescartada("Una lectura no entra en un POST de %d bytes" % RAW_BODY_MAX)
+            esp.enviar_datos(datos)
+            esp.solicitar_comando({"cmd": "POST", "url": url, "raw": True, "type": "application/json"})
+        else:
+            # Cada lectura agrega su JSON y ", " al comando con "data": []
+            limite = esp.capacidades()["line"] - 1
+            largo = len(json.dumps({"cmd": "POST", "url": url, "data": []}).encode())
+            cantidad = 0
+            for lectura in lecturas:
+                largo += len(json.dumps(lectura).encode()) + (2 if cantidad else 0)
+                if largo > limite:
+                    break
+                cantidad += 1
+            if not cantidad:
+                raise LecturaDescartada("Una lectura no entra en un comando de %d bytes" % limite)
+            esp.solicitar_comando({"cmd": "POST", "url": url, "data": lecturas[:cantidad]})
+        codigos = [registro.valor for registro in esp.respuestas(timeout) if registro.tipo == HTTP]
+        return cantidad if codigos and 200 <= codigos[0] < 300 else 0
+
+    return enviar
+
+
+def enviar_requests(session, url):
+    """Función 'enviar' para ColaTelemetria con una sesión de adafruit_requests (o requests)."""
+
+    def enviar(lecturas):
+        respuesta = session.post(url, json=lecturas)
+        try:
+            return len(lecturas) if 200 <= respuesta.status_code < 300 else 0
+        finally:
+            respuesta.close()
+
+    return enviar
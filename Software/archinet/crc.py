@@ -0,0 +1,51 @@
+"""
+CRC-16/CCITT-FALSE (polinomio 0x1021, valor inicial 0xFFFF) y CRC-32 (zlib),
+iguales a crc16() y crc32() del firmware (functions.cpp). Usan binascii
+cuando tiene la función y, si no, una versión en Python puro.
+"""
+
+try:
+    from binascii import crc_hqx
+except ImportError:
+    crc_hqx = None
+
+try:
+    from binascii import crc32 as _crc32
+except ImportError:
+    _crc32 = None
+
+_TABLA = None
+
+
+def _tabla():
+    global _TABLA
+    if _TABLA is None:
+        _TABLA = []
+        for byte in range(256):
+            crc = byte << 8
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            _TABLA.append(crc & 0xFFFF)
+    return _TABLA
+
+
+def crc16(datos, crc=0xFFFF):
+    """CRC16 de 'datos' (bytes, bytearray o memoryview); 'crc' permite encadenar bloques."""
+    if crc_hqx is not None:
+        return crc_hqx(datos, crc)
+    tabla = _tabla()
+    for byte in datos:
+        crc = ((crc << 8) & 0xFFFF) ^ tabla[(crc >> 8) ^ byte]
+    return crc
+
+
+def crc32(datos, crc=0):
+    """CRC-32 de 'datos' como el de zlib; 'crc' permite encadenar bloques."""
+    if _crc32 is not None:
+        return _crc32(datos, crc) & 0xFFFFFFFF
+    crc ^= 0xFFFFFFFF
+    for byte in datos:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+    return crc ^ 0xFFFFFFFF
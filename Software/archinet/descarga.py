@@ -0,0 +1,133 @@
+"""
+Respuestas HTTP grandes en bloques.
+
+Un GET o POST común llega como una sola línea: el ESP32 junta todo el cuerpo
+en su heap y Archi tiene que juntarlo también. Con "stream": true el ESP32 lee
+la respuesta de a bloques de tamaño fijo y los reenvía numerados, con el largo
+total si el servidor lo informa:
+
+    [ESP32] GET http://... -> Código: 200
+    {"stream": true, "len": 53211, "chunk": 512}
+    {"n": 0, "data": "<base64>"}
+    ...
+    {"chunks": 104, "len": 53211, "complete": true}
+
+En modo tramas los bloques viajan crudos en tramas 'D'. solicitar_bloques()
+devuelve un iterador sobre los bloques (bytes), así ningún lado necesita
+memoria proporcional al tamaño de la respuesta:
+
+    from archinet.descarga import solicitar_bloques
+    respuesta = solicitar_bloques(esp, "http://servidor/datos.csv", bloque=1024)
+    print(respuesta.codigo, respuesta.largo)
+    with open("/datos.csv", "wb") as f:
+        for datos in respuesta:
+            f.write(datos)
+"""
+
+import binascii
+import json
+
+from .errores import ErrorESP32
+from .respuestas import CUERPO, ESTADO, HTTP
+
+
+def solicitar_bloques(esp, url, datos=None, bloque=512, timeout=30):
+    """
+    Hace un GET a 'url' (o un POST de 'datos', un dict, si se indica) y
+    devuelve una RespuestaBloques. 'bloque' es el tamaño de cada bloque en
+    bytes (el ESP32 lo limita a 64..4096). 'timeout' es para la respuesta
+    completa. Lanza ErrorESP32 si no hubo respuesta HTTP.
+    """
+    if "stream" not in esp.capacidades():
+        raise ErrorESP32("El firmware no envía respuestas en bloques (CAPS sin \"stream\")")
+    comando = {"cmd": "GET", "url": url, "stream": True, "chunk": bloque}
+    if datos is not None:
+        comando["cmd"] = "POST"
+        comando["data"] = datos
+    esp.solicitar_comando(comando)
+    return RespuestaBloques(esp.respuestas(timeout))
+
+
+class RespuestaBloques:
+    """
+    codigo: código HTTP. largo: bytes del cuerpo, o None si el servidor no lo
+    informó. Al iterarla entrega cada bloque (bytes) a medida que llega; al
+    terminar, 'completa' indica si el ESP32 pudo leer todo el cuerpo.
+    Hay que recorrerla entera antes de enviar otro comando.
+    """
+
+    def __init__(self, registros):
+        self._registros = registros
+        self.codigo = None
+        self.largo = None
+        self.bloque = None
+        self.bloques = 0
+        self.completa = None
+        textos = []
+        for registro in registros:
+            if registro.tipo == HTTP:
+                self.codigo = registro.valor
+                break
+            if registro.tipo == ESTADO:
+                textos.append(registro.texto)
+        if self.codigo is None or self.codigo <= 0:
+            raise self._error(textos[-1] if textos else "Respuesta HTTP sin código")
+        cabecera = self._siguiente_linea()
+        if cabecera is None or not cabecera.get("stream"):
+            raise self._error("Respuesta sin cabecera de bloques")
+        if cabecera.get("len", -1) >= 0:
+            self.largo = cabecera["len"]
+        self.bloque = cabecera.get("chunk")
+
+    def _siguiente_linea(self):
+        # Próxima línea de texto del cuerpo como dict (uniendo fragmentos), o None al terminar
+        partes = []
+        for registro in self._registros:
+            if registro.tipo != CUERPO or isinstance(registro.valor, bytes):
+                continue
+            partes.append(registro.valor)
+            if registro.final:
+                texto = "".join(partes)
+                try:
+                    return json.loads(texto)
+                except ValueError:
+                    raise self._error(texto.strip())
+        return None
+
+    def _error(self, mensaje):
+        # Lee el resto de la respuesta hasta su {"end": true}: si quedara en la UART,
+        # el próximo comando lo tomaría como su propio fin
+        for registro in self._registros:
+            pass
+        return ErrorESP32(mensaje)
+
+    def __iter__(self):
+        partes = []
+        for registro in self._registros:
+            if registro.tipo != CUERPO:
+                continue
+            if isinstance(registro.valor, bytes):
+                # Modo tramas: el bloque llega crudo en una trama 'D'
+                self.bloques += 1
+                yield registro.valor
+                continue
+            partes.append(registro.valor)
+            if not registro.final:
+                continue
+            texto = "".join(partes)
+            partes = []
+            try:
+                linea = json.loads(texto)
+            except ValueError:
+                linea = None
+            if not isinstance(linea, dict):
+                raise self._error(texto.strip())
+            if "data" in linea:
+                if linea.get("n") != self.bloques:
+                    raise self._error("Se perdió el bloque %d de la respuesta" % self.bloques)
+                self.bloques += 1
+                yield binascii.a2b_base64(linea["data"])
+            elif "complete" in linea:
+                self.completa = linea["complete"]
+                if linea.get("chunks") != self.bloques:
+                    raise self._error("Llegaron %d de %d bloques" % (self.bloques, linea.get("chunks")))
@@ -0,0 +1,1740 @@
+"""
+Emulador en Python del firmware del ESP32 (Software/ESP32/src).
+
+Reproduce la semántica de handleCommand y de loop(): comandos JSON por línea,
+truncado de cada línea a BUF_SIZE - 1 bytes, marcador {"end": true}, tabla de
+endpoints con desalojo LRU/TTL, historial y eventos SSE, y los mismos mensajes de texto que el firmware. Sirve
+para probar y medir el protocolo en CPython sin Archi ni ESP32.
+
+    from archinet import ESP32UART
+    from archinet.emulador import EmuladorESP32, TransporteEmulado
+
+    emu = EmuladorESP32(redes=[{"ssid": "Casa", "pass": "1234", "rssi": -50}])
+    uart = TransporteEmulado(emu, baudrate=115200)
+    esp = ESP32UART(uart=uart, ready_pin=emu.pin_ready)
+"""
+
+import binascii
+import collections
+import gzip
+import http.client
+import json
+import ssl
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from .crc import crc16, crc32
+from .tramas import INICIO, MAX_DATOS, TRAMA_DATOS, TRAMA_JSON, TRAMA_NAK, TRAMA_TEXTO, codificar
+
+# Mismos valores que el firmware (main.cpp y commandHandler.cpp)
+BUF_SIZE = 1024
+UART_RX_BUF_SIZE = 4096
+ENDPOINTS_MIN = 10
+ENDPOINTS_MAX = 1024
+ENDPOINT_HEAP_BYTES = 384
+ENDPOINT_HEAP_RESERVE = 48 * 1024
+HTML_INICIAL = "<h1> ArchiNET </h1>"
+FIN = '{"end": true}'
+BAUD_INICIAL = 115200
+BAUD_MIN = 9600
+BAUD_MAX = 5000000
+BAUD_PROBE_TIMEOUT = 2.0
+RAW_BODY_MAX = 65536
+HTML_PARTS_MAX = 256
+HTML_MISSING_MAX = 16
+ASSET_MAX = 16
+HISTORY_LABELS = 16
+HISTORY_SIZE_MAX = 512
+HISTORY_SAMPLE_BYTES = 64
+SSE_MAX_CLIENTS = 4
+HTTP_CHUNK_DEFAULT = 512
+HTTP_CHUNK_MIN = 64
+HTTP_POOL_SIZE = 3
+HTTP_IDLE_MS = 15000
+WIFI_FAST_TIMEOUT_MS = 3000
+WIFI_RETRY_MIN_MS = 1000
+WIFI_RETRY_MAX_MS = 30000
+SCAN_TTL_DEFAULT_MS = 10000
+SCAN_PENDING_MAX = 4
+ASSET_PATH_MAX = 64
+LITTLEFS_TOTAL = 1441792  # Partición "spiffs" de la tabla por defecto
+
+# Bits por byte en 8N1 (start + 8 datos + stop)
+BITS_POR_BYTE = 10
+
+
+class PinEmulado:
+    """
+    Pin digital con la misma interfaz que digitalio ('.value'). Con
+    'alto_desde' (instante de time.monotonic()) se lee en bajo hasta ese
+    instante, como el pin ready mientras el ESP32 arranca; 'al_subir' se
+    llama en cada flanco de subida escrito, como la interrupción de GPIO0.
+    """
+
+    def __init__(self, valor=False, al_subir=None):
+        self._valor = valor
+        self.alto_desde = None
+        self.al_subir = al_subir
+
+    @property
+    def value(self):
+        if self.alto_desde is not None:
+            return time.monotonic() >= self.alto_desde
+        return self._valor
+
+    @value.setter
+    def value(self, valor):
+        subida = valor and not self._valor
+        self._valor = bool(valor)
+        self.alto_desde = None
+        if subida and self.al_subir is not None:
+            self.al_subir()
+
+
+class ClienteSSE:
+    """
+    Conexión abierta a GET /events del emulador. Guarda el text/event-stream
+    recibido y cada evento como (label, datos, instante de perf_counter).
+    """
+
+    def __init__(self, labels):
+        self.labels = labels  # None: todos
+        self.conectado = True
+        self.texto = "retry: 2000\n\n"
+        self.eventos = []
+
+    def quiere(self, label):
+        return self.conectado and (self.labels is None or label in self.labels)
+
+    def enviar(self, label, json_data):
+        self.texto += "event: %s\ndata: %s\n\n" % (label, json_data)
+        self.eventos.append((label, json.loads(json_data), time.perf_counter()))
+
+    def leer(self):
+        """Devuelve y descarta los eventos recibidos hasta ahora."""
+        eventos, self.eventos = self.eventos, []
+        return eventos
+
+    def cerrar(self):
+        self.conectado = False
+
+
+class ClienteHTTP:
+    """
+    Backend 'http' del emulador que hace las peticiones de verdad con
+    http.client, para medir contra un servidor real o local. El emulador le
+    pide una conexión por destino con conectar() y la reusa mientras siga
+    abierta, igual que el pool del firmware; en https no verifica el
+    certificado, como el ESP32.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def conectar(self, esquema, host, puerto):
+        if esquema == "https":
+            conexion = http.client.HTTPSConnection(host, puerto, timeout=self.timeout,
+                                                   context=ssl._create_unverified_context())
+        else:
+            conexion = http.client.HTTPConnection(host, puerto, timeout=self.timeout)
+        conexion.connect()
+        return conexion
+
+    def __call__(self, metodo, url, payload, conexion=None, cabeceras=None):
+        destino = _destino_http(url)
+        if destino is None:
+            return -1, ""
+        propia = conexion is None
+        try:
+            if propia:
+                conexion = self.conectar(*destino)
+            partes = urlsplit(url)
+            ruta = (partes.path or "/") + ("?" + partes.query if partes.query else "")
+            cabeceras = dict(cabeceras or {})
+            if payload is not None:
+                binario = isinstance(payload, bytes)
+                cabeceras["Content-Type"] = "application/octet-stream" if binario else "application/json"
+                payload = payload if binario else payload.encode("utf-8")
+            for intento in (0, 1):
+                try:
+                    conexion.request(metodo, ruta, body=payload, headers=cabeceras)
+                    respuesta = conexion.getresponse()
+                    cuerpo = respuesta.read()
+                    break
+                except ConnectionError:
+                    # El servidor cerró la conexión ociosa: se reabre una vez, como HTTPClient
+                    conexion.close()
+                    if intento:
+                        raise
+        except OSError:
+            return -1, ""  # HTTPC_ERROR_CONNECTION_REFUSED
+        finally:
+            if propia and conexion is not None:
+                conexion.close()
+        validadores = {}
+        for nombre in ("ETag", "Last-Modified", "Cache-Control"):
+            if respuesta.getheader(nombre) is not None:
+                validadores[nombre] = respuesta.getheader(nombre)
+        try:
+            return respuesta.status, cuerpo.decode("utf-8"), validadores
+        except UnicodeDecodeError:
+            return respuesta.status, cuerpo, validadores
+
+
+class EmuladorESP32:
+    """
+    Emula el ESP32 del lado de su UART1.
+
+    redes: lista de dicts {"ssid", "pass", "rssi"} visibles para SCAN/CONNECT;
+           opcionales "channel", "bssid", "auth" (como en la respuesta de
+           SCAN, "wpa2" por defecto) e "ip", y "activa": False para
+           simular un AP apagado (el enlace a ese AP se cae).
+    http: función http(metodo, url, cuerpo) -> (codigo, texto) usada por GET/POST;
+          'texto' puede ser bytes y 'cuerpo' es bytes en un POST "raw". Sin ella las peticiones devuelven el código -1 (conexión rechazada).
+          Si además tiene conectar(esquema, host, puerto), como ClienteHTTP,
+          recibe la conexión del pool en el argumento 'conexion'. Un GET con
+          "etag"/"modified" le pasa 'cabeceras' (If-None-Match,
+          If-Modified-Since) y puede devolver un tercer elemento, un dict con
+          "ETag", "Last-Modified" y "Cache-Control" de la respuesta.
+    latencias: segundos de bloqueo del firmware por operación
+               ("http"; "scan" es lo que tarda un escaneo sin bloquear,
+               "connect" y "connect_timeout" lo que
+               tarda en resolverse un intento de CONNECT, también sin bloquear, y
+               "connect_rapido" el de uno con BSSID y canal en caché;
+               "arranque" es lo que tarda setup(); "conexion" se
+               suma por cada conexión HTTP nueva que no sale del pool;
+               "comando" se suma a cada comando, como el Serial.printf de
+               depuración).
+    max_baudios: velocidad máxima a la que el enlace físico funciona; por
+                 encima TransporteEmulado corrompe los bytes (None: sin límite).
+    flash: False emula un ESP32 sin LittleFS (la página principal queda en RAM).
+    """
+
+    LATENCIAS = {"connect": 0.0, "connect_rapido": 0.0, "connect_timeout": 10.0, "scan": 0.0, "http": 0.0,
+                 "conexion": 0.0, "comando": 0.0, "arranque": 0.3}
+
+    def __init__(self, redes=None, http=None, latencias=None, heap_libre=320000, max_baudios=None,
+                 flash=True):
+        self.redes = list(redes or [])
+        self.http = http
+        self.latencias = dict(self.LATENCIAS)
+        if latencias:
+            self.latencias.update(latencias)
+        self.heap_libre = heap_libre
+        self.max_baudios = max_baudios
+        self.baud_inicial = BAUD_INICIAL
+        self.flash = flash
+        # Almacén LittleFS: ruta -> (tipo, gzip, bytes); sobrevive a reiniciar()
+        self.archivos = {}
+        self.pin_ready = PinEmulado()
+        # RESET_SIGNAL_PIN (GPIO0): el host lo mantiene en alto; un flanco de subida reinicia
+        self.pin_reset = PinEmulado(True, al_subir=self.arrancar)
+        self.reiniciar()
+
+    # ------------------------------------------------------------------ estado
+    def reiniciar(self):
+        """Equivalente a esp_restart(): vuelve al estado de setup()."""
+        self.uart_habilitado = True
+        self.html_ram = HTML_INICIAL  # htmlPage: solo se sirve si "/" no está en la flash
+        self.html_buffer = ""
+        self.expected_total_parts = 0
+        self.received_parts = 0
+        self._html_xfer = -1
+        self._html_xfer_hecha = -1
+        self._html_ruta = "/"
+        self._html_tipo = "text/html"
+        self._html_partes = []  # None: fragmento aún no recibido
+        self._html_mayor = -1
+        # label -> [jsonData, lastUse, updated]; el dict hace de índice por hash
+        self.endpoints = {}
+        self.politica_endpoints = "lru"
+        self.ttl_endpoints = 0  # segundos; 0: sin vencimiento
+        self._reloj_uso = 0
+        self.estadisticas_endpoints = {"hits": 0, "misses": 0, "evictions": 0}
+        self.init_endpoint_table()
+        self.historiales = {}  # label -> deque de [t, jsonData], como EndpointHistory
+        self.suscriptores = []  # ClienteSSE abiertos con GET /events
+        # (esquema, host, puerto) -> [conexión, lastUse en ms], como httpPool
+        self.conexiones_http = {}
+        self.peticiones_http = 0
+        self.reusos_http = 0
+        self._arranque = time.monotonic()
+        self.ap_activo = True  # WiFi.mode(WIFI_AP_STA) en setup()
+        self.ap_ssid = None
+        self.red_conectada = None
+        self.ip_sta = "0.0.0.0"
+        self.ip_ap = "192.168.4.1"
+        # Conexión WiFi sin bloqueo, como wifiLink y pollWiFi()
+        self.estado_wifi = "idle"  # "connecting", "connected" o "retrying"
+        self._wifi_ssid = ""
+        self._wifi_clave = ""
+        self._wifi_canal = 0  # Caché de BSSID y canal; 0: vacía
+        self._wifi_rapido = False
+        self._wifi_reconexion = False
+        self._wifi_eventos = False
+        self._wifi_pendiente = False  # CONNECT sin "async" esperando su respuesta
+        self._wifi_id = ""
+        self._wifi_desde = 0.0
+        self._wifi_inicio = 0.0
+        self._wifi_listo = None  # Instante en que el intento conecta; None: falla por timeout
+        self._wifi_red = None
+        self._wifi_reintento = 0.0
+        self._wifi_espera = WIFI_RETRY_MIN_MS / 1000
+        self._wifi_intentos = 0
+        # Escaneo sin bloqueo con caché, como scanCache y pollScan()
+        self.redes_escaneadas = None  # None: todavía no hubo escaneo
+        self._scan_instante = 0.0
+        self._scan_inicio = 0.0
+        self._scan_fin = None  # Instante en que termina el escaneo en curso; None: ninguno
+        self._scan_eventos = False
+        self._scan_pendientes = []
+        self.escaneos = 0
+        self.baudios = self.baud_inicial
+        self._baudios_previos = 0  # 0: no hay cambio a confirmar con PROBE
+        self._baudios_desde = 0.0
+        self._linea = bytearray()
+        self._salida = []  # bytes a transmitir
+        self.tramas = False  # FRAMING binary
+        self._trama = bytearray()
+        self._raw = bytearray()
+        self._raw_invalido = False  # RAW_BODY_MAX excedido o NAK desde el último comando
+        self._demora = 0.0
+        self._id = ""
+        self.pin_ready.value = True  # sendReadySignal()
+
+    def arrancar(self):
+        """
+        Flanco de subida en RESET_SIGNAL_PIN: esp_restart(). Mientras corre
+        setup() (latencias["arranque"] segundos) el pin ready está en bajo y
+        lo que llega por la UART se pierde.
+        """
+        self.reiniciar()
+        self.pin_ready.value = False
+        self.pin_ready.alto_desde = time.monotonic() + self.latencias["arranque"]
+
+    def arrancando(self):
+        return not self.pin_ready.value
+
+    @property
+    def html_page(self):
+        """Página que sirve "/": str, o los bytes gzip si se subió comprimida."""
+        archivo = self.archivos.get("/")
+        if archivo is None:
+            return self.html_ram
+        _, es_gzip, datos = archivo
+        return datos if es_gzip else datos.decode("utf-8", "replace")
+
+    @property
+    def html_gzip(self):
+        archivo = self.archivos.get("/")
+        return archivo is not None and archivo[1]
+
+    def consumir_demora(self):
+        """Devuelve y reinicia los segundos que el firmware estuvo bloqueado."""
+        demora = self._demora
+        self._demora = 0.0
+        return demora
+
+    # ------------------------------------------------------------------ UART
+    def revisar_baudios(self):
+        """Equivalente a checkBaudProbeTimeout() en loop()."""
+        if self._baudios_previos and time.monotonic() - self._baudios_desde > BAUD_PROBE_TIMEOUT:
+            self.baudios = self._baudios_previos
+            self._baudios_previos = 0
+
+    def recibir(self, datos):
+        """
+        Alimenta bytes recibidos por UART1 y devuelve los bytes que el ESP32
+        transmitiría como respuesta. Igual que loop(): separa por '\\n' o '\\r'
+        y descarta todo lo que exceda BUF_SIZE - 1 bytes en una línea.
+        """
+        datos = bytes(datos)
+        if self.arrancando():
+            return b""  # UART1 todavía sin iniciar
+        # FRAMING puede cambiar el modo a mitad de los datos: el resto va al otro separador
+        while datos and self.uart_habilitado:
+            if self.tramas:
+                datos = self._recibir_tramas(datos)
+            else:
+                datos = self._recibir_lineas(datos)
+        salida = b"".join(self._salida)
+        self._salida = []
+        return salida
+
+    def _recibir_lineas(self, datos):
+        for i, c in enumerate(datos):
+            if not self.uart_habilitado:
+                return b""  # UART1.end() descarta lo que quede
+            if self.tramas:
+                return datos[i:]
+            if c == 0x0A or c == 0x0D:
+                cmd = self._linea.decode("utf-8", "replace").strip()
+                self._linea = bytearray()
+                if cmd:
+                    self.manejar_comando(cmd)
+            elif len(self._linea) < BUF_SIZE - 1:
+                self._linea.append(c)
+        return b""
+
+    def _recibir_tramas(self, datos):
+        """Equivalente a pollFrames(). Devuelve los bytes que siguen si se vuelve a modo texto."""
+        for i, c in enumerate(datos):
+            if not self.tramas:
+                return datos[i:]
+            if not self._trama and c != INICIO:
+                continue
+            self._trama.append(c)
+            if len(self._trama) < 4:
+                continue
+            largo = self._trama[2] | (self._trama[3] << 8)
+            if largo > MAX_DATOS:
+                self._trama = bytearray()
+                self._nak()
+                continue
+            if len(self._trama) < largo + 6:
+                continue
+            trama = self._trama
+            self._trama = bytearray()
+            if crc16(trama[1:largo + 4]) != trama[largo + 4] | (trama[largo + 5] << 8):
+                self._nak()
+                continue
+            contenido = bytes(trama[4:largo + 4])
+            if trama[1] == TRAMA_JSON:
+                cmd = contenido.decode("utf-8", "replace").strip()
+                if cmd:
+                    self.manejar_comando(cmd)
+                # El cuerpo crudo es solo para el comando que lo sigue
+                self._raw = bytearray()
+                self._raw_invalido = False
+            elif trama[1] == TRAMA_DATOS:
+                if len(self._raw) + largo > RAW_BODY_MAX:
+                    self._raw_invalido = True
+                else:
+                    self._raw += contenido
+        return b""
+
+    def _nak(self):
+        # sendNak(): la trama corrupta pudo ser una 'D', el cuerpo crudo pendiente ya no sirve
+        self._salida.append(codificar(TRAMA_NAK))
+        self._raw = bytearray()
+        self._raw_invalido = True
+
+    def _tomar_raw(self):
+        # takeRawBody(): (bytes, ok)
+        raw, ok = bytes(self._raw), not self._raw_invalido
+        self._raw = bytearray()
+        self._raw_invalido = False
+        return raw, ok
+
+    def _prefijo(self):
+        # uartPrefix(): "@<id> " cuando el comando trae "id"
+        return "@%s " % self._id if self._id else ""
+
+    def _print(self, texto):
+        if self.tramas:
+            # uartWriteText(): una trama 'T' por línea
+            lineas = texto.split("\n")
+            if lineas[-1] == "":
+                lineas.pop()
+            for linea in lineas:
+                self._println(linea.rstrip("\r"))
+            return
+        self._salida.append((self._prefijo() + texto).encode("utf-8"))
+
+    def _println(self, texto=""):
+        if self.tramas:
+            self._salida.append(codificar(TRAMA_TEXTO, (self._prefijo() + texto).encode("utf-8")))
+            return
+        self._salida.append((self._prefijo() + texto + "\r\n").encode("utf-8"))
+
+    def _cuerpo(self, cuerpo, recortar):
+        """Equivalente a uartBody()."""
+        if self.tramas:
+            if isinstance(cuerpo, str):
+                cuerpo = cuerpo.encode("utf-8")
+            for inicio in range(0, len(cuerpo), MAX_DATOS):
+                self._salida.append(codificar(TRAMA_DATOS, cuerpo[inicio:inicio + MAX_DATOS]))
+            return
+        if isinstance(cuerpo, bytes):
+            cuerpo = cuerpo.decode("utf-8", "replace")
+        if recortar:
+            cuerpo = cuerpo.strip()
+        self._println(cuerpo.replace("\n", " ").replace("\r", " "))
+
+    def _cuerpo_filtrado(self, cuerpo, filtro):
+        """Equivalente a relayFilteredBody()."""
+        if isinstance(cuerpo, bytes):
+            cuerpo = cuerpo.decode("utf-8", "replace")
+        try:
+            valor = json.loads(cuerpo)
+        except ValueError:
+            self._print("[ESP32] La respuesta no es JSON válido: %s\n"
+                        % ("InvalidInput" if cuerpo.strip() else "EmptyInput"))
+            return
+        self._cuerpo(_serializar(_aplicar_filtro(valor, filtro)), False)
+
+    def _cuerpo_bloques(self, cuerpo, bloque):
+        """Equivalente a relayHttpBody()."""
+        if isinstance(cuerpo, str):
+            cuerpo = cuerpo.encode("utf-8")
+        self._print('{"stream":true,"len":%d,"chunk":%d}\n' % (len(cuerpo), bloque))
+        partes = 0
+        for inicio in range(0, len(cuerpo), bloque):
+            datos = cuerpo[inicio:inicio + bloque]
+            if self.tramas:
+                self._salida.append(codificar(TRAMA_DATOS, datos))
+            else:
+                self._print('{"n":%d,"data":"%s"}\n' % (partes, binascii.b2a_base64(datos).decode().strip()))
+            partes += 1
+        self._print('{"chunks":%d,"len":%d,"complete":true}\n' % (partes, len(cuerpo)))
+
+    def _fin(self):
+        self._println(FIN)
+
+    # ------------------------------------------------------------------ comandos
+    def manejar_comando(self, cmd):
+        """Equivalente a handleCommand() de commandHandler.cpp."""
+        self._demora += self.latencias["comando"]
+        if not (cmd.startswith("{") and cmd.endswith("}")):
+            self._println("[ESP32] Comando no reconocido (no JSON y no clásico).")
+            return
+        try:
+            doc = json.loads(cmd)
+        except ValueError as e:
+            error = "IncompleteInput" if getattr(e, "pos", 0) >= len(cmd) else "InvalidInput"
+            self._print("[ESP32] Error al parsear JSON: %s\n" % error)
+            return
+        if not isinstance(doc, dict):
+            doc = {}
+
+        if doc.get("id") is not None:
+            self._id = _como_texto(doc["id"]).replace(" ", "_")
+        try:
+            comando = _texto(doc, "cmd")
+            manejador = getattr(self, "_cmd_" + comando, None)
+            if manejador is not None:
+                manejador(doc)
+        finally:
+            self._id = ""
+
+    def _cmd_SCAN(self, doc):
+        """Equivalente a scanNetworks(): responde desde la caché o espera el escaneo que atender() termina."""
+        pedido = {"id": self._id, "min_rssi": _entero(doc, "min_rssi", -127), "channel": _entero(doc, "channel", 0),
+                  "prefix": _texto(doc, "prefix"), "max": _entero(doc, "max", 0),
+                  "unique": doc.get("unique") is not False}
+        ttl = doc.get("ttl", SCAN_TTL_DEFAULT_MS / 1000)
+        if isinstance(ttl, bool) or not isinstance(ttl, (int, float)):
+            ttl = 0
+        asincrono = doc.get("async") is True
+        ahora = time.monotonic()
+        if not asincrono and self.redes_escaneadas is not None and ahora - self._scan_instante < ttl:
+            self._resultado_scan(pedido, False, ahora)
+            return
+        if self._scan_fin is None:
+            self._scan_inicio = ahora
+            self._scan_fin = ahora + self.latencias["scan"]
+        if asincrono:
+            self._scan_eventos = True
+            self._println("[ESP32] Escaneando redes WiFi...")
+            self._fin()
+        elif len(self._scan_pendientes) >= SCAN_PENDING_MAX:
+            self._println("[ESP32] Demasiados SCAN esperando el escaneo en curso.")
+            self._fin()
+        else:
+            self._scan_pendientes.append(pedido)
+
+    def _resultado_scan(self, pedido, nuevo, ahora):
+        """Equivalente a sendScanResult(): una línea JSON con las redes que pasan los filtros."""
+        redes = []
+        vistos = set()
+        for red in self.redes_escaneadas:
+            if (red["rssi"] < pedido["min_rssi"] or (pedido["channel"] > 0 and red["channel"] != pedido["channel"])
+                    or not red["ssid"].startswith(pedido["prefix"])):
+                continue
+            if pedido["unique"]:
+                if red["ssid"] in vistos:
+                    continue
+                vistos.add(red["ssid"])
+            redes.append(red)
+            if 0 < pedido["max"] <= len(redes):
+                break
+        respuesta = {"networks": redes, "total": len(self.redes_escaneadas),
+                     "age": int((ahora - self._scan_instante) * 1000), "cached": not nuevo}
+        id_actual, self._id = self._id, pedido["id"]
+        self._println(_serializar(respuesta))
+        self._fin()
+        self._id = id_actual
+
+    def _poll_scan(self, ahora):
+        """Equivalente a pollScan(): guarda el escaneo terminado y responde los SCAN que lo esperaban."""
+        self._scan_fin = None
+        self.escaneos += 1
+        visibles = []
+        for i, red in enumerate(self.redes):
+            if not red.get("ssid") or not red.get("activa", True):
+                continue  # Red oculta o AP apagado
+            visibles.append({"ssid": red["ssid"], "bssid": red.get("bssid", "24:0A:C4:00:00:%02X" % (i + 1)),
+                             "rssi": red.get("rssi", -70), "channel": red.get("channel", 6),
+                             "auth": red.get("auth", "wpa2")})
+        visibles.sort(key=lambda red: -red["rssi"])
+        self.redes_escaneadas = visibles
+        self._scan_instante = ahora
+        for pedido in self._scan_pendientes:
+            self._resultado_scan(pedido, True, ahora)
+        self._scan_pendientes = []
+        if self._scan_eventos and self.uart_habilitado:
+            evento = {"event": "scan", "state": "done", "total": len(visibles),
+                      "ms": int((ahora - self._scan_inicio) * 1000)}
+            id_actual, self._id = self._id, ""
+            self._println("!" + _serializar(evento))
+            self._id = id_actual
+        self._scan_eventos = False
+
+    def _cmd_CONNECT(self, doc):
+        ssid = _texto(doc, "ssid")
+        clave = _texto(doc, "pass")
+        if ssid != "" and clave != "":
+            self._conectar_wifi(ssid, clave, doc.get("async") is True)
+        else:
+            self._println("[ESP32] Falta SSID o PASS en CONNECT.")
+
+    def _conectar_wifi(self, ssid, clave, asincrono=False):
+        """Equivalente a connectToWiFi(): arranca el intento y atender() (pollWiFi) lo sigue."""
+        if self._wifi_pendiente:
+            self._terminar_connect(False)  # Un CONNECT nuevo reemplaza al que seguía esperando
+        misma = ssid == self._wifi_ssid and clave == self._wifi_clave
+        if not misma:
+            self._wifi_canal = 0
+        self._wifi_ssid = ssid
+        self._wifi_clave = clave
+        self._wifi_eventos = asincrono
+        self._wifi_reconexion = False
+        self._wifi_espera = WIFI_RETRY_MIN_MS / 1000
+        self._wifi_pendiente = not asincrono
+        self._wifi_id = self._id
+        self._wifi_intentos = 0
+        ahora = time.monotonic()
+        self._wifi_desde = ahora
+        if misma and self._enlace_wifi():
+            self._wifi_conectado(ahora)
+        else:
+            self._intento_wifi(ahora)
+        if asincrono:
+            self._print("[ESP32] Conectando a: %s\n" % ssid)
+            self._fin()
+
+    def _enlace_wifi(self):
+        # WiFi.status() == WL_CONNECTED
+        return self.red_conectada is not None and self.red_conectada.get("activa", True)
+
+    def _intento_wifi(self, ahora):
+        """Equivalente a startWifiAttempt()."""
+        self._wifi_rapido = self._wifi_canal > 0
+        self._wifi_intentos += 1
+        self._wifi_inicio = ahora
+        self.estado_wifi = "connecting"
+        self.red_conectada = None  # WiFi.disconnect(false)
+        self.ip_sta = "0.0.0.0"
+        self._wifi_listo = None
+        for red in self.redes:
+            if red.get("ssid") == self._wifi_ssid:
+                # Si el AP está apagado el intento conecta cuando vuelva, dentro del timeout
+                if red.get("pass") == self._wifi_clave and (not self._wifi_rapido
+                                                           or red.get("channel", 6) == self._wifi_canal):
+                    self._wifi_red = red
+                    demora = self.latencias["connect_rapido" if self._wifi_rapido else "connect"]
+                    self._wifi_listo = ahora + demora
+                break
+        self._evento_wifi("connecting", ahora)
+
+    def _wifi_conectado(self, ahora):
+        """Equivalente a wifiConnected()."""
+        if not self._enlace_wifi():
+            self.red_conectada = self._wifi_red
+            self.ip_sta = self._wifi_red.get("ip", "192.168.1.50")
+        self.estado_wifi = "connected"
+        self._wifi_canal = self.red_conectada.get("channel", 6)
+        self._evento_wifi("connected", ahora)
+        if self._wifi_pendiente:
+            self._terminar_connect(True)
+        self._wifi_intentos = 0
+        self._wifi_reconexion = False
+        self._wifi_espera = WIFI_RETRY_MIN_MS / 1000
+
+    def _terminar_connect(self, ok):
+        """Equivalente a finishConnectReply(): la respuesta diferida del CONNECT sin "async"."""
+        self._wifi_pendiente = False
+        id_actual, self._id = self._id, self._wifi_id
+        if ok:
+            self._print("[ESP32] OK|IP: %s\n" % self.ip_sta)
+        else:
+            self._print("[ESP32] Error al conectar a la red: %s\n" % self._wifi_ssid)
+        self._fin()
+        self._id = id_actual
+
+    def _evento_wifi(self, estado, ahora, razon=""):
+        """Equivalente a sendWifiEvent(): línea "!{...}" sin id."""
+        if not self._wifi_eventos or not self.uart_habilitado:
+            return
+        evento = {"event": "wifi", "state": estado, "ssid": self._wifi_ssid, "attempt": self._wifi_intentos,
+                  "fast": self._wifi_rapido}
+        if self.estado_wifi == "connected":
+            red = self.red_conectada
+            evento.update(ip=self.ip_sta, bssid=red.get("bssid", "24:0A:C4:00:00:01"),
+                          channel=red.get("channel", 6), rssi=red.get("rssi", -70))
+        if self.estado_wifi == "retrying":
+            evento["in"] = max(0, int((self._wifi_reintento - ahora) * 1000))
+        if razon:
+            evento["reason"] = razon
+        evento["ms"] = int((ahora - self._wifi_desde) * 1000)
+        id_actual, self._id = self._id, ""
+        self._println("!" + _serializar(evento))
+        self._id = id_actual
+
+    def atender(self):
+        """
+        Equivalente a pollWiFi() y pollScan() en loop(): avanza la conexión
+        WiFi y el escaneo en curso, y devuelve los bytes que el ESP32
+        transmite sin que llegue un comando (eventos y las respuestas
+        diferidas de CONNECT y SCAN).
+        """
+        if not self.arrancando():
+            ahora = time.monotonic()
+            instante = self.proximo_evento()
+            # Cada transición ocurre en su instante, aunque se atiendan varias juntas
+            while instante is not None and instante <= ahora:
+                if instante == self._scan_fin:
+                    self._poll_scan(instante)
+                else:
+                    self._poll_wifi(instante)
+                instante = self.proximo_evento()
+            if self.estado_wifi == "connected" and not self._enlace_wifi():
+                # Enlace caído: primer reintento enseguida, con BSSID y canal de la caché
+                self._wifi_reconexion = True
+                self.estado_wifi = "retrying"
+                self._wifi_reintento = ahora
+                self._wifi_desde = ahora
+                self.red_conectada = None
+                self.ip_sta = "0.0.0.0"
+                self._evento_wifi("lost", ahora)
+                self._poll_wifi(ahora)
+        salida = b"".join(self._salida)
+        self._salida = []
+        return salida
+
+    def proximo_evento(self):
+        """Instante (time.monotonic()) del próximo cambio de la conexión WiFi o del escaneo, o None."""
+        instante = self._proximo_wifi()
+        if self._scan_fin is not None and (instante is None or self._scan_fin <= instante):
+            return self._scan_fin
+        return instante
+
+    def _proximo_wifi(self):
+        if self.estado_wifi == "connecting":
+            if self._wifi_listo is not None and self._wifi_red.get("activa", True):
+                return self._wifi_listo
+            plazo = WIFI_FAST_TIMEOUT_MS / 1000 if self._wifi_rapido else self.latencias["connect_timeout"]
+            return self._wifi_inicio + plazo
+        if self.estado_wifi == "retrying":
+            return self._wifi_reintento
+        return None
+
+    def _poll_wifi(self, ahora):
+        if self.estado_wifi == "retrying":
+            self._intento_wifi(ahora)
+        elif self.estado_wifi == "connecting":
+            if self._wifi_listo is not None and self._wifi_red.get("activa", True):
+                self._wifi_conectado(max(ahora, self._wifi_listo))
+            elif self._wifi_rapido:
+                # El AP cambió de canal o ya no está: se repite con un escaneo completo
+                self._wifi_canal = 0
+                self._intento_wifi(ahora)
+            elif self._wifi_reconexion:
+                self.estado_wifi = "retrying"
+                self._wifi_reintento = ahora + self._wifi_espera
+                self._wifi_espera = min(self._wifi_espera * 2, WIFI_RETRY_MAX_MS / 1000)
+                self._evento_wifi("retrying", ahora, "timeout")
+            else:
+                self.estado_wifi = "idle"
+                self._evento_wifi("failed", ahora, "timeout")
+                if self._wifi_pendiente:
+                    self._terminar_connect(False)
+
+    def _cmd_DISCONNECT(self, doc):
+        destino = _texto(doc, "target", "WiFi")
+        if destino == "WiFi":
+            # Sin reconexión automática hasta el próximo CONNECT; la caché de BSSID y canal se conserva
+            if self._wifi_pendiente:
+                self._terminar_connect(False)
+            self.estado_wifi = "idle"
+            self._wifi_reconexion = False
+            if self._enlace_wifi():
+                self.red_conectada = None
+                self.ip_sta = "0.0.0.0"
+                self._println("[ESP32] WiFi desconectado.")
+            else:
+                self.red_conectada = None
+                self._println("[ESP32] No está conectado a ninguna red.")
+            self._fin()
+        elif destino == "AP":
+            self.ap_activo = False
+            self._println("[ESP32] AP detenido")
+            self._fin()
+
+    def _cmd_AP(self, doc):
+        ssid = _texto(doc, "ssid")
+        clave = _texto(doc, "pass")
+        if ssid != "" and clave != "":
+            if len(clave) >= 8:  # WiFi.softAP exige WPA2 con 8 caracteres o más
+                self.ap_activo = True
+                self.ap_ssid = ssid
+                self._print("[ESP32] AP iniciado: %s | IP: %s\n" % (ssid, self.ip_ap))
+            else:
+                self._println("[ESP32] Error al iniciar AP")
+            self._fin()
+        else:
+            self._println("[ESP32] Faltan datos para AP")
+            self._fin()
+
+    def _ip_actual(self):
+        return self.ip_ap if self.ap_activo else self.ip_sta
+
+    def _cmd_PING(self, doc):
+        self._println("[ESP32] PING recibido. Estoy activo.")
+        self._print("[ESP32] IP actual: %s\n" % self._ip_actual())
+        self._fin()
+
+    def _cmd_POST(self, doc):
+        url = _texto(doc, "url")
+        if doc.get("raw") is True:
+            payload, ok = self._tomar_raw()
+            if not ok:
+                self._println("[ESP32] Datos binarios inválidos para POST (demasiado grandes o con una trama corrupta)")
+                self._fin()
+                return
+        else:
+            payload = _serializar(doc["data"]) if "data" in doc else ""
+        if url != "" and len(payload):
+            self._http("POST", url, payload, _opciones_http(doc))
+        else:
+            self._println("[ESP32] POST mal formado: falta 'url' o 'data'")
+            self._fin()
+
+    def _cmd_GET(self, doc):
+        url = _texto(doc, "url")
+        if url != "":
+            self._http("GET", url, None, _opciones_http(doc))
+
+    def _http(self, metodo, url, payload, opciones=None):
+        """Equivalente a handleHttpGet / handleHttpPost; 'opciones' sale de _opciones_http()."""
+        opciones = opciones or _opciones_http({})
+        filtro = opciones["filtro"]
+        if self.red_conectada is None:
+            self._println("[ESP32] No conectado a WiFi, no se puede hacer %s." % metodo)
+            self._fin()
+            return
+        self._demora += self.latencias["http"]
+        self.cerrar_conexiones_ociosas()
+        self.peticiones_http += 1
+        cabeceras = {}
+        if metodo == "GET":
+            if opciones["etag"]:
+                cabeceras["If-None-Match"] = opciones["etag"]
+            if opciones["modificado"]:
+                cabeceras["If-Modified-Since"] = opciones["modificado"]
+        validadores = {}
+        if self.http is None:
+            codigo, cuerpo = -1, ""
+        else:
+            destino = _destino_http(url) if opciones["reusar"] and filtro is None else None
+            conexion = self._conexion_http(destino)
+            extra = {}
+            if hasattr(self.http, "conectar"):
+                extra["conexion"] = conexion
+            if cabeceras:
+                extra["cabeceras"] = cabeceras
+            respuesta = self.http(metodo, url, payload, **extra)
+            codigo, cuerpo = respuesta[0], respuesta[1]
+            if len(respuesta) > 2:
+                validadores = respuesta[2]
+            if destino is None:
+                _cerrar_conexion(conexion)
+            elif _conexion_abierta(conexion):
+                self.conexiones_http[destino][1] = self._millis()
+            else:
+                self.conexiones_http.pop(destino, None)  # El servidor respondió con Connection: close
+        if codigo > 0:
+            if metodo == "GET" and opciones["validadores"]:
+                # sendValidators(); HTTPClient::header() devuelve "" si falta
+                self._println(_serializar({"etag": validadores.get("ETag", ""),
+                                           "modified": validadores.get("Last-Modified", ""),
+                                           "cache": validadores.get("Cache-Control", "")}))
+            self._print("[ESP32] %s %s -> Código: %d\n" % (metodo, url, codigo))
+            if metodo == "GET" and codigo == 304:
+                pass  # Sin cuerpo
+            elif filtro is not None:
+                self._cuerpo_filtrado(cuerpo, filtro)
+            elif opciones["bloque"] > 0:
+                self._cuerpo_bloques(cuerpo, opciones["bloque"])
+            else:
+                self._cuerpo(cuerpo, metodo == "GET")
+        else:
+            self._print("[ESP32] Error en %s -> Código: %d\n" % (metodo, codigo))
+        self._fin()
+
+    def _conexion_http(self, destino):
+        """Equivalente a beginHttp(): conexión del pool para 'destino', o una nueva si es None."""
+        entrada = self.conexiones_http.get(destino) if destino is not None else None
+        if entrada is not None and _conexion_abierta(entrada[0]):
+            self.reusos_http += 1
+            return entrada[0]
+        if destino is not None:
+            if entrada is not None:
+                _cerrar_conexion(self.conexiones_http.pop(destino)[0])
+            elif len(self.conexiones_http) >= HTTP_POOL_SIZE:
+                vieja = min(self.conexiones_http, key=lambda clave: self.conexiones_http[clave][1])
+                _cerrar_conexion(self.conexiones_http.pop(vieja)[0])
+        conectar = getattr(self.http, "conectar", None)
+        if conectar is None:
+            self._demora += self.latencias["conexion"]
+            conexion = True  # Backend sin conexiones propias: solo se cuenta el costo
+        elif destino is None:
+            conexion = None  # El backend abre y cierra la suya
+        else:
+            try:
+                conexion = conectar(*destino)
+            except OSError:
+                conexion = None
+        if destino is not None and conexion is not None:
+            self.conexiones_http[destino] = [conexion, self._millis()]
+        return conexion
+
+    def cerrar_conexiones_ociosas(self):
+        """Equivalente a pollHttpPool() en loop()."""
+        ahora = self._millis()
+        for destino, (conexion, uso) in list(self.conexiones_http.items()):
+            if ahora - uso >= HTTP_IDLE_MS or not _conexion_abierta(conexion):
+                _cerrar_conexion(conexion)
+                del self.conexiones_http[destino]
+
+    def _cmd_WebServer(self, doc):
+        if not (self.red_conectada is not None or self.ap_activo):
+            self._println("[ESP32] No se puede crear endpoint. No conectado a WiFi ni en modo AP.")
+            return
+        combinar = doc.get("merge") is True
+        lote = doc.get("batch")
+        if isinstance(lote, dict):
+            self._webserver_lote(lote, combinar)
+            return
+        ep = _texto(doc, "label")
+        if ep == "":
+            self._println("[ESP32] Comando WebServer mal formado: falta 'label'")
+            return
+        datos = doc.get("data")
+        if combinar:
+            if not isinstance(datos, dict):
+                self._println("[ESP32] Comando WebServer mal formado: 'data' no es un objeto para merge")
+                self._fin()
+                return
+            if not self.merge_endpoint_data(ep, datos):
+                self._faltantes([ep])
+                return
+            self._print("[ESP32] Endpoint /%s actualizado\n" % ep)
+            self._fin()
+            return
+        json_data = _serializar(datos) if isinstance(datos, dict) else "{}"
+        self.set_endpoint_data(ep, json_data)
+        self._print("[ESP32] Endpoint /%s actualizado\n" % ep)
+        self._fin()
+
+    def _faltantes(self, labels):
+        """Equivalente a sendMissingEndpoints()."""
+        for ep in labels:
+            self._print("[ESP32] No existe el endpoint /%s para merge\n" % ep)
+        self._println(_serializar({"error": "missing", "labels": labels}))
+        self._fin()
+
+    def _webserver_lote(self, lote, combinar=False):
+        """Equivalente a handleWebServerBatch()."""
+        if not lote:
+            self._println("[ESP32] Comando WebServer mal formado: 'batch' vacío")
+            self._fin()
+            return
+        nuevos = []
+        for ep, datos in lote.items():
+            if ep == "":
+                self._println("[ESP32] Comando WebServer mal formado: label vacío")
+                self._fin()
+                return
+            if combinar and not isinstance(datos, dict):
+                self._print("[ESP32] Comando WebServer mal formado: /%s no es un objeto para merge\n" % ep)
+                self._fin()
+                return
+            if self.find_live_endpoint(ep) is None:
+                nuevos.append(ep)
+        if combinar and nuevos:
+            self._faltantes(nuevos)
+            return
+        if len(lote) > self.capacidad_endpoints:
+            self._print("[ESP32] No hay espacio para %d endpoints (máximo %d)\n"
+                        % (len(lote), self.capacidad_endpoints))
+            self._fin()
+            return
+        for ep, datos in lote.items():
+            if combinar:
+                self.merge_endpoint_data(ep, datos)
+                continue
+            self.set_endpoint_data(ep, _serializar(datos) if isinstance(datos, dict) else "{}")
+        self._print("[ESP32] %d endpoints actualizados\n" % len(lote))
+        self._fin()
+
+    def _cmd_INFO(self, doc):
+        rssi = self.red_conectada.get("rssi", -70) if self.red_conectada else 0
+        self._print('{"chip":"ESP32-S3","ip":"%s","rssi":%d,"heap":%d,"http":%d,"reuse":%d,"wifi":"%s"}\n'
+                    % (self._ip_actual(), rssi, self.heap_libre, self.peticiones_http, self.reusos_http,
+                       self.estado_wifi))
+        self._fin()
+
+    def _cmd_UART_OFF(self, doc):
+        self._println("[ESP32] UART apagado.")
+        self._fin()
+        self.uart_habilitado = False
+
+    def _cmd_UART_ON(self, doc):
+        # Solo alcanzable con la UART encendida, igual que en el firmware
+        self._println("[ESP32] UART ya estaba encendido.")
+        self._fin()
+
+    def _cmd_CAPS(self, doc):
+        """Equivalente a handleCapabilities()."""
+        self._print('{"line":%d,"rx":%d,"frame":%d,"html_parts":%d,"endpoints":%d,"baud_max":%d,"hash":"crc32","assets":%d,"batch":true,"merge":true,"history":%d,"sse":%d,"stream":true,"fields":true,"validators":true}\n'
+                    % (BUF_SIZE, UART_RX_BUF_SIZE, MAX_DATOS, HTML_PARTS_MAX, self.capacidad_endpoints, BAUD_MAX,
+                       ASSET_MAX if self.flash else 0, HISTORY_LABELS, SSE_MAX_CLIENTS))
+        self._fin()
+
+    def _cmd_HASH(self, doc):
+        """Equivalente a handleHashQuery()."""
+        ruta = _texto(doc, "path", "/")
+        if ruta in self.archivos:
+            self._info_archivo(ruta, *self.archivos[ruta])
+        elif ruta == "/":
+            self._info_archivo(ruta, "text/html", False, self.html_ram.encode("utf-8"))
+        else:
+            self._print("[ESP32] Recurso no encontrado: %s\n" % ruta)
+        self._fin()
+
+    def _cmd_ASSETS(self, doc):
+        """Equivalente a handleAssetsRequest()."""
+        borrar = _texto(doc, "delete")
+        if borrar:
+            if self.archivos.pop(borrar, None) is None:
+                self._print("[ESP32] Recurso no encontrado: %s\n" % borrar)
+            else:
+                self._print("[ESP32] Archivo borrado: %s\n" % borrar)
+            self._fin()
+            return
+        for ruta, (tipo, es_gzip, datos) in self.archivos.items():
+            self._info_archivo(ruta, tipo, es_gzip, datos)
+        if self.flash:
+            usados = sum(len(datos) for _, _, datos in self.archivos.values())
+            self._println(_serializar({"used": usados, "total": LITTLEFS_TOTAL}))
+        else:
+            self._println("[ESP32] LittleFS no disponible")
+        self._fin()
+
+    def _info_archivo(self, ruta, tipo, es_gzip, datos):
+        # printAssetInfo()
+        self._println(_serializar({"path": ruta, "type": tipo, "crc32": "%08x" % crc32(datos),
+                                   "len": len(datos), "enc": "gzip" if es_gzip else "identity"}))
+
+    def _cmd_FRAMING(self, doc):
+        """Equivalente a handleFramingRequest()."""
+        modo = _texto(doc, "mode")
+        if modo not in ("binary", "text"):
+            self._println('[ESP32] FRAMING mal formado: \'mode\' debe ser "binary" o "text"')
+            self._fin()
+            return
+        self._print('{"framing":"%s","max":%d}\n' % (modo, MAX_DATOS))
+        self._fin()
+        self.tramas = modo == "binary"
+        self._trama = bytearray()
+        self._raw = bytearray()
+        self._raw_invalido = False
+
+    def _cmd_HTML(self, doc):
+        """
+        Equivalente a handleHtmlPart(); con "raw": true a handleHtmlRaw() y
+        con "xfer" a handleHtmlWindowPart().
+        """
+        if doc.get("xfer") is not None:
+            self._html_ventana(doc)
+            return
+        if doc.get("raw") is True:
+            contenido, ok = self._tomar_raw()
+            ruta = _texto(doc, "path", "/")
+            if not ok or not contenido or not _ruta_valida(ruta):
+                self._println("[ESP32] Datos HTML binarios inválidos.")
+            else:
+                self._terminar_html(ruta, _texto(doc, "type", "text/html"), _texto(doc, "enc") == "gzip",
+                                    contenido)
+            self._fin()
+            return
+        index = _entero(doc, "index", -1)
+        total = _entero(doc, "total", -1)
+        contenido = _texto(doc, "content")
+        if index < 0 or total < 1 or len(contenido) == 0:
+            self._println("[ESP32] Datos HTML_PART inválidos.")
+            self._fin()
+            return
+        if index == 0:
+            self.html_buffer = ""
+            self.expected_total_parts = total
+            self.received_parts = 0
+        if index != self.received_parts:
+            self._print("[ESP32] Fragmento fuera de orden: esperado %d, recibido %d\n"
+                        % (self.received_parts, index))
+            self._fin()
+            return
+        self.html_buffer += contenido
+        self.received_parts += 1
+        if self.received_parts == self.expected_total_parts:
+            self._terminar_html("/", "text/html", False, self.html_buffer.encode("utf-8"))
+            self.html_buffer = ""
+            self.expected_total_parts = 0
+            self.received_parts = 0
+        self._fin()
+
+    def _cmd_BAUD(self, doc):
+        """Equivalente a handleBaudRequest()."""
+        rate = _entero(doc, "rate", 0)
+        if rate < BAUD_MIN or rate > BAUD_MAX:
+            self._print("[ESP32] Velocidad no soportada: %d\n" % rate)
+            self._fin()
+            return
+        previos = self._baudios_previos or self.baudios
+        self._print('{"baud":%d,"prev":%d}\n' % (rate, previos))
+        self._fin()
+        self.baudios = rate
+        self._baudios_previos = previos
+        self._baudios_desde = time.monotonic()
+
+    def _cmd_PROBE(self, doc):
+        """Equivalente a handleBaudProbe()."""
+        datos = _texto(doc, "data")
+        crc = _entero(doc, "crc", -1)
+        calculado = crc16(datos.encode("utf-8"))
+        if not datos or crc != calculado:
+            self._println("[ESP32] PROBE inválido")
+            self._fin()
+            if self._baudios_previos:
+                self.baudios = self._baudios_previos
+                self._baudios_previos = 0
+            return
+        self._baudios_previos = 0
+        self._println(_serializar({"probe": datos, "crc": calculado, "baud": self.baudios}))
+        self._fin()
+
+    def _html_ventana(self, doc):
+        """Equivalente a handleHtmlWindowPart()."""
+        xfer = _entero(doc, "xfer", -1)
+        index = _entero(doc, "index", -1)
+        total = _entero(doc, "total", -1)
+        contenido = _texto(doc, "content")
+        ruta = _texto(doc, "path", "/")
+        if (xfer < 0 or index < 0 or total < 1 or total > HTML_PARTS_MAX or index >= total
+                or len(contenido) == 0 or not _ruta_valida(ruta)):
+            self._println("[ESP32] Datos HTML_PART inválidos.")
+            self._fin()
+            return
+        if xfer == self._html_xfer_hecha:
+            self._html_ack(total)
+            self._fin()
+            return
+        codificacion = _texto(doc, "enc")
+        es_gzip = codificacion == "gzip"
+        if es_gzip or codificacion == "base64":
+            try:
+                contenido = binascii.a2b_base64(contenido)
+            except (binascii.Error, ValueError):
+                self._println("[ESP32] Datos HTML_PART inválidos.")
+                self._fin()
+                return
+        else:
+            contenido = contenido.encode("utf-8")
+        if xfer != self._html_xfer or len(self._html_partes) != total:
+            self._html_xfer = xfer
+            self._html_ruta = ruta
+            self._html_tipo = _texto(doc, "type", "text/html")
+            self._html_partes = [None] * total
+            self._html_mayor = -1
+        if self._html_partes[index] is None:
+            self._html_partes[index] = contenido
+        self._html_mayor = max(self._html_mayor, index)
+        if None not in self._html_partes:
+            self._terminar_html(self._html_ruta, self._html_tipo, es_gzip, b"".join(self._html_partes))
+            self._html_xfer_hecha = xfer
+            self._html_xfer = -1
+            self._html_partes = []
+        self._html_ack(total)
+        self._fin()
+
+    def _terminar_html(self, ruta, tipo, es_gzip, datos):
+        # finishHtmlUpload() + storeAsset()
+        if es_gzip and not _gzip_valido(datos):
+            self._println("[ESP32] gzip inválido, HTML sin cambios")
+        elif self.flash and (ruta in self.archivos or len(self.archivos) < ASSET_MAX):
+            self.archivos[ruta] = (tipo, es_gzip, bytes(datos))
+            self._println("[ESP32] HTML actualizado")
+        elif self.flash or ruta != "/" or es_gzip or tipo != "text/html":
+            self._println("[ESP32] No se pudo guardar en flash")
+        else:
+            self.html_ram = bytes(datos).decode("utf-8", "replace")
+            self._println("[ESP32] HTML actualizado")
+
+    def _html_ack(self, total):
+        # sendHtmlAck()
+        ack, alto, faltan = total, total - 1, []
+        if self._html_xfer >= 0:
+            ack = 0
+            while ack < total and self._html_partes[ack] is not None:
+                ack += 1
+            alto = self._html_mayor
+            for i in range(ack, self._html_mayor + 1):
+                if self._html_partes[i] is not None:
+                    continue
+                if len(faltan) == HTML_MISSING_MAX:
+                    alto = i - 1
+                    break
+                faltan.append(i)
+        self._println(_serializar({"missing": faltan, "ack": ack, "high": alto}))
+
+    # ------------------------------------------------------------------ endpoints
+    def init_endpoint_table(self, capacidad=0):
+        """Equivalente a initEndpointTable(): capacidad <= 0 se calcula con heap_libre."""
+        if capacidad <= 0:
+            capacidad = max(0, self.heap_libre - ENDPOINT_HEAP_RESERVE) // ENDPOINT_HEAP_BYTES
+        self.capacidad_endpoints = min(max(capacidad, ENDPOINTS_MIN), ENDPOINTS_MAX)
+        while len(self.endpoints) > self.capacidad_endpoints:
+            del self.endpoints[self._victima()]
+            self.estadisticas_endpoints["evictions"] += 1
+
+    def _vencido(self, entrada):
+        return self.ttl_endpoints > 0 and time.monotonic() - entrada[2] > self.ttl_endpoints
+
+    def _victima(self):
+        # pickEvictionVictim(): un vencido o, si no hay, el que indica la política
+        victima = None
+        for ep, entrada in self.endpoints.items():
+            if self._vencido(entrada):
+                return ep
+            clave = entrada[1] if self.politica_endpoints == "lru" else entrada[2]
+            if victima is None or clave < victima[1]:
+                victima = (ep, clave)
+        return victima[0]
+
+    def find_endpoint(self, ep):
+        """Entrada [jsonData, lastUse, updated] de 'ep' (aunque esté vencida) o None."""
+        return self.endpoints.get(ep)
+
+    def find_live_endpoint(self, ep):
+        entrada = self.endpoints.get(ep)
+        return None if entrada is None or self._vencido(entrada) else entrada
+
+    def _heap_estimado(self):
+        return self.heap_libre - len(self.endpoints) * ENDPOINT_HEAP_BYTES
+
+    def set_endpoint_data(self, ep, json_data):
+        entrada = self.endpoints.get(ep)
+        if entrada is None:
+            if len(self.endpoints) >= self.capacidad_endpoints or (
+                    self.endpoints and self._heap_estimado() <= ENDPOINT_HEAP_RESERVE):
+                del self.endpoints[self._victima()]
+                self.estadisticas_endpoints["evictions"] += 1
+            entrada = self.endpoints[ep] = [json_data, 0, 0.0]
+        self._reloj_uso += 1
+        entrada[0] = json_data
+        entrada[1] = self._reloj_uso
+        entrada[2] = time.monotonic()
+        self.record_history(ep, json_data)
+        self.push_endpoint_event(ep, json_data)
+
+    def _cmd_ENDPOINTS(self, doc):
+        """Equivalente a handleEndpointsRequest()."""
+        politica = _texto(doc, "policy")
+        if politica in ("lru", "ttl"):
+            self.politica_endpoints = politica
+        elif politica:
+            self._println('[ESP32] ENDPOINTS mal formado: \'policy\' debe ser "lru" o "ttl"')
+            self._fin()
+            return
+        if doc.get("ttl") is not None:
+            self.ttl_endpoints = max(0, _entero(doc, "ttl", 0))
+        if doc.get("max") is not None:
+            self.init_endpoint_table(_entero(doc, "max", 0))
+        estado = {"count": len(self.endpoints), "max": self.capacidad_endpoints,
+                  "policy": self.politica_endpoints, "ttl": self.ttl_endpoints}
+        estado.update(self.estadisticas_endpoints)
+        estado["subscribers"] = self._suscriptores_conectados()
+        estado["heap"] = self._heap_estimado()
+        self._println(_serializar(estado))
+        self._fin()
+
+    def merge_endpoint_data(self, ep, parche):
+        """Equivalente a mergeEndpointData(); False si el endpoint no existe."""
+        entrada = self.find_live_endpoint(ep)
+        if entrada is None:
+            return False
+        try:
+            datos = json.loads(entrada[0])
+        except ValueError:
+            datos = {}
+        if not isinstance(datos, dict):
+            datos = {}
+        for clave, valor in parche.items():
+            if valor is None:
+                datos.pop(clave, None)
+            else:
+                datos[clave] = valor
+        self._reloj_uso += 1
+        entrada[0] = _serializar(datos)
+        entrada[1] = self._reloj_uso
+        entrada[2] = time.monotonic()
+        self.record_history(ep, entrada[0])
+        self.push_endpoint_event(ep, entrada[0])
+        return True
+
+    # ------------------------------------------------------------------ historial
+    def _millis(self, instante=None):
+        return int(((time.monotonic() if instante is None else instante) - self._arranque) * 1000)
+
+    def record_history(self, label, json_data):
+        """Equivalente a recordHistory()."""
+        muestras = self.historiales.get(label)
+        if muestras is None:
+            return
+        t = self._millis()
+        if muestras and t <= muestras[-1][0]:
+            t = muestras[-1][0] + 1
+        muestras.append([t, json_data])
+
+    def _info_historial(self, label):
+        muestras = self.historiales[label]
+        self._println(_serializar({"label": label, "size": muestras.maxlen, "count": len(muestras),
+                                   "oldest": muestras[0][0] if muestras else 0,
+                                   "newest": muestras[-1][0] if muestras else 0}))
+
+    def _cmd_HISTORY(self, doc):
+        """Equivalente a handleHistoryRequest()."""
+        label = _texto(doc, "label")
+        if doc.get("size") is None:
+            for nombre in self.historiales:
+                if not label or nombre == label:
+                    self._info_historial(nombre)
+            self._fin()
+            return
+        tamano = _entero(doc, "size", -1)
+        if not label or tamano < 0:
+            self._println("[ESP32] Comando HISTORY mal formado: faltan 'label' o 'size'")
+        elif tamano == 0:
+            self.historiales.pop(label, None)
+            self._print("[ESP32] Historial de /%s borrado\n" % label)
+        elif tamano > HISTORY_SIZE_MAX:
+            self._print("[ESP32] Historial de %d muestras: el máximo es %d\n" % (tamano, HISTORY_SIZE_MAX))
+        elif label not in self.historiales and len(self.historiales) >= HISTORY_LABELS:
+            self._print("[ESP32] No hay lugar para otro historial (máximo %d)\n" % HISTORY_LABELS)
+        else:
+            anterior = self.historiales.get(label)
+            actual = anterior.maxlen if anterior is not None else 0
+            if tamano > actual and self._heap_estimado() < ENDPOINT_HEAP_RESERVE + (tamano - actual) * HISTORY_SAMPLE_BYTES:
+                self._print("[ESP32] Sin memoria para %d muestras\n" % tamano)
+            else:
+                self.historiales[label] = collections.deque(anterior or (), maxlen=tamano)
+                self._print("[ESP32] Historial de /%s: %d muestras\n" % (label, tamano))
+        self._fin()
+
+    # ------------------------------------------------------------------ eventos (SSE)
+    def _suscriptores_conectados(self):
+        self.suscriptores = [cliente for cliente in self.suscriptores if cliente.conectado]
+        return len(self.suscriptores)
+
+    def push_endpoint_event(self, label, json_data):
+        """Equivalente a pushEndpointEvent()."""
+        for cliente in self.suscriptores:
+            if cliente.quiere(label):
+                cliente.enviar(label, json_data)
+
+    def _servir_eventos(self, consulta):
+        # handleEvents(): el cuerpo es el ClienteSSE, que sigue recibiendo eventos
+        if self._suscriptores_conectados() >= SSE_MAX_CLIENTS:
+            return 503, {"Content-Type": "text/plain"}, "Demasiados suscriptores"
+        filtro = consulta.get("label", [""])[0]
+        cliente = ClienteSSE(filtro.split(",") if filtro else None)
+        self.suscriptores.append(cliente)
+        for label in cliente.labels or ():
+            entrada = self.find_live_endpoint(label)
+            if entrada is not None:
+                cliente.enviar(label, entrada[0])
+        return 200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}, cliente
+
+    def _servir_historial(self, label, consulta):
+        # sendHistory()
+        muestras = self.historiales.get(label)
+        if muestras is None:
+            entrada = self.find_live_endpoint(label)
+            if entrada is None:
+                self.estadisticas_endpoints["misses"] += 1
+                return 404, {"Content-Type": "text/plain"}, "No encontrado"
+            muestras = [[self._millis(entrada[2]), entrada[0]]]
+        self.estadisticas_endpoints["hits"] += 1
+        muestras = list(muestras)
+        if "since" in consulta:
+            desde = _numero_arg(consulta["since"][0])
+            muestras = [m for m in muestras if m[0] > desde]
+        if "last" in consulta:
+            ultimas = _numero_arg(consulta["last"][0])
+            if ultimas >= 0 and len(muestras) > ultimas:
+                muestras = muestras[len(muestras) - ultimas:]
+        cuerpo = _serializar({"label": label, "now": self._millis()})[:-1]
+        cuerpo += ',"samples":[%s]}' % ",".join('{"t":%d,"data":%s}' % (t, datos) for t, datos in muestras)
+        return 200, {"Content-Type": "application/json"}, cuerpo
+
+    # ------------------------------------------------------------------ servidor web
+    def servir(self, ruta, cabeceras=None):
+        """
+        Atiende una petición HTTP al servidor embebido como lo harían
+        handleRoot() y handleDynamic(). 'cabeceras' son las de la petición
+        (solo se mira Accept-Encoding). 'ruta' puede traer ?since=<t> o
+        ?last=N. Devuelve (codigo, cabeceras, cuerpo); para /events el cuerpo
+        es un ClienteSSE que sigue recibiendo los eventos.
+        """
+        ruta, _, consulta = ruta.partition("?")
+        consulta = parse_qs(consulta, keep_blank_values=True)
+        if ruta == "/events":
+            return self._servir_eventos(consulta)  # server.on("/events") gana a los archivos
+        archivo = self.archivos.get(ruta)
+        if archivo is not None:
+            # serveAsset()
+            tipo, es_gzip, datos = archivo
+            if not es_gzip:
+                return 200, {"Content-Type": tipo}, datos
+            if "gzip" in (cabeceras or {}).get("Accept-Encoding", ""):
+                return 200, {"Content-Type": tipo, "Content-Encoding": "gzip"}, datos
+            # sendGunzipped(): descompresión al vuelo para clientes sin gzip
+            return 200, {"Content-Type": tipo}, gzip.decompress(datos)
+        if ruta == "/":
+            return 200, {"Content-Type": "text/html"}, self.html_ram
+        label = ruta[1:] if ruta.startswith("/") else ruta
+        if "since" in consulta or "last" in consulta:
+            return self._servir_historial(label, consulta)
+        entrada = self.find_live_endpoint(label)
+        if entrada is None:
+            self.estadisticas_endpoints["misses"] += 1
+            return 404, {"Content-Type": "text/plain"}, "No encontrado"
+        self.estadisticas_endpoints["hits"] += 1
+        self._reloj_uso += 1
+        entrada[1] = self._reloj_uso
+        return 200, {"Content-Type": "application/json"}, entrada[0]
+
+
+def _texto(doc, clave, defecto=""):
+    # doc["clave"] | "" de ArduinoJson: el valor por defecto si no es string
+    valor = doc.get(clave)
+    return valor if isinstance(valor, str) else defecto
+
+
+def _numero_arg(texto):
+    # String::toInt(): el número inicial (con signo), 0 si no hay
+    texto = texto.strip()
+    signo = -1 if texto.startswith("-") else 1
+    digitos = ""
+    for caracter in texto.lstrip("+-"):
+        if not caracter.isdigit():
+            break
+        digitos += caracter
+    return signo * int(digitos) if digitos else 0
+
+
+def _opciones_http(doc):
+    # httpOptions(): tamaño de bloque (0 sin "stream"), reuso de conexión, filtro de "fields" (o None)
+    # y validadores de caché
+    bloque = 0
+    if doc.get("stream") is True:
+        bloque = min(max(_entero(doc, "chunk", HTTP_CHUNK_DEFAULT), HTTP_CHUNK_MIN), MAX_DATOS)
+    campos = doc.get("fields")
+    if isinstance(campos, str):
+        campos = [campos]
+    filtro = None
+    if isinstance(campos, list):
+        for ruta in campos:
+            if isinstance(ruta, str):
+                filtro = _agregar_ruta(filtro, ruta)
+    return {"bloque": bloque, "reusar": doc.get("reuse") is not False, "filtro": filtro,
+            "etag": _texto(doc, "etag"), "modificado": _texto(doc, "modified"),
+            "validadores": doc.get("cache") is True}
+
+
+def _agregar_ruta(filtro, ruta):
+    # addFilterPath(): devuelve el filtro (dict, [filtro] o True) con la ruta agregada
+    if filtro is True:
+        return True
+    ruta = ruta.lstrip(".")
+    if not ruta:
+        return True
+    if ruta.startswith("[]"):
+        elemento = filtro[0] if isinstance(filtro, list) else {}
+        return [_agregar_ruta(elemento, ruta[2:])]
+    fin = len(ruta)
+    for separador in (".", "[]"):
+        pos = ruta.find(separador)
+        if 0 <= pos < fin:
+            fin = pos
+    miembros = filtro if isinstance(filtro, dict) else {}
+    miembros[ruta[:fin]] = _agregar_ruta(miembros.get(ruta[:fin], {}), ruta[fin:])
+    return miembros
+
+
+def _aplicar_filtro(valor, filtro):
+    # DeserializationOption::Filter: lo que el filtro no admite queda en null
+    if filtro is True:
+        return valor
+    if isinstance(filtro, list):
+        return [_aplicar_filtro(elemento, filtro[0]) for elemento in valor] if isinstance(valor, list) else None
+    if isinstance(filtro, dict) and isinstance(valor, dict):
+        resultado = {}
+        for clave, miembro in valor.items():
+            sub = filtro.get(clave, filtro.get("*"))
+            if sub is not None:
+                resultado[clave] = _aplicar_filtro(miembro, sub)
+        return resultado
+    return None
+
+
+def _destino_http(url):
+    # parseHttpUrl(): (esquema, host, puerto) o None si la URL no sirve
+    try:
+        partes = urlsplit(url)
+        puerto = partes.port
+    except ValueError:
+        return None
+    esquema = partes.scheme.lower()
+    if esquema not in ("http", "https") or not partes.hostname:
+        return None
+    return esquema, partes.hostname, puerto or (443 if esquema == "https" else 80)
+
+
+def _conexion_abierta(conexion):
+    # WiFiClient::connected(); http.client deja 'sock' en None al cerrar
+    return conexion is not None and getattr(conexion, "sock", True) is not None
+
+
+def _cerrar_conexion(conexion):
+    if hasattr(conexion, "close"):
+        conexion.close()
+
+
+def _entero(doc, clave, defecto):
+    valor = doc.get(clave)
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return defecto
+    return int(valor)
+
+
+def _gzip_valido(datos):
+    # gzipHeaderLength() != 0: magic 1f 8b, método deflate y lugar para la cola
+    return len(datos) >= 18 and datos[0] == 0x1F and datos[1] == 0x8B and datos[2] == 8
+
+
+def _ruta_valida(ruta):
+    # validAssetPath()
+    return ruta.startswith("/") and len(ruta) <= ASSET_PATH_MAX and '"' not in ruta
+
+
+def _como_texto(valor):
+    # doc["id"].as<String>() de ArduinoJson
+    if isinstance(valor, str):
+        return valor
+    return _serializar(valor)
+
+
+def _serializar(valor):
+    # serializeJson de ArduinoJson: JSON compacto y sin escapar UTF-8
+    return json.dumps(valor, separators=(",", ":"), ensure_ascii=False)
+
+
+class TransporteEmulado:
+    """
+    Transporte en proceso que conecta ESP32UART con un EmuladorESP32.
+
+    Simula el tiempo de la línea serie a 'baudrate' baudios (8N1) en ambos
+    sentidos y el tiempo que el firmware pasa bloqueado en cada comando.
+    Con baudrate=None la transferencia es instantánea. Si 'baudrate' no
+    coincide con la velocidad del emulador (o supera su max_baudios) los
+    bytes llegan corrompidos, como en una UART real.
+    """
+
+    def __init__(self, emulador, baudrate=115200, timeout=0.1):
+        self.emulador = emulador
+        self.baudrate = baudrate
+        if baudrate:
+            # Ambos lados arrancan a la misma velocidad, como si el firmware usara 'baudrate'
+            emulador.baud_inicial = emulador.baudios = baudrate
+        self.timeout = timeout
+        self.bytes_tx = 0
+        self.bytes_rx = 0
+        self._rx = bytearray()
+        self._pendientes = []  # [instante_inicio, bytes] aún en la línea
+        self._tx_libre = 0.0  # instante en que termina el último byte enviado
+        self._esp_libre = 0.0  # instante en que el ESP32 termina de responder
+
+    @property
+    def pin_ready(self):
+        return self.emulador.pin_ready
+
+    @property
+    def pin_reset(self):
+        return self.emulador.pin_reset
+
+    def _segundos(self, nbytes):
+        if not self.baudrate:
+            return 0.0
+        return nbytes * BITS_POR_BYTE / self.baudrate
+
+    def _enlace_ok(self):
+        emu = self.emulador
+        if not self.baudrate:
+            return True
+        return self.baudrate == emu.baudios and (emu.max_baudios is None or emu.baudios <= emu.max_baudios)
+
+    def write(self, datos):
+        datos = bytes(datos)
+        ahora = time.monotonic()
+        llegada = max(ahora, self._tx_libre) + self._segundos(len(datos))
+        self._tx_libre = llegada
+        self.emulador.revisar_baudios()
+        if self._enlace_ok():
+            salida = self.emulador.recibir(datos)
+        else:
+            salida = _ruido(self.emulador.recibir(_ruido(datos)))
+        inicio = max(llegada, self._esp_libre) + self.emulador.consumir_demora()
+        if salida:
+            self._pendientes.append([inicio, salida])
+            self._esp_libre = inicio + self._segundos(len(salida))
+        else:
+            self._esp_libre = inicio
+        self.bytes_tx += len(datos)
+        return len(datos)
+
+    def _actualizar(self):
+        ahora = time.monotonic()
+        salida = self.emulador.atender()  # loop() sigue corriendo entre comandos
+        if salida:
+            if not self._enlace_ok():
+                salida = _ruido(salida)
+            inicio = max(ahora, self._esp_libre)
+            self._pendientes.append([inicio, salida])
+            self._esp_libre = inicio + self._segundos(len(salida))
+        while self._pendientes:
+            inicio, datos = self._pendientes[0]
+            if ahora < inicio:
+                break
+            if self.baudrate:
+                llegados = int((ahora - inicio) * self.baudrate / BITS_POR_BYTE)
+            else:
+                llegados = len(datos)
+            if llegados >= len(datos):
+                self._rx += datos
+                self._pendientes.pop(0)
+            else:
+                if llegados > 0:
+                    self._rx += datos[:llegados]
+                    self._pendientes[0] = [inicio + self._segundos(llegados), datos[llegados:]]
+                break
+
+    @property
+    def in_waiting(self):
+        self._actualizar()
+        return len(self._rx)
+
+    def _esperar_datos(self):
+        limite = time.monotonic() + self.timeout
+        while not self.in_waiting:
+            ahora = time.monotonic()
+            if ahora >= limite:
+                return False
+            # Dormir hasta el próximo byte o, si no hay nada en camino, hasta el timeout
+            proximo = self._pendientes[0][0] + self._segundos(1) if self._pendientes else limite
+            evento = self.emulador.proximo_evento()
+            if evento is not None:
+                proximo = min(proximo, evento)
+            time.sleep(max(0.0, min(proximo, limite) - ahora))
+        return True
+
+    def read(self, nbytes=None):
+        if not self._esperar_datos():
+            return None
+        if nbytes is None or nbytes > len(self._rx):
+            nbytes = len(self._rx)
+        datos = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        self.bytes_rx += nbytes
+        return datos
+
+    def readinto(self, buf):
+        if not self._esperar_datos():
+            return None
+        n = min(len(buf), len(self._rx))
+        buf[:n] = self._rx[:n]
+        del self._rx[:n]
+        self.bytes_rx += n
+        return n
+
+    def reset_input_buffer(self):
+        self._actualizar()
+        self._rx = bytearray()
+
+    def deinit(self):
+        pass
+
+
+def _ruido(datos):
+    # Bytes leídos a otra velocidad: sin '\n' válidos y sin UTF-8 decodificable
+    return bytes((b ^ 0x5A) | 0x80 for b in datos)
+
+
+def servir_pty(emulador, baudrate=None):
+    """
+    Expone el emulador en un pseudo-terminal de Linux y devuelve la ruta del
+    esclavo (por ejemplo /dev/pts/5) para abrirla con TransporteSerial o con
+    cualquier programa de terminal. El emulador corre en un hilo demonio.
+    """
+    import os
+    import pty
+    import select
+    import tty
+    import threading
+
+    maestro, esclavo = pty.openpty()
+    tty.setraw(esclavo)
+    ruta = os.ttyname(esclavo)
+
+    def atender():
+        while True:
+            # Sin datos, loop() igual avanza la conexión WiFi (eventos y respuesta diferida de CONNECT)
+            listos, _, _ = select.select([maestro], [], [], 0.05)
+            datos = b""
+            if listos:
+                try:
+                    datos = os.read(maestro, 4096)
+                except OSError:
+                    return  # pty cerrado
+            salida = emulador.recibir(datos) + emulador.atender()
+            demora = emulador.consumir_demora()
+            if baudrate:
+                demora += (len(datos) + len(salida)) * BITS_POR_BYTE / baudrate
+            if demora:
+                time.sleep(demora)
+            if salida:
+                os.write(maestro, salida)
+
+    threading.Thread(target=atender, daemon=True).start()
+    return ruta
@@ -0,0 +1,20 @@
+"""Excepciones de la librería archinet."""
+
+
+class ErrorESP32(Exception):
+    """Error base de la comunicación con el ESP32."""
+
+
+class TiempoAgotado(ErrorESP32):
+    """
+    El ESP32 no envió el marcador de fin dentro del timeout.
+    'parcial' guarda el texto recibido que no llegó a formar una línea.
+    """
+
+    def __init__(self, mensaje, parcial=""):
+        super().__init__(mensaje)
+        self.parcial = parcial
+
+
+class TramaCorrupta(ErrorESP32):
+    """Una trama binaria llegó (o fue recibida por el ESP32) con CRC inválido."""
@@ -0,0 +1,98 @@
+"""
+Separador de líneas sin asignaciones para la UART del ESP32.
+
+Usa un único bytearray preasignado: los datos se leen con uart.readinto()
+sobre un memoryview de la zona libre y las líneas se entregan como memoryview
+del mismo buffer, sin copiarlas. Una línea más larga que el buffer se entrega
+en fragmentos (por ejemplo el cuerpo de un GET grande, que el ESP32 envía en
+una sola línea).
+"""
+
+
+class LectorLineas:
+    def __init__(self, uart, capacidad=2048):
+        self.uart = uart
+        self._buf = bytearray(capacidad)
+        self._mv = memoryview(self._buf)
+        self._inicio = 0  # Inicio de la línea en curso
+        self._fin = 0  # Fin de los datos válidos
+        self._escaneado = 0  # Hasta dónde ya se buscó '\n'
+        # True si la última línea entregada es un fragmento sin '\n' final
+        self.fragmento = False
+
+    def llenar(self):
+        """
+        Lee de la UART lo que indique 'in_waiting' (o espera un byte hasta el
+        timeout de la UART si no hay nada) y devuelve la cantidad leída.
+        Invalida las líneas entregadas antes de la llamada.
+        """
+        if self._fin == len(self._buf):
+            self._compactar()
+        libre = len(self._buf) - self._fin
+        if libre == 0:
+            return 0  # Hay que consumir líneas con siguiente() antes de leer más
+        disponibles = self.uart.in_waiting
+        if disponibles <= 0:
+            disponibles = 1  # Bloquea hasta el timeout de la UART, sin girar en vacío
+        n = self.uart.readinto(self._mv[self._fin:self._fin + min(disponibles, libre)])
+        if not n:
+            return 0
+        self._fin += n
+        return n
+
+    def _compactar(self):
+        # Mueve la línea incompleta al principio del buffer (memmove, sin copias nuevas)
+        n = self._fin - self._inicio
+        if self._inicio > 0:
+            self._mv[0:n] = self._mv[self._inicio:self._fin]
+            self._escaneado -= self._inicio
+            self._inicio = 0
+            self._fin = n
+
+    def siguiente(self):
+        """
+        Devuelve la próxima línea completa (sin '\\n' ni '\\r' final) como
+        memoryview, o None si no hay ninguna. Si la línea no entra en el
+        buffer devuelve su siguiente fragmento y deja 'fragmento' en True.
+        """
+        pos = self._buf.find(b"\n", self._escaneado, self._fin)
+        if pos < 0:
+            self._escaneado = self._fin
+            if self._inicio == 0 and self._fin == len(self._buf):
+                return self._cortar_fragmento()
+            return None
+        inicio = self._inicio
+        fin = pos
+        if fin > inicio and self._buf[fin - 1] == 0x0D:
+            fin -= 1
+        self._inicio = self._escaneado = pos + 1
+        if self._inicio == self._fin:
+            self._inicio = self._escaneado = self._fin = 0
+        self.fragmento = False
+        return self._mv[inicio:fin]
+
+    def _cortar_fragmento(self):
+        # Buffer lleno sin '\n': se entrega sin partir un carácter UTF-8
+        fin = self._fin
+        for atras in range(1, 4):
+            byte = self._buf[fin - atras]
+            if byte & 0xC0 == 0xC0:  # Byte inicial de una secuencia multibyte
+                largo = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+                if largo > atras:
+                    fin -= atras
+                break
+            if byte & 0xC0 != 0x80:  # ASCII: no hay secuencia cortada
+                break
+        fragmento = self._mv[0:fin]
+        self._inicio = fin
+        self.fragmento = True
+        return fragmento
+
+    def pendiente(self):
+        """Bytes recibidos que todavía no forman una línea completa."""
+        return self._mv[self._inicio:self._fin]
+
+    def descartar(self):
+        """Vacía el buffer (por ejemplo tras un timeout)."""
+        self._inicio = self._fin = self._escaneado = 0
+        self.fragmento = False
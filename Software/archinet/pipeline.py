@@ -0,0 +1,216 @@
+"""
+Varios comandos en vuelo sobre la UART del ESP32.
+
+Cada comando se envía con un campo "id" y el firmware antepone "@<id> " a
+cada línea de su respuesta, incluido el marcador {"end": true}. Así no hace
+falta esperar la respuesta de un comando para enviar el siguiente: el ESP32
+los atiende en orden desde su buffer de recepción y el cliente reparte cada
+línea al pedido que corresponde.
+
+    cliente = ClientePipeline(esp, max_en_vuelo=4)
+    get = cliente.enviar({"cmd": "GET", "url": "http://..."})
+    temp = cliente.enviar({"cmd": "WebServer", "label": "Temperatura", "data": {"t": 25}})
+    for registro in cliente.esperar(get, timeout=30):
+        ...
+"""
+
+import time
+
+from .errores import ErrorESP32, TiempoAgotado
+from .respuestas import CUERPO, ESTADO, EVENTO, FIN, HTTP, Registro, clasificar, decodificar
+from .tramas import TRAMA_DATOS, TRAMA_NAK
+
+_ARROBA = 0x40  # '@'
+_MAX_PREFIJO = 24  # "@" + id + " "
+MAX_HUERFANAS = 32  # Las más viejas se descartan: un cliente de larga duración no acumula memoria
+
+
+class Pedido:
+    """Comando enviado con 'id'; acumula sus registros hasta el marcador de fin."""
+
+    __slots__ = ("id", "comando", "registros", "terminado", "en_cuerpo", "perdido")
+
+    def __init__(self, id_pedido, comando):
+        self.id = id_pedido
+        self.comando = comando
+        self.registros = []
+        self.terminado = False
+        self.en_cuerpo = False
+        # True si terminó sin fin propio: el ESP32 ya respondió un pedido posterior
+        self.perdido = False
+
+    def __repr__(self):
+        return "Pedido(%s, %s, terminado=%s)" % (self.id, self.comando.get("cmd"), self.terminado)
+
+
+class ClientePipeline:
+    def __init__(self, esp, max_en_vuelo=4):
+        """
+        esp: un ESP32UART ya conectado.
+        max_en_vuelo: comandos sin terminar permitidos a la vez; acotado por el
+        buffer de recepción del ESP32 (UART_RX_BUF_SIZE en el firmware).
+        """
+        self.esp = esp
+        self.max_en_vuelo = max_en_vuelo
+        self._siguiente_id = 1
+        self._en_vuelo = {}
+        self._continuacion = False  # La línea fragmentada en curso sigue llegando
+        self._dueno_fragmento = None
+        self._dueno_cuerpo = None  # Pedido del último código HTTP (tramas 'D' sin id)
+        # Últimas MAX_HUERFANAS líneas sin dueño: errores de parseo previos al id, mensajes
+        # espontáneos o respuestas tardías de pedidos abandonados
+        self.huerfanas = []
+        # Función opcional al_huerfana(registro), llamada con cada línea sin dueño
+        self.al_huerfana = None
+        # Función opcional al_terminar(pedido), llamada al recibir el fin de un pedido
+        self.al_terminar = None
+
+    @property
+    def en_vuelo(self):
+        return len(self._en_vuelo)
+
+    def enviar(self, comando, timeout=5):
+        """
+        Envía 'comando' con un id nuevo y devuelve su Pedido sin esperar la
+        respuesta. Si ya hay max_en_vuelo pedidos abiertos, procesa respuestas
+        hasta que se libere un lugar.
+        """
+        inicio = time.monotonic()
+        while len(self._en_vuelo) >= self.max_en_vuelo:
+            if time.monotonic() - inicio >= timeout:
+                raise TiempoAgotado("Ningún comando en vuelo terminó en %s s" % timeout)
+            self.bombear()
+
+        id_pedido = self._siguiente_id
+        self._siguiente_id += 1
+        comando = dict(comando)
+        comando["id"] = id_pedido
+        pedido = Pedido(str(id_pedido), comando)
+        self._en_vuelo[pedido.id] = pedido
+        self.esp.solicitar_comando(comando)
+        return pedido
+
+    def esperar(self, pedido, timeout=5):
+        """
+        Procesa respuestas hasta que 'pedido' reciba su fin y devuelve sus
+        registros. Lanza TiempoAgotado y abandona el pedido si no termina, y
+        ErrorESP32 si se perdió (ver _terminar).
+        """
+        inicio = time.monotonic()
+        while not pedido.terminado:
+            if time.monotonic() - inicio >= timeout:
+                self.abandonar(pedido)
+                raise TiempoAgotado("El pedido %s no terminó en %s s" % (pedido.id, timeout))
+            self.bombear()
+        if pedido.perdido:
+            raise ErrorESP32("El pedido %s no tuvo respuesta completa" % pedido.id)
+        return pedido.registros
+
+    def abandonar(self, pedido):
+        """Libera el lugar de un pedido sin fin; sus líneas tardías van a 'huerfanas' (las últimas MAX_HUERFANAS)."""
+        self._en_vuelo.pop(pedido.id, None)
+
+    def ejecutar(self, comandos, timeout=5):
+        """Envía todos los comandos en ventana y devuelve la lista de registros de cada uno."""
+        pedidos = [self.enviar(comando, timeout) for comando in comandos]
+        return [self.esperar(pedido, timeout) for pedido in pedidos]
+
+    def bombear(self):
+        """
+        Reparte entre los pedidos todas las líneas ya recibidas. Si no hay
+        ninguna, lee una vez de la UART (espera como máximo su timeout).
+        """
+        if self.esp.tramas is not None:
+            self._bombear_tramas()
+            return
+        lector = self.esp.lector
+        linea = lector.siguiente()
+        if linea is None:
+            lector.llenar()
+            linea = lector.siguiente()
+        while linea is not None:
+            self._enrutar(linea, lector.fragmento)
+            linea = lector.siguiente()
+
+    def _bombear_tramas(self):
+        lector = self.esp.tramas
+        trama = lector.siguiente()
+        if trama is None:
+            lector.llenar()
+            trama = lector.siguiente()
+        while trama is not None:
+            tipo, datos = trama
+            if tipo == TRAMA_DATOS:
+                self._guardar(self._dueno_cuerpo, Registro(CUERPO, bytes(datos), decodificar(datos), final=False))
+            elif tipo == TRAMA_NAK:
+                # No se sabe qué comando se corrompió: su pedido terminará por timeout
+                self._guardar(None, Registro(ESTADO, "[ESP32] Trama corrupta", "[ESP32] Trama corrupta"))
+            else:
+                self._enrutar(datos, False)
+            trama = lector.siguiente()
+
+    def _enrutar(self, linea, fragmento):
+        if self._continuacion:
+            # Resto de una línea más larga que el buffer: pertenece al mismo dueño
+            self._continuacion = fragmento
+            texto = decodificar(linea)
+            self._guardar(self._dueno_fragmento, Registro(CUERPO, texto, texto, final=not fragmento))
+            return
+
+        pedido = None
+        if len(linea) and linea[0] == _ARROBA:
+            separador = bytes(linea[:_MAX_PREFIJO]).find(b" ")
+            if separador > 0:
+                pedido = self._en_vuelo.get(decodificar(linea[1:separador]))
+                linea = linea[separador + 1:]
+
+        if fragmento:
+            self._continuacion = True
+            self._dueno_fragmento = pedido
+            texto = decodificar(linea)
+            self._guardar(pedido, Registro(CUERPO, texto, texto, final=False))
+            return
+
+        registro = clasificar(linea, pedido is not None and pedido.en_cuerpo)
+        if registro.tipo == FIN:
+            if pedido is not None:
+                self._terminar(pedido)
+            return
+        if registro.tipo == EVENTO:
+            self.esp._evento(registro.valor)  # Eventos sin id (CONNECT con "async")
+            return
+        if pedido is not None and registro.tipo == HTTP and registro.valor > 0:
+            pedido.en_cuerpo = True
+            self._dueno_cuerpo = pedido
+        if registro.texto:
+            self._guardar(pedido, registro)
+
+    def _terminar(self, pedido):
+        # El ESP32 atiende los comandos en orden: los pedidos anteriores todavía
+        # abiertos no van a recibir su fin (línea corrupta o respuesta sin fin),
+        # salvo un CONNECT o SCAN sin "async", que responden al terminar el intento o el escaneo
+        numero = int(pedido.id)
+        for anterior in [p for p in self._en_vuelo.values() if int(p.id) < numero and not _diferido(p)]:
+            anterior.perdido = True
+            self._cerrar(anterior)
+        self._cerrar(pedido)
+
+    def _cerrar(self, pedido):
+        pedido.terminado = True
+        del self._en_vuelo[pedido.id]
+        if self.al_terminar is not None:
+            self.al_terminar(pedido)
+
+    def _guardar(self, pedido, registro):
+        if pedido is None:
+            if self.al_huerfana is not None:
+                self.al_huerfana(registro)
+            self.huerfanas.append(registro)
+            if len(self.huerfanas) > MAX_HUERFANAS:
+                del self.huerfanas[:-MAX_HUERFANAS]
+        else:
+            pedido.registros.append(registro)
+
+
+def _diferido(pedido):
+    return pedido.comando.get("cmd") in ("CONNECT", "SCAN") and pedido.comando.get("async") is not True
@@ -0,0 +1,253 @@
+"""
+Publicación agrupada de endpoints del servidor embebido.
+
+Cada comando WebServer con un solo label cuesta un parseo JSON en el ESP32, una
+serialización y una ida y vuelta hasta su {"end": true}. PublicadorEndpoints
+junta las actualizaciones (de cada label vale la última) y cada 'periodo'
+segundos las envía en un solo comando, que el ESP32 aplica de forma atómica:
+
+    {"cmd": "WebServer", "batch": {"Temperatura": {...}, "Humedad": {...}}}
+
+Si no entran en una línea (largo "line" de CAPS) se reparten en varios
+comandos. Con un firmware que no informa "batch" en CAPS se envía un
+WebServer por label, como antes.
+
+Si el firmware informa "merge", el publicador recuerda lo último que el ESP32
+confirmó de cada label y después solo envía las claves que cambiaron, con
+"merge": true (las claves que desaparecen viajan como null). Si el ESP32 se
+reinició y ya no tiene el endpoint, se vuelve a enviar completo.
+
+    publicador = PublicadorEndpoints(esp, periodo=5)
+    while True:
+        publicador.actualizar("Temperatura", {"dato1": leer_temperatura()})
+        publicador.actualizar("Humedad", {"dato1": leer_humedad()})
+        publicador.tick()
+
+El ESP32 guarda los endpoints en una tabla indexada por hash cuya capacidad
+sale de su heap libre; con la tabla llena desaloja el menos usado ("lru") o el
+actualizado hace más tiempo ("ttl"). estado_endpoints() la consulta o la
+configura:
+
+    estado_endpoints(esp, politica="ttl", ttl=30)
+    # {"count": 2, "max": 705, "policy": "ttl", "ttl": 30, "hits": 14, ...}
+
+Con configurar_historial() el ESP32 guarda además las últimas N
+actualizaciones de un label, y un navegador puede pedir todas las que se
+perdió entre dos consultas con GET /Temperatura?since=<t> (o ?last=N).
+"""
+
+import json
+import time
+
+from .errores import ErrorESP32
+from .respuestas import ESTADO, JSON
+
+
+class PublicadorEndpoints:
+    def __init__(self, esp, periodo=1.0, timeout=2, limite=None):
+        """
+        esp: un ESP32UART ya conectado.
+        periodo: segundos mínimos entre dos envíos de tick().
+        limite: largo máximo de cada comando; por defecto el de CAPS ("line",
+        sin el '\\n') o el de una trama 'J' en modo tramas.
+        """
+        self.esp = esp
+        self.periodo = periodo
+        self.timeout = timeout
+        self.limite = limite
+        self._pendientes = {}
+        self._publicado = {}  # Último estado confirmado de cada label (para "merge")
+        self._ultimo = None
+        self.comandos = 0  # Comandos enviados en total
+
+    @property
+    def pendientes(self):
+        return len(self._pendientes)
+
+    def actualizar(self, label, datos):
+        """Anota 'datos' (dict) para http://<ip>/<label>; se envía en el próximo publicar()."""
+        self._pendientes[label] = datos
+
+    def tick(self):
+        """
+        Publica si hay actualizaciones y pasó 'periodo' desde el último envío.
+        Devuelve la cantidad de labels publicados (0 si no tocaba).
+        """
+        if not self._pendientes:
+            return 0
+        if self._ultimo is not None and time.monotonic() - self._ultimo < self.periodo:
+            return 0
+        return self.publicar()
+
+    def olvidar(self):
+        """Descarta el estado confirmado: el próximo envío de cada label va completo."""
+        self._publicado = {}
+
+    def publicar(self):
+        """
+        Envía ya todas las actualizaciones pendientes y devuelve cuántos labels
+        publicó (los que no cambiaron no se envían ni se cuentan). Si el ESP32
+        rechaza un comando lanza ErrorESP32 y los labels sin confirmar quedan
+        pendientes para el próximo intento.
+        """
+        try:
+            return self._publicar()
+        except _SinEndpoints:
+            # El ESP32 se reinició y perdió los endpoints: se envían completos
+            self.olvidar()
+            return self._publicar()
+
+    def _publicar(self):
+        self._ultimo = time.monotonic()
+        pendientes = self._pendientes
+        self._pendientes = {}
+        confirmados = 0
+        try:
+            capacidades = self.esp.capacidades()
+            if "batch" in capacidades:
+                completos = {}
+                cambios = {}
+                for label, datos in list(pendientes.items()):
+                    anterior = self._publicado.get(label) if "merge" in capacidades else None
+                    # En un merge null borra la clave: un null del usuario obliga a enviar el objeto completo
+                    if anterior is None or None in datos.values():
+                        completos[label] = datos
+                        continue
+                    diferencia = _diferencia(anterior, datos)
+                    if diferencia:
+                        cambios[label] = diferencia
+                    else:
+                        del pendientes[label]  # Sin cambios: no hace falta enviarlo
+                for lotes, combinar in ((self._lotes(completos), False), (self._lotes(cambios, True), True)):
+                    for lote in lotes:
+                        self._enviar(_comando(lote, combinar))
+                        for label in lote:
+                            self._publicado[label] = _copia(pendientes.pop(label))
+                        confirmados += len(lote)
+            else:
+                for label in list(pendientes):
+                    self._enviar({"cmd": "WebServer", "label": label, "data": pendientes[label]})
+                    self._publicado[label] = _copia(pendientes.pop(label))
+                    confirmados += 1
+        finally:
+            # Lo no confirmado vuelve a la cola, sin pisar valores más nuevos
+            for label, datos in pendientes.items():
+                self._pendientes.setdefault(label, datos)
+        return confirmados
+
+    def _limite(self):
+        if self.limite is not None:
+            return self.limite
+        if self.esp.tramas is not None:
+            return self.esp.tramas.max_datos
+        return self.esp.capacidades()["line"] - 1
+
+    def _lotes(self, pendientes, combinar=False):
+        # Reparte los labels en comandos que no superen el largo de línea
+        limite = self._limite()
+        lotes = []
+        lote = {}
+        for label, datos in pendientes.items():
+            lote[label] = datos
+            if len(json.dumps(_comando(lote, combinar)).encode()) <= limite:
+                continue
+            del lote[label]
+            if not lote:
+                raise ValueError("El endpoint /%s no entra en un comando de %d bytes" % (label, limite))
+            lotes.append(lote)
+            lote = {label: datos}
+            if len(json.dumps(_comando(lote, combinar)).encode()) > limite:
+                raise ValueError("El endpoint /%s no entra en un comando de %d bytes" % (label, limite))
+        if lote:
+            lotes.append(lote)
+        return lotes
+
+    def _enviar(self, comando):
+        self.esp.solicitar_comando(comando)
+        self.comandos += 1
+        textos = []
+        faltantes = None
+        for registro in self.esp.respuestas(self.timeout):
+            if registro.tipo == ESTADO:
+                textos.append(registro.texto)
+            elif registro.tipo == JSON and registro.valor.get("error") == "missing":
+                faltantes = registro.valor.get("labels", [])
+        if faltantes is not None:
+            raise _SinEndpoints(textos[-1] if textos else "No existen %s para merge" % faltantes, faltantes)
+        if not any("actualizado" in texto for texto in textos):
+            raise ErrorESP32(textos[-1] if textos else "Sin confirmación de WebServer")
+
+
+class _SinEndpoints(ErrorESP32):
+    # {"error": "missing"} de un merge: el ESP32 ya no tiene esos labels
+    def __init__(self, mensaje, labels):
+        super().__init__(mensaje)
+        self.labels = labels
+
+
+def _comando(lote, combinar):
+    comando = {"cmd": "WebServer", "batch": lote}
+    if combinar:
+        comando["merge"] = True
+    return comando
+
+
+def estado_endpoints(esp, politica=None, ttl=None, maximo=None, timeout=2):
+    """
+    Devuelve {"count", "max", "policy", "ttl", "hits", "misses", "evictions",
+    "heap"} de la tabla de endpoints del ESP32. 'politica' ("lru" o "ttl"),
+    'ttl' (segundos, 0: sin vencimiento) y 'maximo' (cantidad de endpoints,
+    0: según el heap libre) la configuran antes de informar.
+    """
+    comando = {"cmd": "ENDPOINTS"}
+    if politica is not None:
+        comando["policy"] = politica
+    if ttl is not None:
+        comando["ttl"] = ttl
+    if maximo is not None:
+        comando["max"] = maximo
+    esp.solicitar_comando(comando)
+    estado = None
+    textos = []
+    for registro in esp.respuestas(timeout):
+        if registro.tipo == JSON and "count" in registro.valor:
+            estado = registro.valor
+        elif registro.tipo == ESTADO:
+            textos.append(registro.texto)
+    if estado is None:
+        raise ErrorESP32(textos[-1] if textos else "Sin respuesta de ENDPOINTS")
+    return estado
+
+
+def configurar_historial(esp, label, muestras, timeout=2):
+    """
+    Hace que el ESP32 guarde las últimas 'muestras' actualizaciones de
+    'label' (0 borra el historial). Lanza ErrorESP32 si no lo acepta.
+    """
+    esp.solicitar_comando({"cmd": "HISTORY", "label": label, "size": muestras})
+    textos = [registro.texto for registro in esp.respuestas(timeout) if registro.tipo == ESTADO]
+    if not any("Historial de /" in texto for texto in textos):
+        raise ErrorESP32(textos[-1] if textos else "Sin respuesta de HISTORY")
+
+
+def _diferencia(anterior, nuevo):
+    # Claves de 'nuevo' que cambiaron respecto de 'anterior' y None para las que ya no están
+    cambios = {}
+    for clave, valor in nuevo.items():
+        previo = anterior.get(clave, _FALTA)
+        # type(): True == 1 en Python, pero en JSON son valores distintos
+        if previo is _FALTA or type(previo) is not type(valor) or previo != valor:
+            cambios[clave] = valor
+    for clave in anterior:
+        if clave not in nuevo:
+            cambios[clave] = None
+    return cambios
+
+
+_FALTA = object()
+
+
+def _copia(datos):
+    # Copia profunda de lo confirmado: si el usuario modifica un dict o lista anidado en el lugar,
+    # _diferencia tiene que ver el cambio
+    return json.loads(json.dumps(datos))
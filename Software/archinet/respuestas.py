@@ -0,0 +1,95 @@
+"""
+Registros tipados de las respuestas del ESP32.
+
+Cada línea que llega por la UART se clasifica mirando su primer byte, así las
+líneas que no son JSON no pagan un json.loads fallido:
+
+- '{'  -> JSON (o el marcador de fin {"end": true})
+- '['  -> línea de estado "[ESP32] ...", o código HTTP si es "... -> Código: N"
+- '!'  -> evento espontáneo "!{...}", fuera de las respuestas (CONNECT con "async")
+- otro -> texto libre (por ejemplo "SSID: ... | RSSI: ...")
+
+Después de un código HTTP correcto, las líneas hasta el fin son el cuerpo de la
+respuesta y se entregan como CUERPO, en fragmentos si no entran en el buffer.
+"""
+
+import json
+
+JSON = "json"
+ESTADO = "estado"
+HTTP = "http"
+CUERPO = "cuerpo"
+TEXTO = "texto"
+EVENTO = "evento"
+FIN = "fin"
+
+_LLAVE = 0x7B  # '{'
+_CORCHETE = 0x5B  # '['
+_EXCLAMACION = 0x21  # '!'
+_MARCA_CODIGO = "-> Código: "
+_INICIO_FIN = b'{"end"'
+
+
+class Registro:
+    """
+    Una línea clasificada de la respuesta.
+
+    tipo: JSON, ESTADO, HTTP, CUERPO, TEXTO, EVENTO o FIN.
+    valor: dict para JSON y EVENTO, int (código) para HTTP, str para el resto.
+    texto: la línea tal como llegó, para mostrarla.
+    final: False si es un fragmento de CUERPO y la línea continúa.
+    """
+
+    __slots__ = ("tipo", "valor", "texto", "final")
+
+    def __init__(self, tipo, valor, texto, final=True):
+        self.tipo = tipo
+        self.valor = valor
+        self.texto = texto
+        self.final = final
+
+    def __repr__(self):
+        return "Registro(%s, %r)" % (self.tipo, self.valor)
+
+
+def decodificar(linea):
+    try:
+        return str(linea, "utf-8")
+    except Exception:
+        return "<error decoding>"
+
+
+def clasificar(linea, en_cuerpo=False):
+    """Clasifica una línea completa (memoryview o bytes) y devuelve un Registro."""
+    primero = linea[0] if len(linea) else 0
+    texto = decodificar(linea).strip()
+    if primero == _LLAVE and (not en_cuerpo or bytes(linea[:6]) == _INICIO_FIN):
+        try:
+            obj = json.loads(texto)
+        except ValueError:
+            obj = None
+        if isinstance(obj, dict) and obj.get("end") is True:
+            return Registro(FIN, obj, texto)
+        if en_cuerpo:
+            return Registro(CUERPO, texto, texto)
+        if obj is not None:
+            return Registro(JSON, obj, texto)
+        return Registro(TEXTO, texto, texto)
+    if en_cuerpo:
+        return Registro(CUERPO, texto, texto)
+    if primero == _CORCHETE:
+        pos = texto.find(_MARCA_CODIGO)
+        if pos >= 0:
+            try:
+                return Registro(HTTP, int(texto[pos + len(_MARCA_CODIGO):]), texto)
+            except ValueError:
+                pass
+        return Registro(ESTADO, texto, texto)
+    if primero == _EXCLAMACION:
+        try:
+            obj = json.loads(texto[1:])
+        except ValueError:
+            obj = None
+        if isinstance(obj, dict):
+            return Registro(EVENTO, obj, texto)
+    return Registro(TEXTO, texto, texto)
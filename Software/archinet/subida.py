@@ -0,0 +1,265 @@
+"""
+Subida de HTML al servidor embebido con ventana deslizante.
+
+En lugar de enviar un fragmento HTML y esperar su {"end": true} antes del
+siguiente, se envían hasta 'ventana' fragmentos sin confirmar (con "id", ver
+archinet.pipeline) y un número de transferencia "xfer". El ESP32 acepta los
+fragmentos en cualquier orden y cada respuesta confirma de forma acumulada:
+
+    {"ack": 12, "high": 15, "missing": [12, 14]}
+
+'ack' fragmentos contiguos desde 0 ya llegaron y, hasta 'high', solo faltan
+los de 'missing'. Al terminar una ronda se reenvían únicamente los que faltan.
+
+Antes de subir se compara el CRC-32 de la página con el que informa el ESP32
+(comando HASH): si es la misma, no se envía nada.
+
+Los fragmentos se arman por largo en bytes del comando ya serializado y no por
+caracteres: comillas, barras y UTF-8 crecen al pasar por json.dumps, y una
+línea de más de BUF_SIZE - 1 bytes el firmware la trunca. El límite real se
+consulta al ESP32 con CAPS (ESP32UART.capacidades).
+
+Con comprimido=True el contenido son los bytes de un .gz ya armado (en la PC,
+o con comprimir() en CPython): viaja en base64 con "enc": "gzip", el ESP32 lo
+guarda tal cual y lo sirve con Content-Encoding: gzip, descomprimiéndolo al
+vuelo solo para los clientes que no aceptan gzip.
+
+El ESP32 guarda cada archivo en su flash (LittleFS) bajo una ruta ("path",
+"/" por defecto) con su tipo, y lo sigue sirviendo después de un reinicio:
+basta con subirlo una vez. Los archivos binarios (bytes) viajan en base64.
+
+    from archinet.subida import subir_archivo, subir_html
+    subir_html(esp, html)
+    with open("/index.html.gz", "rb") as f:
+        subir_html(esp, f.read(), comprimido=True)
+    with open("/logo.png", "rb") as f:
+        subir_archivo(esp, "/logo.png", f.read())
+"""
+
+import binascii
+import json
+import random
+
+from .crc import crc32
+from .errores import ErrorESP32, TiempoAgotado
+from .pipeline import ClientePipeline
+from .respuestas import JSON
+
+
+# Cota del largo de "id", "xfer", "index" y "total" al medir la plantilla del comando
+_NUMERO_MAXIMO = 99999999
+
+# Tipo de contenido por extensión para subir_archivo
+TIPOS = {
+    "html": "text/html",
+    "htm": "text/html",
+    "css": "text/css",
+    "js": "application/javascript",
+    "json": "application/json",
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "ico": "image/x-icon",
+    "txt": "text/plain",
+}
+
+
+def fragmentar(texto, presupuesto):
+    """
+    Parte 'texto' en trozos cuyo contenido serializado con json.dumps ocupe
+    como máximo 'presupuesto' bytes cada uno.
+    """
+    costos = {}
+    partes = []
+    inicio = 0
+    usado = 0
+    for i, caracter in enumerate(texto):
+        costo = costos.get(caracter)
+        if costo is None:
+            # Lo que ocupa el carácter dentro de un string JSON, sin las comillas
+            costo = costos[caracter] = len(json.dumps(caracter).encode()) - 2
+        if usado + costo > presupuesto and i > inicio:
+            partes.append(texto[inicio:i])
+            inicio = i
+            usado = 0
+        usado += costo
+    if inicio < len(texto):
+        partes.append(texto[inicio:])
+    return partes
+
+
+def fragmentar_base64(datos, presupuesto):
+    """
+    Parte 'datos' (bytes) en trozos codificados en base64 de como máximo
+    'presupuesto' caracteres; cada trozo se decodifica por separado.
+    """
+    paso = (presupuesto // 4) * 3
+    if paso <= 0:
+        raise ValueError("Presupuesto de %d bytes demasiado chico para base64" % presupuesto)
+    return [binascii.b2a_base64(datos[i:i + paso]).decode().strip()
+            for i in range(0, len(datos), paso)]
+
+
+def comprimir(html):
+    """
+    Devuelve 'html' (str o bytes) comprimido en gzip, reproducible (mtime=0).
+    Solo en CPython: CircuitPython no trae el módulo gzip.
+    """
+    import gzip
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return gzip.compress(html, mtime=0)
+
+
+def presupuesto_html(esp, limite=None, campos=None):
+    """
+    Bytes disponibles para "content" en un comando HTML con ventana. 'limite'
+    es el largo máximo del comando; por defecto el de CAPS ("line", con su
+    '\n') o el de una trama 'J' en modo tramas. 'campos' son los que se
+    agregan a cada fragmento ("enc", "path", "type").
+    """
+    if limite is None:
+        if esp.tramas is not None:
+            limite = esp.tramas.max_datos
+        else:
+            limite = esp.capacidades()["line"] - 1
+    plantilla = {"cmd": "HTML", "xfer": _NUMERO_MAXIMO, "index": _NUMERO_MAXIMO,
+                 "total": _NUMERO_MAXIMO, "content": "", "id": _NUMERO_MAXIMO}
+    if campos:
+        plantilla.update(campos)
+    presupuesto = limite - len(json.dumps(plantilla).encode())
+    if presupuesto <= 0:
+        raise ValueError("Límite de %d bytes demasiado chico para un comando HTML" % limite)
+    return presupuesto
+
+
+def hash_remoto(esp, ruta="/", timeout=2):
+    """
+    Devuelve {"path", "type", "crc32", "len", "enc"} del recurso 'ruta' en el ESP32, o None
+    si el firmware no informa hashes (CAPS sin "hash") o no lo tiene.
+    """
+    if "hash" not in esp.capacidades():
+        return None
+    esp.solicitar_comando({"cmd": "HASH", "path": ruta})
+    resultado = None
+    try:
+        for registro in esp.respuestas(timeout):
+            if registro.tipo == JSON and registro.valor.get("path") == ruta:
+                resultado = registro.valor
+    except TiempoAgotado:
+        return None
+    return resultado
+
+
+def sin_cambios(esp, contenido, ruta="/", comprimido=False, tipo=None):
+    """
+    True si el ESP32 ya tiene 'contenido' (str o bytes) en 'ruta', guardado
+    con la misma codificación (y el mismo tipo, si se indica 'tipo').
+    """
+    if isinstance(contenido, str):
+        contenido = contenido.encode("utf-8")
+    remoto = hash_remoto(esp, ruta)
+    return (remoto is not None and remoto.get("len") == len(contenido)
+            and remoto.get("crc32") == "%08x" % crc32(contenido)
+            and remoto.get("enc", "identity") == ("gzip" if comprimido else "identity")
+            and (tipo is None or remoto.get("type", tipo) == tipo))
+
+
+def subir_html(esp, html, ventana=None, timeout=10, rondas=4, limite=None, forzar=False,
+               comprimido=False, ruta="/", tipo=None):
+    """
+    Sube 'html' (str) como página principal del ESP32, o como el archivo de
+    'ruta' con tipo de contenido 'tipo' ("text/html" por defecto). Devuelve
+    True si el ESP32 confirmó todos los fragmentos dentro de 'rondas'
+    intentos, o si ya tenía el mismo contenido (salvo con forzar=True).
+    'html' puede ser bytes; con comprimido=True son los bytes gzip.
+    'limite' fuerza el largo máximo de cada comando (ver presupuesto_html).
+    Sin 'ventana' se envían tantos fragmentos como entran en el buffer de
+    recepción del ESP32 ("rx" de CAPS).
+    """
+    if not forzar and html and sin_cambios(esp, html, ruta, comprimido, tipo or "text/html"):
+        return True
+    capacidades = esp.capacidades()
+    campos = {}
+    if comprimido:
+        if bytes(html[:2]) != b"\x1f\x8b":
+            raise ValueError("El contenido no es gzip")
+        campos["enc"] = "gzip"
+    elif not isinstance(html, str):
+        campos["enc"] = "base64"
+    if ruta != "/":
+        campos["path"] = ruta
+    if tipo is not None and tipo != "text/html":
+        campos["type"] = tipo
+    presupuesto = presupuesto_html(esp, limite, campos)
+    if "enc" in campos:
+        partes = fragmentar_base64(html, presupuesto)
+    else:
+        partes = fragmentar(html, presupuesto)
+    if not partes:
+        raise ValueError("HTML vacío")
+    total = len(partes)
+    maximo = capacidades.get("html_parts")
+    if maximo is not None and total > maximo:
+        raise ValueError("HTML de %d fragmentos (el ESP32 admite %d)" % (total, maximo))
+    if ventana is None:
+        ventana = max(1, capacidades.get("rx", 256) // (presupuesto + 100))
+    xfer = random.getrandbits(24)
+    cliente = ClientePipeline(esp, ventana)
+
+    base = {"cmd": "HTML", "xfer": xfer, "total": total}
+    base.update(campos)
+
+    pendientes = list(range(total))
+    for _ in range(rondas):
+        pedidos = []
+        for i in pendientes:
+            comando = dict(base)
+            comando["index"] = i
+            comando["content"] = partes[i]
+            pedidos.append(cliente.enviar(comando, timeout))
+        estado = None
+        for pedido in pedidos:
+            try:
+                registros = cliente.esperar(pedido, timeout)
+            except ErrorESP32:
+                continue  # Fragmento perdido: lo indica el próximo 'missing'
+            for registro in registros:
+                if registro.tipo == JSON and "ack" in registro.valor:
+                    estado = registro.valor
+
+        if estado is None:
+            continue  # Ninguna confirmación: se reenvía la ronda completa
+        if estado["ack"] >= total:
+            return True
+        faltan = estado.get("missing", [])
+        alto = estado.get("high", -1)
+        pendientes = [i for i in range(estado["ack"], total) if i in faltan or i > alto]
+    return False
+
+
+def subir_archivo(esp, ruta, datos, tipo=None, **opciones):
+    """
+    Sube 'datos' (str o bytes) como el archivo 'ruta' del servidor embebido
+    (por ejemplo "/app.js" o "/logo.png"). Sin 'tipo' se deduce de la
+    extensión (TIPOS). Acepta las mismas opciones que subir_html.
+    """
+    if tipo is None:
+        extension = ruta.rsplit(".", 1)[-1].lower() if "." in ruta else ""
+        tipo = TIPOS.get(extension, "application/octet-stream")
+    return subir_html(esp, datos, ruta=ruta, tipo=tipo, **opciones)
+
+
+def archivos(esp, timeout=2):
+    """Lista de {"path", "type", "crc32", "len", "enc"} guardados en la flash del ESP32."""
+    esp.solicitar_comando({"cmd": "ASSETS"})
+    return [registro.valor for registro in esp.respuestas(timeout)
+            if registro.tipo == JSON and "path" in registro.valor]
+
+
+def borrar_archivo(esp, ruta, timeout=2):
+    """Borra 'ruta' de la flash del ESP32; False si no existía."""
+    esp.solicitar_comando({"cmd": "ASSETS", "delete": ruta})
+    textos = [registro.texto for registro in esp.respuestas(timeout)]
+    return any("Archivo borrado" in texto for texto in textos)
@@ -0,0 +1,110 @@
+"""
+Tramas binarias del protocolo (modo FRAMING binary del firmware).
+
+    0xA5 | tipo | largo (2 bytes LE) | datos | CRC16 (2 bytes LE)
+
+El CRC16 (archinet.crc) cubre tipo, largo y datos. Los comandos siguen siendo
+JSON (tramas 'J') y las respuestas las mismas líneas del modo texto (tramas
+'T'), pero los cuerpos HTTP y los archivos viajan como bytes crudos en tramas
+'D': sin reemplazar saltos de línea y sin escapar. Una trama corrupta se
+detecta por su CRC en lugar de terminar en un JSON mal parseado.
+"""
+
+from .crc import crc16
+
+INICIO = 0xA5
+TRAMA_JSON = 0x4A  # 'J' comando (Archi -> ESP32)
+TRAMA_TEXTO = 0x54  # 'T' línea de respuesta (ESP32 -> Archi)
+TRAMA_DATOS = 0x44  # 'D' bytes crudos (ambos sentidos)
+TRAMA_NAK = 0x4E  # 'N' el ESP32 recibió una trama corrupta
+
+MAX_DATOS = 4096  # FRAME_MAX_PAYLOAD del firmware
+_CABECERA = 4
+_COLA = 2
+
+
+def codificar(tipo, datos=b""):
+    """Devuelve la trama completa (bytes) con 'datos' de hasta MAX_DATOS bytes."""
+    largo = len(datos)
+    if largo > MAX_DATOS:
+        raise ValueError("Trama de %d bytes (máximo %d)" % (largo, MAX_DATOS))
+    cabecera = bytes((INICIO, tipo, largo & 0xFF, largo >> 8))
+    crc = crc16(datos, crc16(cabecera[1:]))
+    return cabecera + bytes(datos) + bytes((crc & 0xFF, crc >> 8))
+
+
+class LectorTramas:
+    """
+    Separa tramas de la UART sobre un buffer preasignado, como LectorLineas.
+
+    Las tramas con CRC inválido (o largo imposible) se descartan, se cuentan en
+    'corruptas' y la lectura se resincroniza en el próximo byte 0xA5.
+    """
+
+    def __init__(self, uart, max_datos=MAX_DATOS):
+        self.uart = uart
+        self._buf = bytearray(max_datos + _CABECERA + _COLA)
+        self._mv = memoryview(self._buf)
+        self.max_datos = max_datos
+        self._inicio = 0
+        self._fin = 0
+        self.corruptas = 0
+
+    def llenar(self):
+        """Lee lo disponible en la UART (o espera un byte hasta su timeout)."""
+        if self._fin == len(self._buf) and self._inicio > 0:
+            n = self._fin - self._inicio
+            self._mv[0:n] = self._mv[self._inicio:self._fin]
+            self._inicio = 0
+            self._fin = n
+        libre = len(self._buf) - self._fin
+        if libre == 0:
+            return 0
+        disponibles = self.uart.in_waiting
+        if disponibles <= 0:
+            disponibles = 1
+        n = self.uart.readinto(self._mv[self._fin:self._fin + min(disponibles, libre)])
+        if not n:
+            return 0
+        self._fin += n
+        return n
+
+    def siguiente(self):
+        """
+        Devuelve (tipo, datos) de la próxima trama válida, con 'datos' como
+        memoryview del buffer (válido hasta el próximo llenar()), o None.
+        """
+        buf = self._buf
+        while True:
+            inicio = buf.find(b"\xa5", self._inicio, self._fin)
+            if inicio < 0:
+                self._inicio = self._fin = 0
+                return None
+            self._inicio = inicio
+            if self._fin - inicio < _CABECERA:
+                return None
+            largo = buf[inicio + 2] | (buf[inicio + 3] << 8)
+            if largo > self.max_datos:
+                self._descartar_inicio()
+                continue
+            total = _CABECERA + largo + _COLA
+            if self._fin - inicio < total:
+                return None
+            fin_datos = inicio + _CABECERA + largo
+            crc = buf[fin_datos] | (buf[fin_datos + 1] << 8)
+            if crc16(self._mv[inicio + 1:fin_datos]) != crc:
+                self._descartar_inicio()
+                continue
+            self._inicio = inicio + total
+            return buf[inicio + 1], self._mv[inicio + _CABECERA:fin_datos]
+
+    def _descartar_inicio(self):
+        # El 0xA5 no inicia una trama válida: se busca el siguiente
+        self.corruptas += 1
+        self._inicio += 1
+
+    def pendiente(self):
+        return self._mv[self._inicio:self._fin]
+
+    def descartar(self):
+        self._inicio = self._fin = 0
@@ -0,0 +1,177 @@
+"""
+Transportes alternativos a busio.UART para usar ESP32UART fuera de la placa.
+
+Todos exponen la misma interfaz mínima que busio.UART:
+read(nbytes), readinto(buf), write(buf), in_waiting, baudrate,
+reset_input_buffer() y deinit(). Solo funcionan en CPython (Linux).
+"""
+
+import os
+import select
+
+
+class _TransporteFD:
+    """Base común para transportes basados en un descriptor de archivo."""
+
+    def __init__(self, timeout=0.1):
+        self.timeout = timeout
+        self.bytes_tx = 0
+        self.bytes_rx = 0
+
+    def fileno(self):
+        raise NotImplementedError
+
+    def _leer_crudo(self, nbytes):
+        raise NotImplementedError
+
+    def _escribir_crudo(self, datos):
+        raise NotImplementedError
+
+    def _esperar_datos(self, timeout):
+        listos, _, _ = select.select([self.fileno()], [], [], timeout)
+        return bool(listos)
+
+    @property
+    def in_waiting(self):
+        import fcntl
+        import termios
+        import struct
+
+        try:
+            crudo = fcntl.ioctl(self.fileno(), termios.FIONREAD, b"\0\0\0\0")
+        except OSError:
+            return 0
+        return struct.unpack("i", crudo)[0]
+
+    def read(self, nbytes=None):
+        # Igual que busio.UART: espera hasta 'timeout' por el primer byte
+        if not self._esperar_datos(self.timeout):
+            return None
+        disponibles = self.in_waiting or 1
+        if nbytes is None or nbytes > disponibles:
+            nbytes = disponibles
+        datos = self._leer_crudo(nbytes)
+        if not datos:
+            return None
+        self.bytes_rx += len(datos)
+        return datos
+
+    def readinto(self, buf):
+        datos = self.read(len(buf))
+        if not datos:
+            return None
+        n = len(datos)
+        buf[:n] = datos
+        return n
+
+    def write(self, datos):
+        enviados = 0
+        vista = memoryview(datos)
+        while enviados < len(vista):
+            enviados += self._escribir_crudo(vista[enviados:])
+        self.bytes_tx += enviados
+        return enviados
+
+    def reset_input_buffer(self):
+        while self._esperar_datos(0):
+            if not self._leer_crudo(4096):
+                break
+
+
+class TransporteSerial(_TransporteFD):
+    """
+    Puerto serie o pty de Linux (por ejemplo /dev/ttyUSB0 o el esclavo que
+    devuelve archinet.emulador.servir_pty). Configura el modo raw y, si el
+    sistema lo soporta, la velocidad indicada.
+    """
+
+    def __init__(self, ruta, baudrate=115200, timeout=0.1):
+        super().__init__(timeout)
+        self.ruta = ruta
+        self._fd = os.open(ruta, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        self._baudrate = baudrate
+        self._configurar()
+
+    def _configurar(self):
+        import termios
+        import tty
+
+        if not os.isatty(self._fd):
+            return
+        tty.setraw(self._fd)
+        velocidad = getattr(termios, "B%d" % self._baudrate, None)
+        if velocidad is None:
+            return
+        atributos = termios.tcgetattr(self._fd)
+        atributos[4] = velocidad  # ispeed
+        atributos[5] = velocidad  # ospeed
+        termios.tcsetattr(self._fd, termios.TCSANOW, atributos)
+
+    @property
+    def baudrate(self):
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, valor):
+        self._baudrate = valor
+        self._configurar()
+
+    def fileno(self):
+        return self._fd
+
+    def _leer_crudo(self, nbytes):
+        try:
+            return os.read(self._fd, nbytes)
+        except BlockingIOError:
+            return b""
+
+    def _escribir_crudo(self, datos):
+        while True:
+            try:
+                return os.write(self._fd, datos)
+            except BlockingIOError:
+                select.select([], [self._fd], [], self.timeout)
+
+    def deinit(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class TransporteSocket(_TransporteFD):
+    """
+    Socket TCP o Unix conectado a un puente UART (por ejemplo ser2net o un
+    emulador remoto). Acepta una dirección (host, puerto) o un socket ya creado.
+    """
+
+    def __init__(self, destino, baudrate=115200, timeout=0.1):
+        import socket
+
+        super().__init__(timeout)
+        if isinstance(destino, socket.socket):
+            self._sock = destino
+        else:
+            self._sock = socket.create_connection(destino)
+        self._sock.setblocking(False)
+        # Sin significado físico, se guarda para que los clientes lo consulten
+        self.baudrate = baudrate
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def _leer_crudo(self, nbytes):
+        try:
+            return self._sock.recv(nbytes)
+        except BlockingIOError:
+            return b""
+
+    def _escribir_crudo(self, datos):
+        while True:
+            try:
+                return self._sock.send(datos)
+            except BlockingIOError:
+                select.select([], [self._sock], [], self.timeout)
+
+    def deinit(self):
+        self._sock.close()
+
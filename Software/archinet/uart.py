@@ -0,0 +1,396 @@
+import time
+import json
+import random
+
+from .crc import crc16
+from .errores import ErrorESP32, TiempoAgotado, TramaCorrupta
+from .lineas import LectorLineas
+from .respuestas import CUERPO, ESTADO, EVENTO, FIN, HTTP, JSON, Registro, clasificar, decodificar
+from .tramas import TRAMA_DATOS, TRAMA_JSON, TRAMA_NAK, LectorTramas, codificar
+
+# Segundos que el firmware espera el PROBE antes de volver a la velocidad anterior
+BAUD_PROBE_TIMEOUT = 2.0
+
+# Capacidades supuestas si el firmware no conoce CAPS (versiones anteriores)
+CAPACIDADES_BASE = {"line": 1024}
+
+
+# Clase que gestiona la comunicación UART con el ESP32
+class ESP32UART:
+    def __init__(self, tx_pin=None, rx_pin=None, ready_pin=None, baudrate=115200, timeout=0.1, uart=None):
+        """
+        Si no se indica 'uart', se crea un busio.UART con los pines TX y RX.
+        Cualquier objeto con la interfaz de busio.UART (read, readinto, write,
+        in_waiting) sirve como transporte: TransporteSerial, TransporteSocket
+        o el TransporteEmulado de archinet.emulador.
+        """
+        if uart is None:
+            import busio
+            uart = busio.UART(tx=tx_pin, rx=rx_pin, baudrate=baudrate, timeout=timeout)
+        self.uart = uart
+
+        # El pin 'ready_pin' indica cuándo el ESP32 está listo para comunicarse.
+        # Puede ser un pin de 'board' o un objeto que ya exponga '.value'.
+        if ready_pin is None or hasattr(ready_pin, "value"):
+            self.ready_pin = ready_pin
+        else:
+            import digitalio
+            self.ready_pin = digitalio.DigitalInOut(ready_pin)
+            self.ready_pin.direction = digitalio.Direction.INPUT
+            self.ready_pin.pull = digitalio.Pull.DOWN
+
+        self.lector = LectorLineas(self.uart)
+        # Modo de tramas binarias (ver activar_tramas); None en modo texto
+        self.tramas = None
+        self.max_reintentos = 2
+        self.retransmisiones = 0
+        self._ultima_trama = None
+        self._comando_raw = False
+        self._capacidades = None
+        # Último evento "wifi" del firmware (CONNECT con "async" y reconexiones); ver esperar_wifi
+        self.wifi = None
+        # Función opcional al_evento(evento), llamada con cada evento "!{...}" recibido
+        self.al_evento = None
+
+    def esperar_ready(self, timeout=5):
+        """
+        Espera hasta que el pin 'ready_pin' se ponga en alto, indicando que el ESP32 está listo.
+        Si no se activa dentro del timeout, devuelve False. Sin pin ready devuelve True.
+        """
+        if self.ready_pin is None:
+            return True
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < timeout:
+            if self.ready_pin.value:
+                return True  # ESP32 listo
+            time.sleep(0.01)
+        return False
+
+    def solicitar_comando(self, comando_dict):
+        """
+        Envía un comando JSON al ESP32, serializado y terminado con salto de línea.
+        """
+        if self.tramas is not None:
+            self._ultima_trama = codificar(TRAMA_JSON, json.dumps(comando_dict).encode())
+            # Un comando "raw" no se reenvía solo: su cuerpo en tramas 'D' ya se consumió
+            self._comando_raw = comando_dict.get("raw") is True
+            self.uart.write(self._ultima_trama)
+            return
+        mensaje = json.dumps(comando_dict) + "\n"  # Delimitador '\n' para lectura por línea
+        self.uart.write(mensaje.encode())  # Envía bytes por UART
+
+    def enviar_datos(self, datos):
+        """
+        Envía bytes crudos en tramas 'D' (solo en modo tramas). El ESP32 los
+        acumula para el próximo comando con "raw": true (POST o HTML).
+        """
+        if self.tramas is None:
+            raise ErrorESP32("enviar_datos requiere el modo de tramas (activar_tramas)")
+        maximo = self.tramas.max_datos
+        for inicio in range(0, len(datos), maximo):
+            self.uart.write(codificar(TRAMA_DATOS, datos[inicio:inicio + maximo]))
+
+    def respuestas(self, timeout=5):
+        """
+        Generador de la respuesta en curso: entrega un Registro por línea a
+        medida que llega (ver archinet.respuestas) y termina al recibir
+        {"end": true}. El cuerpo de un GET/POST se entrega en fragmentos
+        CUERPO, sin juntarlo en memoria. Lanza TiempoAgotado si el fin no
+        llega dentro del timeout.
+        """
+        if self.tramas is not None:
+            yield from self._respuestas_tramas(timeout)
+            return
+        lector = self.lector
+        en_cuerpo = False
+        continuacion = False
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < timeout:
+            linea = lector.siguiente()
+            if linea is None:
+                lector.llenar()
+                continue
+            if lector.fragmento or continuacion:
+                # Línea más larga que el buffer: siempre es cuerpo
+                texto = decodificar(linea)
+                continuacion = lector.fragmento
+                yield Registro(CUERPO, texto, texto, final=not continuacion)
+                continue
+
+            registro = clasificar(linea, en_cuerpo)
+            if registro.tipo == FIN:
+                return
+            if registro.tipo == EVENTO:
+                self._evento(registro.valor)
+                continue
+            if registro.tipo == HTTP and registro.valor > 0:
+                en_cuerpo = True
+            if registro.texto:
+                yield registro
+
+        parcial = decodificar(lector.pendiente()).strip()
+        lector.descartar()
+        raise TiempoAgotado("Sin respuesta completa del ESP32 en %s s" % timeout, parcial)
+
+    def _respuestas_tramas(self, timeout):
+        # Igual que respuestas() pero con tramas: 'T' son líneas y 'D' cuerpo crudo
+        lector = self.tramas
+        corruptas = lector.corruptas
+        reintentos = 0
+        en_cuerpo = False
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < timeout:
+            trama = lector.siguiente()
+            if trama is None:
+                lector.llenar()
+                continue
+            tipo, datos = trama
+            if tipo == TRAMA_DATOS:
+                yield Registro(CUERPO, bytes(datos), decodificar(datos), final=False)
+                continue
+            if tipo == TRAMA_NAK:
+                if self._comando_raw:
+                    # La trama corrupta pudo ser una 'D' (el ESP32 responde al comando con un error)
+                    # o la 'J' (no responde): reenviar solo la 'J' repetiría el comando
+                    self._sincronizar(max(0, timeout - (time.monotonic() - inicio)))
+                    raise TramaCorrupta("Trama corrupta en un comando \"raw\": hay que volver a enviar "
+                                        "los datos y el comando")
+                # El comando llegó corrupto al ESP32 y no tendrá respuesta: se reenvía
+                if self._ultima_trama is None or reintentos >= self.max_reintentos:
+                    raise TramaCorrupta("El ESP32 recibió el comando con CRC inválido")
+                reintentos += 1
+                self.retransmisiones += 1
+                self.uart.write(self._ultima_trama)
+                continue
+
+            registro = clasificar(datos, en_cuerpo)
+            if registro.tipo == FIN:
+                if lector.corruptas != corruptas:
+                    raise TramaCorrupta("%d trama(s) de la respuesta llegaron con CRC inválido"
+                                        % (lector.corruptas - corruptas))
+                return
+            if registro.tipo == EVENTO:
+                self._evento(registro.valor)
+                continue
+            if registro.tipo == HTTP and registro.valor > 0:
+                en_cuerpo = True
+            if registro.texto:
+                yield registro
+
+        parcial = decodificar(bytes(lector.pendiente())).strip()
+        lector.descartar()
+        raise TiempoAgotado("Sin respuesta completa del ESP32 en %s s" % timeout, parcial)
+
+    def _sincronizar(self, timeout):
+        # Envía un PING y descarta todo hasta su fin, incluida la respuesta al comando "raw" si la hubo
+        self._comando_raw = False
+        self._ultima_trama = None
+        self.uart.write(codificar(TRAMA_JSON, b'{"cmd": "PING"}'))
+        lector = self.tramas
+        ping = False
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < timeout:
+            trama = lector.siguiente()
+            if trama is None:
+                lector.llenar()
+                continue
+            tipo, datos = trama
+            if tipo in (TRAMA_DATOS, TRAMA_NAK):
+                continue
+            registro = clasificar(datos)
+            if registro.tipo == EVENTO:
+                self._evento(registro.valor)
+            elif registro.tipo == ESTADO and "PING recibido" in registro.valor:
+                ping = True
+            elif registro.tipo == FIN and ping:
+                return
+        lector.descartar()
+
+    def _evento(self, evento):
+        if evento.get("event") == "wifi":
+            self.wifi = evento
+        if self.al_evento is not None:
+            self.al_evento(evento)
+
+    def atender_eventos(self, timeout=0):
+        """
+        Procesa los eventos "!{...}" que llegaron entre respuestas, esperando
+        hasta 'timeout' segundos si todavía no hay ninguno, y devuelve cuántos
+        hubo. Las demás líneas sueltas se descartan: llamar solo sin un
+        comando esperando respuesta.
+        """
+        cantidad = 0
+        inicio = time.monotonic()
+        while True:
+            lector = self.tramas if self.tramas is not None else self.lector
+            elemento = lector.siguiente()
+            if elemento is None:
+                lector.llenar()
+                elemento = lector.siguiente()
+            while elemento is not None:
+                if self.tramas is not None:
+                    tipo, linea = elemento
+                    registro = clasificar(linea) if tipo not in (TRAMA_DATOS, TRAMA_NAK) else None
+                else:
+                    registro = None if lector.fragmento else clasificar(elemento)
+                if registro is not None and registro.tipo == EVENTO:
+                    self._evento(registro.valor)
+                    cantidad += 1
+                elemento = lector.siguiente()
+            if cantidad or time.monotonic() - inicio >= timeout:
+                return cantidad
+
+    def esperar_wifi(self, timeout=15):
+        """
+        Espera, atendiendo eventos, a que el firmware informe la conexión
+        WiFi pedida con {"cmd": "CONNECT", ..., "async": true} (o la de una
+        reconexión automática) y devuelve la IP. Lanza ErrorESP32 si el
+        intento falla y TiempoAgotado si no conecta dentro de 'timeout'.
+        """
+        inicio = time.monotonic()
+        while True:
+            estado = self.wifi.get("state") if self.wifi else None
+            if estado == "connected":
+                return self.wifi.get("ip")
+            if estado == "failed":
+                raise ErrorESP32("No se pudo conectar a %s" % self.wifi.get("ssid"))
+            restante = timeout - (time.monotonic() - inicio)
+            if restante <= 0:
+                raise TiempoAgotado("Sin conexión WiFi en %s s (estado: %s)" % (timeout, estado))
+            self.atender_eventos(restante)
+
+    def activar_tramas(self, timeout=2):
+        """
+        Pasa al modo de tramas binarias con CRC16 (ver archinet.tramas).
+        Devuelve True si el ESP32 lo aceptó.
+        """
+        return self._cambiar_tramas("binary", timeout)
+
+    def desactivar_tramas(self, timeout=2):
+        """Vuelve al modo de líneas JSON."""
+        return self._cambiar_tramas("text", timeout)
+
+    def _cambiar_tramas(self, modo, timeout):
+        self.solicitar_comando({"cmd": "FRAMING", "mode": modo})
+        maximo = None
+        try:
+            for registro in self.respuestas(timeout):
+                if registro.tipo == JSON and registro.valor.get("framing") == modo:
+                    maximo = registro.valor.get("max")
+        except TiempoAgotado:
+            pass
+        if maximo is None:
+            return False
+        if modo == "binary":
+            self.tramas = LectorTramas(self.uart, maximo)
+        else:
+            self.tramas = None
+            self.lector.descartar()
+        self._ultima_trama = None
+        return True
+
+    def _descartar(self):
+        self.lector.descartar()
+        if self.tramas is not None:
+            self.tramas.descartar()
+
+    def leer_respuesta(self, timeout=5, imprimir=True):
+        """
+        Lee respuestas UART hasta timeout o hasta recibir un mensaje JSON con {"end": true}.
+        Muestra cada línea recibida; para usar los datos ver respuestas().
+        """
+        salto = False
+        try:
+            for registro in self.respuestas(timeout):
+                if imprimir:
+                    print(registro.texto, end="\n" if registro.final else "")
+                salto = not registro.final
+        except TiempoAgotado as e:
+            # Si quedó algo sin \n, intentar mostrarlo también
+            if e.parcial and imprimir:
+                print("Respuesta parcial:", e.parcial)
+        if salto and imprimir:
+            print()  # Cuerpo en tramas 'D': cierra la línea
+
+    def capacidades(self, timeout=1):
+        """
+        Devuelve los límites del firmware (comando CAPS), por ejemplo
+        {"line": 1024, "rx": 4096, "frame": 4096, ...}. "line" es el largo
+        máximo de una línea de comando, incluido el '\n'. Se consulta una
+        sola vez; un firmware sin CAPS no responde y se usa CAPACIDADES_BASE.
+        """
+        if self._capacidades is None:
+            capacidades = dict(CAPACIDADES_BASE)
+            self.solicitar_comando({"cmd": "CAPS"})
+            try:
+                for registro in self.respuestas(timeout):
+                    if registro.tipo == JSON and "line" in registro.valor:
+                        capacidades.update(registro.valor)
+            except TiempoAgotado:
+                pass
+            self._capacidades = capacidades
+        return self._capacidades
+
+    def negociar_baudios(self, baudios, timeout=1):
+        """
+        Propone 'baudios' al ESP32 con BAUD, cambia la UART local y confirma el
+        enlace con un PROBE verificado por CRC16. Devuelve True si el enlace
+        quedó a la nueva velocidad. Si el ESP32 rechaza la velocidad o el PROBE
+        falla, ambos lados vuelven a la anterior y devuelve False, también si
+        el PING a la velocidad anterior queda sin respuesta (el enlace puede
+        haber quedado caído: GestorArranque.responde() lo confirma).
+        """
+        anterior = self.uart.baudrate
+        self.solicitar_comando({"cmd": "BAUD", "rate": baudios})
+        aceptado = False
+        try:
+            for registro in self.respuestas(timeout):
+                if registro.tipo == JSON and registro.valor.get("baud") == baudios:
+                    aceptado = True
+        except TiempoAgotado:
+            pass
+        if not aceptado:
+            return False
+
+        cambio = time.monotonic()
+        self.uart.baudrate = baudios
+        self._descartar()
+
+        # Patrón alternado (0x55 'U') más una parte aleatoria
+        muestra = "U" * 16 + "%08x%08x" % (random.getrandbits(32), random.getrandbits(32))
+        crc = crc16(muestra.encode())
+        self.uart.write(b"\n")  # Cierra cualquier basura recibida durante el cambio
+        self.solicitar_comando({"cmd": "PROBE", "data": muestra, "crc": crc})
+        confirmado = False
+        try:
+            for registro in self.respuestas(timeout):
+                if (registro.tipo == JSON and registro.valor.get("probe") == muestra
+                        and registro.valor.get("crc") == crc):
+                    confirmado = True
+        except TiempoAgotado:
+            pass
+        if confirmado:
+            return True
+
+        # Sin PROBE válido el ESP32 vuelve solo a la velocidad anterior
+        self.uart.baudrate = anterior
+        restante = BAUD_PROBE_TIMEOUT + 0.1 - (time.monotonic() - cambio)
+        if restante > 0:
+            time.sleep(restante)
+        if hasattr(self.uart, "reset_input_buffer"):
+            self.uart.reset_input_buffer()
+        self._descartar()
+        # El '\n' cierra la línea de basura que pudo quedar en el ESP32; PING confirma el enlace
+        self.uart.write(b"\n")
+        self.solicitar_comando({"cmd": "PING"})
+        try:
+            list(self.respuestas(timeout))
+        except TiempoAgotado:
+            pass
+        return False
+
+    def cerrar(self):
+        # Libera el UART
+        if hasattr(self.uart, 'deinit'):
+            self.uart.deinit()
+
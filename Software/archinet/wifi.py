@@ -0,0 +1,90 @@
+"""
+Escaneo de redes WiFi con SCAN.
+
+El ESP32 escanea sin bloquear su loop() y guarda el resultado: un SCAN dentro
+del 'ttl' (10 s por defecto) del último escaneo se responde al momento desde
+esa caché, y uno fuera del 'ttl' espera el escaneo nuevo (unos 2 s). La
+respuesta es una sola línea JSON con las redes ordenadas por RSSI, ya
+filtradas en el ESP32:
+
+    {"networks": [{"ssid": "Casa", "bssid": "24:0A:C4:12:34:56", "rssi": -48,
+                   "channel": 6, "auth": "wpa2"}, ...],
+     "total": 7, "age": 1250, "cached": true}
+
+    redes = escanear(esp, min_rssi=-75, prefix="Archi")
+    for red in redes:
+        print(red["ssid"], red["rssi"], red["auth"])
+
+Con 'ttl=0' se fuerza un escaneo nuevo. Por defecto queda el BSSID más
+fuerte de cada SSID; con 'unico=False' vienen todos los puntos de acceso.
+"""
+
+import json
+
+from .errores import ErrorESP32
+from .respuestas import CUERPO, ESTADO, JSON, TEXTO
+
+
+def comando_scan(ttl=None, min_rssi=None, canal=None, prefijo=None, maximo=None, unico=True, asincrono=False):
+    """Arma el comando SCAN con los filtros dados (None: sin filtro)."""
+    comando = {"cmd": "SCAN"}
+    for clave, valor in (("ttl", ttl), ("min_rssi", min_rssi), ("channel", canal), ("prefix", prefijo),
+                         ("max", maximo)):
+        if valor is not None:
+            comando[clave] = valor
+    if not unico:
+        comando["unique"] = False
+    if asincrono:
+        comando["async"] = True
+    return comando
+
+
+def redes_de(registros):
+    """
+    Devuelve la respuesta de SCAN ({"networks", "total", "age", "cached"}) a
+    partir de sus registros. Acepta la línea JSON partida en fragmentos
+    CUERPO (más larga que el buffer del lector) y las líneas de texto
+    "SSID: ... | RSSI: ..." de un firmware anterior.
+    """
+    resultado = None
+    partes = []
+    antiguas = []
+    mensaje = None
+    vacio = False  # Firmware anterior sin redes
+    # Se recorren todos los registros: con esp.respuestas() eso consume hasta el {"end": true}
+    for registro in registros:
+        if registro.tipo == JSON and "networks" in registro.valor:
+            resultado = registro.valor
+        elif registro.tipo == CUERPO:
+            partes.append(registro.valor)
+            if registro.final:
+                texto = b"".join(partes).decode("utf-8") if isinstance(partes[0], bytes) else "".join(partes)
+                partes = []
+                try:
+                    respuesta = json.loads(texto)
+                except ValueError:
+                    continue
+                if isinstance(respuesta, dict) and "networks" in respuesta:
+                    resultado = respuesta
+        elif registro.tipo == TEXTO and registro.valor.startswith("SSID: "):
+            ssid, _, rssi = registro.valor[6:].rpartition(" | RSSI: ")
+            antiguas.append({"ssid": ssid, "rssi": int(rssi)})
+        elif registro.tipo == ESTADO:
+            vacio = vacio or registro.valor == "[ESP32] No se encontraron redes WiFi."
+            mensaje = registro.valor
+    if resultado is not None:
+        return resultado
+    if antiguas or vacio:
+        return {"networks": antiguas, "total": len(antiguas), "age": 0, "cached": False}
+    raise ErrorESP32(mensaje or "SCAN sin resultado")
+
+
+def escanear(esp, ttl=None, min_rssi=None, canal=None, prefijo=None, maximo=None, unico=True, timeout=15):
+    """
+    Escanea (o toma la caché del ESP32) y devuelve la lista de redes, cada
+    una {"ssid", "bssid", "rssi", "channel", "auth"}, de la más fuerte a la
+    más débil. 'ttl': segundos de antigüedad aceptados (0: escaneo nuevo);
+    'min_rssi', 'canal', 'prefijo' y 'maximo' filtran en el ESP32.
+    """
+    esp.solicitar_comando(comando_scan(ttl, min_rssi, canal, prefijo, maximo, unico))
+    return redes_de(esp.respuestas(timeout))["networks"]